@@ -1,41 +1,225 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
+from utils.startup import startup_profile, BackgroundWarmUp
+from flask import Flask, Blueprint, current_app, make_response, render_template, request, redirect, url_for, session, flash, g, jsonify, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-import markdown
-from config import config
-from models.database import get_db, close_connection, init_db, query_db, insert_db, migrate_db
-from utils.ai_helper import initialize_vertex_ai, generate_text, generate_marketing_copy, generate_social_media_post, generate_craft_story, generate_product_visual_description, generate_image
+import json
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from config import config, Config
+from models.database import DATABASE, DASHBOARD_CONTENT_QUERY, DASHBOARD_PRODUCTS_QUERY, get_db, close_connection, query_db, query_page, insert_db, check_query_plans, transaction
+from models import schema
+from models.schema import SchemaError, ensure_schema
+from models.search import SEARCH_QUERIES, full_text_search
+from models.transfer import EXPORT_FORMATS, export_rows, import_products, read_records
+from utils.ai_helper import text_router, warm_up_model_backend, stream_text, generate_text, generate_marketing_copy, generate_social_media_post, generate_craft_story, generate_product_visual_description, generate_image, generate_variants
+from utils.jobs import JobQueue
+from utils.markdown_render import render_markdown, render_content, content_hash
+from utils.images import create_variants, load_variants, srcset, variant_urls
+from utils.storage import get_image_store
+from utils.delivery import compress_response, image_response
+from utils.metrics import registry as metrics_registry, begin_request, end_request
+from utils.cache import get_response_cache
+from utils.ratelimit import OverCapacity, RateLimited, get_rate_limiter, get_concurrency_limit
+from utils.profile_context import get_profile_context
+from utils.pregenerate import DRAFT_TYPES, pregenerate_drafts, product_prompt
+from utils.variants import variants_prompt
+from utils.similar import get_similar_index
 
-app = Flask(__name__)
-app.config.from_object(config['development'])
+startup_profile.record('import app modules', startup_profile.started)
 
-# Add markdown filter
-@app.template_filter('markdown')
+# Routes, hooks and CLI commands; registered on the app by create_app()
+bp = Blueprint('main', __name__, cli_group=None)
+
+# Model SDK import, credentials and model clients, started by the first request
+warm_up = BackgroundWarmUp(startup_profile, warm_up_model_backend, report=Config.STARTUP_REPORT)
+
+# Add markdown filter (fallback for rows without pre-rendered HTML)
+@bp.app_template_filter('markdown')
 def markdown_filter(text):
-    return markdown.markdown(text)
+    return render_markdown(text)
+
+@bp.app_template_filter('content_html')
+def content_html_filter(content):
+    """Stored HTML of a generated_content row, re-rendered when it is missing or its hash no longer matches the text"""
+    if content['generated_html'] is not None and content['content_hash'] == content_hash(content['generated_text']):
+        return content['generated_html']
+    return render_markdown(content['generated_text'])
+
+@bp.app_template_filter('image_variants')
+def image_variants_filter(value):
+    return load_variants(value)
+
+@bp.app_template_filter('srcset')
+def srcset_filter(variants, key):
+    return srcset(variants, key)
+
+def create_image_variants(key):
+    """Store resized WebP/JPEG derivatives of a stored image and return their description"""
+    store = get_image_store()
+
+    def save(data, extension):
+        return store.url(store.put(data, extension))
+
+    return create_variants(store.read(key), save)
+
+def content_image_keys(image_url, image_variants):
+    """Image store keys referenced by a content row (original and derivatives)"""
+    store = get_image_store()
+    urls = [image_url] + variant_urls(load_variants(image_variants))
+    keys = [store.key_from_url(url) for url in urls if url]
+    return [key for key in keys if key]
+
+def generate_content_text(generate_as, full_prompt, **kwargs):
+    """Use the appropriate generation function for a text generate_as option. Keyword arguments go to generate_text."""
+    if generate_as == 'ad_copy':
+        return generate_marketing_copy(full_prompt, **kwargs)
+    elif generate_as == 'social_caption':
+        return generate_social_media_post(full_prompt, 'Instagram', **kwargs)  # Default platform
+    elif generate_as == 'about_press':
+        return generate_craft_story(full_prompt, **kwargs)
+    # For others
+    if kwargs.pop('stream', False):
+        kwargs.pop('raise_errors', None)
+        return stream_text(full_prompt, **kwargs)
+    return generate_text(full_prompt, **kwargs)
+
+def run_generation_job(payload):
+    """Run the model call for a /generate_content request and store the result on its content row"""
+    generate_as = payload['generate_as']
+    full_prompt = payload['full_prompt']
+
+    image_variants = None
+    if generate_as == 'image':
+        key = generate_image(full_prompt)
+        generated_text = None
+        generated_image_url = get_image_store().url(key)
+        image_variants = json.dumps(create_image_variants(key))
+    else:
+        # Errors raise so the job is retried
+        generated_text = generate_content_text(generate_as, full_prompt, raise_errors=True)
+        generated_image_url = None
+
+    with transaction() as db:
+        cur = db.execute('UPDATE generated_content SET generated_text = ?, generated_image_url = ?, image_variants = ? WHERE id = ?',
+                         [generated_text, generated_image_url, image_variants, payload['content_id']])
+        # The row may have been deleted while the job ran; its images are then left for gc-images
+        if cur.rowcount:
+            get_image_store().incref(db, content_image_keys(generated_image_url, image_variants))
+    return {'content_id': payload['content_id']}
+
+def run_variants_job(payload):
+    """Generate every language/tone variant of a /generate_content request in one structured call and store each on its row"""
+    generate_as = payload['generate_as']
+    variant_prompts = payload['variant_prompts']
+    # Variants missing from the response are generated one by one; errors raise so the job is retried
+    texts = generate_variants(payload['prompt'], len(variant_prompts),
+                              lambda index: generate_content_text(generate_as, variant_prompts[index], raise_errors=True))
+    with transaction() as db:
+        db.executemany('UPDATE generated_content SET generated_text = ? WHERE id = ?', list(zip(texts, payload['content_ids'])))
+    return {'content_ids': payload['content_ids']}
+
+@bp.before_app_request
+def start_request_metrics():
+    begin_request()
 
-# Initialize database
-with app.app_context():
-    init_db()
-    migrate_db()
+@bp.before_app_request
+def start_warm_up():
+    # The server is accepting traffic by now, so warming up no longer delays startup
+    if Config.WARMUP_ENABLED:
+        warm_up.start()
 
-# Initialize Vertex AI (requires credentials)
-try:
-    initialize_vertex_ai()
-except Exception as e:
-    print(f"Vertex AI initialization failed: {e}")
+# Registered before compress so it runs after it and the latency includes compression
+@bp.after_app_request
+def record_request_metrics(response):
+    return end_request(request, response)
 
-@app.teardown_appcontext
-def teardown_db(exception):
-    close_connection(exception)
+@bp.after_app_request
+def compress(response):
+    return compress_response(request, response)
 
-@app.route('/')
+def client_identity():
+    """Rate limit key: the logged-in artisan, otherwise the client address"""
+    if 'user_id' in session:
+        return f"artisan:{session['user_id']}"
+    return f"ip:{request.remote_addr}"
+
+def limit_generation(bucket, cost=1):
+    """
+    Take cost tokens from the caller's text or image bucket, raising RateLimited when it is
+    empty, or OverCapacity when cost exceeds the bucket size and could never be paid
+    """
+    if Config.RATE_LIMIT_ENABLED:
+        get_rate_limiter().hit(bucket, client_identity(), cost)
+
+@bp.app_errorhandler(RateLimited)
+def rate_limited(error):
+    if request.endpoint == 'main.generate_content':
+        flash(str(error))
+        response = make_response(render_template('content_generator.html'), 429)
+    else:
+        response = make_response(jsonify({'error': str(error), 'retry_after': error.retry_after}), 429)
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@bp.app_errorhandler(OverCapacity)
+def over_capacity(error):
+    # Retrying cannot help, so this is a bad request rather than a 429 with a Retry-After
+    if request.endpoint == 'main.generate_content':
+        flash(str(error))
+        return render_template('content_generator.html'), 400
+    return jsonify({'error': str(error)}), 400
+
+def collect_runtime_metrics():
+    """Scrape-time values from the response cache and the model router"""
+    cache = get_response_cache().stats()
+    health = text_router.snapshot()['models']
+    concurrency = get_concurrency_limit()
+    return [
+        ('response_cache_lookups_total', 'counter', 'Response cache lookups, by result',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('model_circuit_open', 'gauge', '1 while a model circuit is open or half-open',
+         [({'model': name}, int(state['state'] != 'closed')) for name, state in health.items()]),
+        ('model_abandoned_calls', 'gauge', 'Timed-out model calls still running in the background',
+         [({'model': name}, state['abandoned_calls']) for name, state in health.items()]),
+        ('model_calls_in_flight', 'gauge', 'Model calls holding a MODEL_MAX_CONCURRENCY slot',
+         [({}, concurrency.in_flight() if concurrency is not None else 0)]),
+    ]
+
+metrics_registry.add_collector(collect_runtime_metrics)
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness check that touches neither the database nor the model backend"""
+    return jsonify({'status': 'ok', 'warm_up': warm_up.status()})
+
+@bp.route('/api/startup')
+def api_startup():
+    """Startup phase timings: module imports, schema check, job queue and background warm-up"""
+    report = startup_profile.report()
+    report['warm_up'] = warm_up.status()
+    return jsonify(report)
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the app's metrics"""
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route(f"{Config.IMAGE_STORAGE_URL_PREFIX}/<key>")
+def generated_image(key):
+    # Takes precedence over the generic static route for stored images
+    return image_response(get_image_store(), key)
+
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -51,7 +235,7 @@ def register():
         existing_user = query_db('SELECT id FROM artisans WHERE username = ? OR email = ?', [username, email], one=True)
         if existing_user:
             flash('Username or email already exists')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         # Hash password
         password_hash = generate_password_hash(password)
@@ -62,11 +246,11 @@ def register():
 
         session['user_id'] = user_id
         flash('Registration successful!')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -76,43 +260,153 @@ def login():
         if user and check_password_hash(user['password_hash'], password):
             session['user_id'] = user['id']
             flash('Login successful!')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('Invalid username or password')
 
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('user_id', None)
     flash('Logged out successfully')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+
+    page_size = Config.DASHBOARD_PAGE_SIZE
+    context = get_profile_context(session['user_id'])
+    user = context['profile'] if context else None
+    products, next_products = query_page(DASHBOARD_PRODUCTS_QUERY, [session['user_id']], page_size,
+                                         request.args.get('products_before'))
+    generated_content, next_content = query_page(DASHBOARD_CONTENT_QUERY, [session['user_id'], 'approved'], page_size,
+                                                 request.args.get('before'))
+
+    return render_template('dashboard.html', user=user, products=products, generated_content=generated_content,
+                           next_content=next_content, next_products=next_products)
+
+def search_request():
+    """(query, type, page) from the request arguments of /search and /api/search"""
+    return (request.args.get('q', '').strip(), request.args.get('type', 'content'),
+            max(request.args.get('page', 1, type=int), 1))
+
+@bp.route('/search')
+def search():
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+
+    query, kind, page = search_request()
+    if kind not in SEARCH_QUERIES:
+        kind = 'content'
+    results, has_next = full_text_search(kind, session['user_id'], query, page)
+    return render_template('search.html', query=query, kind=kind, page=page, results=results, has_next=has_next)
+
+@bp.route('/api/search')
+def api_search():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    query, kind, page = search_request()
+    if kind not in SEARCH_QUERIES:
+        return jsonify({'error': f"Unknown type '{kind}', expected one of: {', '.join(SEARCH_QUERIES)}"}), 400
+    results, has_next = full_text_search(kind, session['user_id'], query, page)
+    return jsonify({
+        'query': query,
+        'type': kind,
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'results': results
+    })
 
-    user = query_db('SELECT * FROM artisans WHERE id = ?', [session['user_id']], one=True)
-    products = query_db('SELECT * FROM products WHERE artisan_id = ?', [session['user_id']])
-    generated_content = query_db('SELECT * FROM generated_content WHERE artisan_id = ? AND approval_status = ?', [session['user_id'], 'approved'])
+def transfer_format(filename=None):
+    """'jsonl' or 'csv' from the format argument, else the file extension; None if unsupported"""
+    fmt = request.args.get('format')
+    if not fmt and filename:
+        fmt = os.path.splitext(filename)[1].lstrip('.').lower()
+    fmt = fmt or 'jsonl'
+    return fmt if fmt in EXPORT_FORMATS else None
 
-    return render_template('dashboard.html', user=user, products=products, generated_content=generated_content)
+@bp.route('/api/export/<any(products, generated_content):table>')
+def api_export(table):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    fmt = transfer_format()
+    if fmt is None:
+        return jsonify({'error': f"Unsupported format, expected one of: {', '.join(EXPORT_FORMATS)}"}), 400
 
-from flask import jsonify
+    # Streamed in batches from its own connection, so memory use does not grow with the catalog
+    response = Response(export_rows(table, session['user_id'], fmt), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    return response
 
-@app.route('/api/generate_marketing_copy', methods=['POST'])
+@bp.route('/api/import/products', methods=['POST'])
+def api_import_products():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Missing file (multipart field "file", JSONL or CSV)'}), 400
+    fmt = transfer_format(upload.filename)
+    if fmt is None:
+        return jsonify({'error': f"Unsupported format, expected one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    # Large uploads are spooled to disk by werkzeug and read back one line at a time
+    started = time.perf_counter()
+    report = import_products(session['user_id'], read_records(upload.stream, fmt))
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return jsonify(report), 200 if report['imported'] or not report['failed'] else 400
+
+# Response key for each /api/generate_* kind
+API_GENERATION_KINDS = {
+    'marketing_copy': 'marketing_copy',
+    'social_media_post': 'social_media_post',
+    'craft_story': 'craft_story',
+    'product_visual': 'product_visual_description'
+}
+
+def session_profile_prefix():
+    """Profile context for /api/generate_* prompts when the caller is logged in"""
+    if 'user_id' not in session:
+        return None
+    context = get_profile_context(session['user_id'])
+    return context['prefix'] if context else None
+
+def run_api_generation(kind, craft_type, description, platform='Instagram', profile_prefix=None, **kwargs):
+    """
+    Build the prompt for an /api/generate_* kind and generate it, grounded in the
+    artisan's profile when profile_prefix is given. Keyword arguments go to generate_text.
+    """
+    if profile_prefix:
+        description = f"{description} ({profile_prefix})"
+    if kind == 'marketing_copy':
+        prompt = f"Generate marketing copy for {craft_type} with description: {description}"
+        return generate_marketing_copy(prompt, **kwargs)
+    elif kind == 'social_media_post':
+        prompt = f"Generate a social media post for {craft_type} on {platform} with description: {description}"
+        return generate_social_media_post(prompt, platform, **kwargs)
+    elif kind == 'craft_story':
+        craft_description = f"{craft_type} with description: {description}"
+        return generate_craft_story(craft_description, **kwargs)
+    elif kind == 'product_visual':
+        product_name = f"{craft_type} product"
+        return generate_product_visual_description(product_name, craft_type, **kwargs)
+    raise ValueError(f"Unknown kind '{kind}', expected one of: {', '.join(API_GENERATION_KINDS)}")
+
+@bp.route('/api/generate_marketing_copy', methods=['POST'])
 def api_generate_marketing_copy():
     data = request.form
     craft_type = data.get('craft_type')
     description = data.get('description')
     if not craft_type or not description:
         return jsonify({'error': 'Missing craft_type or description'}), 400
-    prompt = f"Generate marketing copy for {craft_type} with description: {description}"
-    generated = generate_marketing_copy(prompt)
+    limit_generation('text')
+    generated = run_api_generation('marketing_copy', craft_type, description, profile_prefix=session_profile_prefix())
     return jsonify({'marketing_copy': generated})
 
-@app.route('/api/generate_social_media_post', methods=['POST'])
+@bp.route('/api/generate_social_media_post', methods=['POST'])
 def api_generate_social_media_post():
     data = request.form
     craft_type = data.get('craft_type')
@@ -120,168 +414,644 @@ def api_generate_social_media_post():
     platform = data.get('platform', 'Instagram')
     if not craft_type or not description:
         return jsonify({'error': 'Missing craft_type or description'}), 400
-    prompt = f"Generate a social media post for {craft_type} on {platform} with description: {description}"
-    generated = generate_social_media_post(prompt, platform)
+    limit_generation('text')
+    generated = run_api_generation('social_media_post', craft_type, description, platform, profile_prefix=session_profile_prefix())
     return jsonify({'social_media_post': generated})
 
-@app.route('/api/generate_craft_story', methods=['POST'])
+@bp.route('/api/generate_craft_story', methods=['POST'])
 def api_generate_craft_story():
     data = request.form
     craft_type = data.get('craft_type')
     description = data.get('description')
     if not craft_type or not description:
         return jsonify({'error': 'Missing craft_type or description'}), 400
-    craft_description = f"{craft_type} with description: {description}"
-    generated = generate_craft_story(craft_description)
+    limit_generation('text')
+    generated = run_api_generation('craft_story', craft_type, description, profile_prefix=session_profile_prefix())
     return jsonify({'craft_story': generated})
 
-@app.route('/api/generate_product_visual', methods=['POST'])
+@bp.route('/api/generate_product_visual', methods=['POST'])
 def api_generate_product_visual():
     data = request.form
     craft_type = data.get('craft_type')
     description = data.get('description')
     if not craft_type or not description:
         return jsonify({'error': 'Missing craft_type or description'}), 400
-    product_name = f"{craft_type} product"
-    generated = generate_product_visual_description(product_name, craft_type)
+    limit_generation('text')
+    generated = run_api_generation('product_visual', craft_type, description, profile_prefix=session_profile_prefix())
     return jsonify({'product_visual_description': generated})
 
+@bp.route('/api/models/health')
+def api_models_health():
+    """Circuit state, success rate and latency per text model"""
+    return jsonify(text_router.snapshot())
+
+def run_batch_item(index, item, profile_prefix=None):
+    """Generate one /api/generate_batch item, capturing errors and timing instead of raising"""
+    started = time.perf_counter()
+    result = {'index': index, 'kind': item.get('kind') if isinstance(item, dict) else None}
+    try:
+        if not isinstance(item, dict):
+            raise ValueError('Item must be an object')
+        kind = item.get('kind')
+        craft_type = item.get('craft_type')
+        description = item.get('description')
+        if kind not in API_GENERATION_KINDS:
+            raise ValueError(f"Unknown kind '{kind}', expected one of: {', '.join(API_GENERATION_KINDS)}")
+        if not craft_type or not description:
+            raise ValueError('Missing craft_type or description')
+        generated = run_api_generation(kind, craft_type, description, item.get('platform') or 'Instagram',
+                                       profile_prefix=profile_prefix, raise_errors=True)
+        result[API_GENERATION_KINDS[kind]] = generated
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+@bp.route('/api/generate_batch', methods=['POST'])
+def api_generate_batch():
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a JSON array of {kind, craft_type, description, platform} items'}), 400
+    if len(items) > Config.BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many items, the maximum is {Config.BATCH_MAX_ITEMS}'}), 400
+
+    # Each item costs a text token; items past the caller's limit are returned unprocessed with a retry hint
+    allowed, retry_after = len(items), 0
+    if Config.RATE_LIMIT_ENABLED:
+        identity = client_identity()
+        for index in range(len(items)):
+            retry_after = get_rate_limiter().check('text', identity)
+            if retry_after:
+                allowed = index
+                break
+        if not allowed:
+            raise RateLimited('text', retry_after)
+    items, limited = items[:allowed], items[allowed:]
+
+    # Callers may lower the concurrency but never exceed the configured cap
+    concurrency = request.args.get('concurrency', Config.BATCH_CONCURRENCY, type=int)
+    concurrency = max(1, min(concurrency, Config.BATCH_CONCURRENCY, len(items)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # map() yields results in input order regardless of completion order
+        # Workers have no request context, so the session's profile is looked up here
+        results = list(executor.map(partial(run_batch_item, profile_prefix=session_profile_prefix()), range(len(items)), items))
+    for index, item in enumerate(limited, start=allowed):
+        error = RateLimited('text', retry_after)
+        results.append({'index': index, 'kind': item.get('kind') if isinstance(item, dict) else None,
+                        'error': str(error), 'retry_after': error.retry_after})
+
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'errors': sum(1 for result in results if 'error' in result),
+        'concurrency': concurrency,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
 # Keep the existing generate_content route for UI usage
-@app.route('/delete_content/<int:content_id>', methods=['POST'])
+@bp.route('/delete_content/<int:content_id>', methods=['POST'])
 def delete_content(content_id):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     # Check if the content belongs to the user
     content = query_db('SELECT * FROM generated_content WHERE id = ? AND artisan_id = ?', [content_id, session['user_id']], one=True)
     if not content:
         flash('Content not found or access denied')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
-    # Delete the content
-    db = get_db()
-    db.execute('DELETE FROM generated_content WHERE id = ?', [content_id])
-    db.commit()
+    # Delete the content and release its images for garbage collection
+    with transaction() as db:
+        db.execute('DELETE FROM generated_content WHERE id = ?', [content_id])
+        get_image_store().decref(db, content_image_keys(content['generated_image_url'], content['image_variants']))
+    get_similar_index().remove(session['user_id'], content_id)
 
     flash('Content deleted successfully!')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/preview/<int:content_id>', methods=['GET', 'POST'])
+@bp.route('/preview/<int:content_id>', methods=['GET', 'POST'])
 def preview_content(content_id):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     content = query_db('SELECT * FROM generated_content WHERE id = ? AND artisan_id = ?', [content_id, session['user_id']], one=True)
     if not content:
         flash('Content not found')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     if request.method == 'POST':
         action = request.form.get('action')
         if action == 'approve':
-            # Update status to approved
+            # Update status to approved, rendering the HTML once unless it is already current
+            generated_html, text_hash = content['generated_html'], content['content_hash']
+            if content['generated_text'] is not None and text_hash != content_hash(content['generated_text']):
+                generated_html, text_hash = render_content(content['generated_text'])
             db = get_db()
-            db.execute('UPDATE generated_content SET approval_status = ? WHERE id = ?', ['approved', content_id])
+            db.execute('UPDATE generated_content SET approval_status = ?, generated_html = ?, content_hash = ? WHERE id = ?',
+                       ['approved', generated_html, text_hash, content_id])
             db.commit()
+            if content['generated_text'] is not None:
+                # Offered for similar requests from now on
+                get_similar_index().add(session['user_id'], content)
             flash('Content approved and published!')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         elif action == 'edit':
             # Update the content
             new_text = request.form.get('generated_text')
+            generated_html, text_hash = render_content(new_text)
             db = get_db()
-            db.execute('UPDATE generated_content SET generated_text = ? WHERE id = ?', [new_text, content_id])
+            db.execute('UPDATE generated_content SET generated_text = ?, generated_html = ?, content_hash = ? WHERE id = ?',
+                       [new_text, generated_html, text_hash, content_id])
             db.commit()
             flash('Content updated!')
             # Reload content
             content = query_db('SELECT * FROM generated_content WHERE id = ?', [content_id], one=True)
 
-    return render_template('preview.html', content=content)
+    job = None
+    if not content['generated_text'] and not content['generated_image_url']:
+        # Still being generated (or failed): show the latest job for this content (variants share their group's job)
+        job = query_db('SELECT id, status, attempts, error FROM generation_jobs WHERE content_id = ? ORDER BY id DESC LIMIT 1',
+                       [content['variant_group'] or content_id], one=True)
+
+    variants = []
+    if content['variant_group']:
+        variants = query_db('SELECT id, language, tone, approval_status FROM generated_content WHERE variant_group = ? AND artisan_id = ? ORDER BY id',
+                            [content['variant_group'], session['user_id']])
+
+    return render_template('preview.html', content=content, job=job, variants=variants)
+
+@bp.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    job = query_db('SELECT id, content_id, status, attempts, error FROM generation_jobs WHERE id = ? AND artisan_id = ?', [job_id, session['user_id']], one=True)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
 
-@app.route('/generate_content', methods=['GET', 'POST'])
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'error': job['error'],
+        'content_id': job['content_id'],
+        'preview_url': url_for('main.preview_content', content_id=job['content_id']) if job['content_id'] else None
+    })
+
+def requested_variants(form):
+    """Every language and tone combination ticked on the generator form, in form order"""
+    languages = list(dict.fromkeys(form.getlist('language'))) or ['english']
+    tones = list(dict.fromkeys(form.getlist('tone'))) or ['friendly']
+    return [{'language': language, 'tone': tone} for language in languages for tone in tones]
+
+@bp.route('/api/similar_content')
+def api_similar_content():
+    """Approved content resembling a /generate_content request (generate_as, prompt, language and tone parameters)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    if not request.args.get('generate_as') or not request.args.get('prompt'):
+        return jsonify({'error': 'Missing generate_as or prompt'}), 400
+    if not Config.SIMILAR_ENABLED or request.args['generate_as'] == 'image':
+        return jsonify({'suggestions': []})
+    started = time.perf_counter()
+    suggestions = similar_content(session['user_id'], build_content_request(request.args, session['user_id']))
+    for suggestion in suggestions:
+        suggestion['preview_url'] = url_for('main.preview_content', content_id=suggestion['id'])
+    return jsonify({'suggestions': suggestions, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+def build_content_request(form, user_id, language=None, tone=None):
+    """
+    Build the full prompt and content type for a /generate_content form submission,
+    in the form's (first) language and tone unless they are given
+    """
+    generate_as = form['generate_as']
+    tone = tone or form.get('tone', 'friendly')
+    language = language or form.get('language', 'english')
+    include_quote = 'include_quote' in form
+    prompt = form['prompt']
+
+    # Base prompt with the artisan's details, built once per profile
+    base_info = get_profile_context(user_id)['prefix']
+
+    # Determine person
+    if 'first_person' in generate_as:
+        person = "first-person"
+    else:
+        person = "third-person"
+
+    # Build full prompt
+    details = f"{base_info}. Additional details: {prompt}"
+    if include_quote:
+        details += " Include a personal quote from the artisan."
+    full_prompt = f"Generate content as {person} in {language} language with a {tone} tone. {details}"
+
+    # Map generate_as to content_type
+    content_type_map = {
+        'artisan_first_person': 'artisan_first_person',
+        'product_listing_third_person': 'product_listing',
+        'social_caption': 'social_caption',
+        'ad_copy': 'ad_copy',
+        'about_press': 'about_press',
+        'image': 'image'
+    }
+
+    return {
+        'generate_as': generate_as,
+        'prompt': prompt,
+        'include_quote': include_quote,
+        'full_prompt': full_prompt,
+        'content_type': content_type_map.get(generate_as, 'unknown'),
+        'language': language,
+        'tone': tone,
+        'person': person,
+        'details': details
+    }
+
+def similar_content(user_id, content_request):
+    """The artisan's approved content of the same type, language and tone whose prompts resemble the request, best first"""
+    matches = get_similar_index().search(user_id, content_request['content_type'], content_request['language'], content_request['tone'],
+                                         content_request['prompt'])
+    if not matches:
+        return []
+    ids = [content_id for content_id, _ in matches]
+    rows = query_db(f"SELECT id, content_type, prompt, generated_text, created_at FROM generated_content WHERE id IN ({', '.join('?' * len(ids))}) "
+                    "AND artisan_id = ? AND approval_status = 'approved'", ids + [user_id])
+    rows = {row['id']: dict(row) for row in rows}
+    return [dict(rows[content_id], score=round(score, 3)) for content_id, score in matches if content_id in rows]
+
+def reuse_content(form, user_id, content_id):
+    """Copy approved content into a new pending draft for this request, without a model call. Returns the draft id or None."""
+    source = query_db("SELECT content_type, generated_text, generated_html, content_hash FROM generated_content WHERE id = ? AND artisan_id = ? AND approval_status = 'approved'",
+                      [content_id, user_id], one=True)
+    if source is None or source['generated_text'] is None:
+        return None
+    return insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_html, content_hash, approval_status, include_quote, language, tone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     [user_id, source['content_type'], form['prompt'], source['generated_text'], source['generated_html'], source['content_hash'],
+                      'pending', int('include_quote' in form), form.get('language', 'english'), form.get('tone', 'friendly')])
+
+def start_variants_generation(form, user_id, variants):
+    """
+    Save one pending row per language/tone variant, grouped under the first row's id, and
+    generate them all with a single structured model call. Returns the first row's id.
+    """
+    content_request = build_content_request(form, user_id)
+    generate_as = content_request['generate_as']
+    variant_prompts = [build_content_request(form, user_id, **variant)['full_prompt'] for variant in variants]
+    # Built before anything is stored, so an unsupported generate_as leaves no rows behind
+    prompt = variants_prompt(generate_as, content_request['person'], content_request['details'], variants)
+
+    with transaction() as db:
+        content_ids = [insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, approval_status, include_quote, language, tone) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 [user_id, content_request['content_type'], content_request['prompt'], 'pending',
+                                  int(content_request['include_quote']), variant['language'], variant['tone']])
+                       for variant in variants]
+        db.execute(f"UPDATE generated_content SET variant_group = ? WHERE id IN ({', '.join('?' * len(content_ids))})",
+                   [content_ids[0]] + content_ids)
+    payload = {
+        'content_ids': content_ids,
+        'generate_as': generate_as,
+        'prompt': prompt,
+        'variant_prompts': variant_prompts
+    }
+
+    if Config.JOB_QUEUE_ENABLED:
+        current_app.extensions['job_queue'].enqueue('generate_variants', payload, artisan_id=user_id, content_id=content_ids[0])
+    else:
+        try:
+            run_variants_job(payload)
+        except Exception:
+            with transaction() as db:
+                db.executemany('DELETE FROM generated_content WHERE id = ?', [[content_id] for content_id in content_ids])
+            raise
+    return content_ids[0]
+
+@bp.route('/generate_content', methods=['GET', 'POST'])
 def generate_content():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
-        generate_as = request.form['generate_as']
-        tone = request.form.get('tone', 'friendly')
-        language = request.form.get('language', 'english')
-        include_quote = 'include_quote' in request.form
-        prompt = request.form['prompt']
+        variants = requested_variants(request.form)
+        if request.form.get('generate_as') != 'image' and len(variants) > 1:
+            if len(variants) > Config.VARIANTS_MAX_ITEMS:
+                flash(f'Choose at most {Config.VARIANTS_MAX_ITEMS} language and tone combinations')
+                return redirect(url_for('main.generate_content'))
+            # One token per variant, though they are generated with one model call
+            limit_generation('text', cost=len(variants))
+            try:
+                content_id = start_variants_generation(request.form, session['user_id'], variants)
+            except RateLimited:
+                raise
+            except Exception as e:
+                flash(str(e))
+                return redirect(url_for('main.generate_content'))
+            return redirect(url_for('main.preview_content', content_id=content_id))
+
+        if request.form.get('reuse_content_id'):
+            content_id = reuse_content(request.form, session['user_id'], request.form.get('reuse_content_id', type=int))
+            if content_id is None:
+                flash('That content is no longer available')
+                return redirect(url_for('main.generate_content'))
+            return redirect(url_for('main.preview_content', content_id=content_id))
 
-        user = query_db('SELECT * FROM artisans WHERE id = ?', [session['user_id']], one=True)
+        content_request = build_content_request(request.form, session['user_id'])
+        if Config.SIMILAR_ENABLED and content_request['generate_as'] != 'image' and 'skip_similar' not in request.form:
+            # Offer approved content for a near-identical request before spending a model call
+            suggestions = similar_content(session['user_id'], content_request)
+            if suggestions:
+                return render_template('content_generator.html', suggestions=suggestions, form=request.form)
 
-        # Build base prompt with user data
-        base_info = f"Artisan: {user['full_name']}, Craft: {user['craft_type']}, Location: {user['location']}, Bio: {user['bio']}, Materials: {user['materials'] or ''}"
+        limit_generation('image' if request.form.get('generate_as') == 'image' else 'text')
+        generate_as = content_request['generate_as']
+        prompt = content_request['prompt']
+        include_quote = content_request['include_quote']
+        full_prompt = content_request['full_prompt']
+        content_type = content_request['content_type']
 
-        # Determine person
-        if 'first_person' in generate_as:
-            person = "first-person"
+        # Save to database as pending; the generated text or image is filled in by the job
+        content_id = insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_image_url, approval_status, include_quote, language, tone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               [session['user_id'], content_type, prompt, None, None, 'pending', int(include_quote),
+                                content_request['language'], content_request['tone']])
+        payload = {'content_id': content_id, 'generate_as': generate_as, 'full_prompt': full_prompt}
+
+        if Config.JOB_QUEUE_ENABLED:
+            current_app.extensions['job_queue'].enqueue('generate_content', payload, artisan_id=session['user_id'], content_id=content_id)
         else:
-            person = "third-person"
-
-        # Build full prompt
-        full_prompt = f"Generate content as {person} in {language} language with a {tone} tone. {base_info}. Additional details: {prompt}"
-        if include_quote:
-            full_prompt += " Include a personal quote from the artisan."
-
-        # Map generate_as to content_type
-        content_type_map = {
-            'artisan_first_person': 'artisan_first_person',
-            'product_listing_third_person': 'product_listing',
-            'social_caption': 'social_caption',
-            'ad_copy': 'ad_copy',
-            'about_press': 'about_press',
-            'image': 'image'
-        }
-        content_type = content_type_map.get(generate_as, 'unknown')
-
-        if generate_as == 'image':
             try:
-                generated = generate_image(full_prompt)
-                generated_text = None
-                generated_image_url = url_for('static', filename=f'images/{generated}')
+                run_generation_job(payload)
             except Exception as e:
+                db = get_db()
+                db.execute('DELETE FROM generated_content WHERE id = ?', [content_id])
+                db.commit()
                 flash(str(e))
-                return redirect(url_for('generate_content'))
-        else:
-            # Use appropriate generation function
-            if generate_as == 'ad_copy':
-                generated = generate_marketing_copy(full_prompt)
-            elif generate_as == 'social_caption':
-                generated = generate_social_media_post(full_prompt, 'Instagram')  # Default platform
-            elif generate_as == 'about_press':
-                generated = generate_craft_story(full_prompt)
-            else:
-                generated = generate_text(full_prompt)  # For others
-            generated_text = generated
-            generated_image_url = None
-
-        # Save to database as pending
-        content_id = insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_image_url, approval_status, include_quote) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                               [session['user_id'], content_type, prompt, generated_text, generated_image_url, 'pending', int(include_quote)])
-
-        return redirect(url_for('preview_content', content_id=content_id))
+                return redirect(url_for('main.generate_content'))
+
+        return redirect(url_for('main.preview_content', content_id=content_id))
 
     return render_template('content_generator.html')
 
-@app.route('/migrate_db')
-def migrate_db():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
+def sse_event(data, event=None):
+    """Format one server-sent event with a JSON payload"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream an iterable of SSE strings without buffering by proxies"""
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def stream_generation(chunks, on_complete=None):
+    """Relay text chunks as 'token' events, then a 'done' event (or 'error' on failure)"""
+    text = []
     try:
-        import subprocess
-        result = subprocess.run(['python', 'fix_db_add_materials.py'], capture_output=True, text=True)
-        if result.returncode == 0:
-            flash('Database migration completed successfully!')
-            return 'Migration successful: ' + result.stdout
-        else:
-            flash('Migration failed!')
-            return 'Migration failed: ' + result.stderr
+        for chunk in chunks:
+            text.append(chunk)
+            yield sse_event({'text': chunk}, event='token')
     except Exception as e:
-        flash('Migration error!')
-        return f'Migration error: {str(e)}'
+        yield sse_event({'error': str(e)}, event='error')
+        return
+    done = {'text': ''.join(text)}
+    if on_complete is not None:
+        done.update(on_complete(done['text']))
+    yield sse_event(done, event='done')
+
+@bp.route('/generate_content/stream', methods=['POST'])
+def generate_content_stream():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    if request.form.get('generate_as') == 'image':
+        return jsonify({'error': 'Images cannot be streamed'}), 400
+
+    limit_generation('text')
+    content_request = build_content_request(request.form, session['user_id'])
+    artisan_id = session['user_id']
+
+    def save(generated_text):
+        # Persist the final text as pending content once the stream completes
+        content_id = insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_image_url, approval_status, include_quote, language, tone) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               [artisan_id, content_request['content_type'], content_request['prompt'], generated_text, None, 'pending', int(content_request['include_quote']),
+                                content_request['language'], content_request['tone']])
+        return {'content_id': content_id, 'preview_url': url_for('main.preview_content', content_id=content_id)}
+
+    chunks = generate_content_text(content_request['generate_as'], content_request['full_prompt'], stream=True)
+    return sse_response(stream_generation(chunks, on_complete=save))
+
+@bp.route('/api/generate_<any(marketing_copy, social_media_post, craft_story, product_visual):kind>/stream', methods=['GET', 'POST'])
+def api_generate_stream(kind):
+    data = request.values
+    craft_type = data.get('craft_type')
+    description = data.get('description')
+    if not craft_type or not description:
+        return jsonify({'error': 'Missing craft_type or description'}), 400
+    limit_generation('text')
+    chunks = run_api_generation(kind, craft_type, description, data.get('platform', 'Instagram'),
+                                profile_prefix=session_profile_prefix(), stream=True)
+    return sse_response(stream_generation(chunks))
+
+@bp.cli.command('db-upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this migration version')
+def db_upgrade(target):
+    """Apply pending schema migrations."""
+    applied = schema.upgrade(target=target, log=click.echo)
+    click.echo(f'Applied {len(applied)} migration(s)' if applied else 'Database schema is up to date')
+
+@bp.cli.command('db-status')
+def db_status():
+    """Show the schema version and pending migrations."""
+    version, pending = schema.status()
+    click.echo(f'Schema version: {version}')
+    for migration in pending:
+        click.echo(f'Pending: {migration.version:04d}_{migration.name} - {migration.description}')
+
+@bp.cli.command('backfill-markdown')
+@click.option('--batch-size', default=500, show_default=True, help='Rows rendered per transaction')
+@click.option('--force', is_flag=True, help='Re-render rows whose stored hash already matches')
+def backfill_markdown(batch_size, force):
+    """Pre-render generated_html for existing generated_content rows."""
+    db = get_db()
+    last_id = 0
+    rendered = 0
+    while True:
+        rows = db.execute('SELECT id, generated_text, content_hash FROM generated_content WHERE id > ? AND generated_text IS NOT NULL ORDER BY id LIMIT ?',
+                          [last_id, batch_size]).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            if force or row['content_hash'] != content_hash(row['generated_text']):
+                generated_html, text_hash = render_content(row['generated_text'])
+                updates.append([generated_html, text_hash, row['id']])
+        db.executemany('UPDATE generated_content SET generated_html = ?, content_hash = ? WHERE id = ?', updates)
+        db.commit()
+        rendered += len(updates)
+        last_id = rows[-1]['id']
+    click.echo(f'Rendered markdown for {rendered} row(s)')
+
+@bp.cli.command('backfill-image-variants')
+@click.option('--batch-size', default=100, show_default=True, help='Rows processed per query')
+def backfill_image_variants(batch_size):
+    """Create responsive derivatives for existing generated images."""
+    db = get_db()
+    store = get_image_store()
+    last_id = 0
+    created = 0
+    while True:
+        rows = db.execute('SELECT id, generated_image_url FROM generated_content WHERE id > ? AND generated_image_url IS NOT NULL AND image_variants IS NULL ORDER BY id LIMIT ?',
+                          [last_id, batch_size]).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            last_id = row['id']
+            key = store.key_from_url(row['generated_image_url'])
+            if key is None:
+                continue
+            try:
+                variants = json.dumps(create_image_variants(key))
+            except (OSError, ValueError) as e:
+                click.echo(f"Skipping content {row['id']}: {e}", err=True)
+                continue
+            with transaction():
+                db.execute('UPDATE generated_content SET image_variants = ? WHERE id = ?', [variants, row['id']])
+                store.incref(db, content_image_keys(None, variants))
+            created += 1
+    click.echo(f'Created image variants for {created} row(s)')
+
+@bp.cli.command('gc-images')
+@click.option('--batch-size', default=Config.IMAGE_GC_BATCH_SIZE, show_default=True, help='Images deleted per transaction')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches')
+@click.option('--include-untracked', is_flag=True, help='Also delete stored files no content row references (e.g. from before refcounting)')
+def gc_images(batch_size, max_batches, include_untracked):
+    """Delete generated images that are no longer referenced."""
+    store = get_image_store()
+    deleted, reclaimed = store.gc(batch_size=batch_size, max_batches=max_batches)
+    click.echo(f'Deleted {deleted} unreferenced image(s), reclaimed {reclaimed} bytes')
+    if include_untracked:
+        referenced = set()
+        for row in get_db().execute('SELECT generated_image_url, image_variants FROM generated_content WHERE generated_image_url IS NOT NULL'):
+            referenced.update(content_image_keys(row['generated_image_url'], row['image_variants']))
+        for row in get_db().execute('SELECT image_url FROM products WHERE image_url IS NOT NULL'):
+            referenced.update(content_image_keys(row['image_url'], None))
+        deleted, reclaimed = store.sweep_untracked(referenced, batch_size=batch_size)
+        click.echo(f'Deleted {deleted} untracked file(s), reclaimed {reclaimed} bytes')
+
+def artisan_id_for(username):
+    artisan = get_db().execute('SELECT id FROM artisans WHERE username = ?', [username]).fetchone()
+    if artisan is None:
+        raise click.BadParameter(f"No artisan named '{username}'", param_hint='--artisan')
+    return artisan['id']
+
+@bp.cli.command('export')
+@click.option('--artisan', required=True, help='Username of the artisan to export')
+@click.option('--table', type=click.Choice(['products', 'generated_content']), default='products', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='jsonl', show_default=True)
+@click.option('--output', default='-', show_default=True, help='File to write, - for stdout')
+def export_command(artisan, table, fmt, output):
+    """Stream an artisan's products or generated content as JSONL or CSV."""
+    artisan_id = artisan_id_for(artisan)
+    with click.open_file(output, 'wb') as f:
+        for chunk in export_rows(table, artisan_id, fmt):
+            f.write(chunk.encode('utf-8'))
+
+@bp.cli.command('import-products')
+@click.option('--artisan', required=True, help='Username of the artisan the products belong to')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default=None, help='Defaults to the file extension')
+@click.option('--batch-size', default=Config.IMPORT_BATCH_SIZE, show_default=True, help='Rows inserted per transaction')
+@click.argument('source', type=click.File('rb'))
+def import_products_command(artisan, fmt, batch_size, source):
+    """Bulk insert products from a JSONL or CSV file (- for stdin)."""
+    artisan_id = artisan_id_for(artisan)
+    fmt = fmt or ('csv' if source.name.lower().endswith('.csv') else 'jsonl')
+    started = time.perf_counter()
+    report = import_products(artisan_id, read_records(source, fmt), batch_size=batch_size)
+    for error in report['errors']:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Imported {report['imported']} product(s), {report['failed']} invalid row(s) skipped "
+               f"in {time.perf_counter() - started:.1f}s")
+
+def build_draft_request(product, content_type):
+    """Content request for a pre-generated product draft, built like a /generate_content submission"""
+    form = {'generate_as': DRAFT_TYPES[content_type], 'prompt': product_prompt(product)}
+    return build_content_request(form, product['artisan_id'])
+
+def generate_draft(content_request):
+    return generate_content_text(content_request['generate_as'], content_request['full_prompt'], raise_errors=True)
+
+@bp.cli.command('pregenerate-drafts')
+@click.option('--concurrency', default=Config.PREGENERATE_CONCURRENCY, show_default=True, help='Model calls at once')
+@click.option('--batch-size', default=Config.PREGENERATE_BATCH_SIZE, show_default=True, help='Products per checkpoint')
+@click.option('--max-minutes', type=float, default=None, help='Stop starting new batches after this long (resume on the next run)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the first product')
+def pregenerate_drafts_command(concurrency, batch_size, max_minutes, restart):
+    """Generate pending listing and social caption drafts for products that have none."""
+    started = time.monotonic()
+    deadline = started + max_minutes * 60 if max_minutes else None
+    report = pregenerate_drafts(build_draft_request, generate_draft, concurrency=concurrency, batch_size=batch_size,
+                                deadline=deadline, restart=restart, log=lambda message: click.echo(message, err=True))
+    click.echo(f"Checked {report['products']} product(s): {report['drafts']} draft(s) stored, {report['failed']} failed "
+               f"in {time.monotonic() - started:.1f}s" + ('' if report['complete'] else ' (stopped early, the next run resumes)'))
+
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot dashboard query stops using its index."""
+    problems = check_query_plans(get_db())
+    for problem in problems:
+        click.echo(problem, err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo('All query plans use their indexes')
+
+@bp.cli.command('startup-report')
+@click.option('--warm-up', 'run_warm_up', is_flag=True, help='Also import the model SDK and build model clients')
+def startup_report(run_warm_up):
+    """Print how long each startup phase took."""
+    if run_warm_up:
+        with startup_profile.phase('warm-up'):
+            warm_up_model_backend(startup_profile)
+    click.echo(startup_profile.format())
+
+def create_app(config_name=None):
+    """
+    Application factory. The config is chosen by config_name or APP_ENV; startup only
+    checks the schema and starts the job workers, everything model-related is deferred
+    to the background warm-up or the first call that needs it.
+    """
+    config_name = config_name or Config.APP_ENV
+    if config_name not in config:
+        raise ValueError(f"Unknown APP_ENV '{config_name}', expected one of: {', '.join(config)}")
+
+    with startup_profile.phase('create app'):
+        app = Flask(__name__)
+        app.config.from_object(config[config_name])
+        app.register_blueprint(bp)
+        app.teardown_appcontext(close_connection)
+
+    # Check the schema version (applies pending migrations when MIGRATE_ON_STARTUP is set)
+    with startup_profile.phase('schema check'):
+        try:
+            ensure_schema()
+        except SchemaError as e:
+            # Keep the CLI importable so 'flask db-upgrade' can bring the schema up to date
+            print(f"WARNING: {e}")
+
+    # Background workers for content generation
+    with startup_profile.phase('job queue'):
+        job_queue = JobQueue(app, DATABASE, workers=Config.JOB_WORKERS, max_attempts=Config.JOB_MAX_ATTEMPTS,
+                             backoff_seconds=Config.JOB_BACKOFF_SECONDS, poll_interval=Config.JOB_POLL_INTERVAL,
+                             lease_seconds=Config.JOB_LEASE_SECONDS)
+        job_queue.register('generate_content', run_generation_job)
+        job_queue.register('generate_variants', run_variants_job)
+        app.extensions['job_queue'] = job_queue
+        if Config.JOB_QUEUE_ENABLED:
+            job_queue.start()
+
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=app.config['DEBUG'])
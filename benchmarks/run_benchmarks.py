@@ -0,0 +1,326 @@
+"""
+Offline benchmark for the app's routes.
+
+Drives the Flask app in-process (test client) or through a local WSGI server
+against the stub model backend and a freshly seeded SQLite database, then
+writes throughput and p50/p95/p99 latency per route as JSON.
+
+    python benchmarks/run_benchmarks.py --artisans 200 --content-per-artisan 50 --requests 200
+    python benchmarks/run_benchmarks.py --mode server --concurrency 8 --baseline previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = 'benchmark-password'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['inprocess', 'server'], default='inprocess',
+                        help='Flask test client, or HTTP against a local threaded WSGI server')
+    parser.add_argument('--artisans', type=int, default=50, help='Seeded artisan accounts')
+    parser.add_argument('--content-per-artisan', type=int, default=40, help='Seeded generated_content rows per artisan')
+    parser.add_argument('--products-per-artisan', type=int, default=10, help='Seeded products per artisan')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route before timing')
+    parser.add_argument('--routes', help='Comma-separated subset of routes to run')
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help='Simulated model latency')
+    parser.add_argument('--stub-error-rate', type=float, default=0, help='Simulated model error rate')
+    parser.add_argument('--cached', action='store_true', help='Repeat identical prompts so the response cache is hit')
+    parser.add_argument('--async-jobs', action='store_true', help='Enqueue /generate_content jobs instead of generating inline')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Earlier results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Fail when a route p95 grows by more than this fraction over the baseline')
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir):
+    """Point the app at a throwaway database and image directory with the stub backend. Must run before importing app."""
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'benchmark.db'),
+        'IMAGE_STORAGE_PATH': os.path.join(workdir, 'images'),
+        'RESPONSE_CACHE_DB': '',
+        'MODEL_BACKEND': 'stub',
+        'STUB_LATENCY_DISTRIBUTION': 'constant',
+        'STUB_LATENCY_MS': str(args.stub_latency_ms),
+        'STUB_ERROR_RATE': str(args.stub_error_rate),
+        'STUB_SEED': str(args.seed),
+        'JOB_QUEUE_ENABLED': 'true' if args.async_jobs else 'false',
+        # A few clients hammering each route would otherwise measure 429s
+        'RATE_LIMIT_ENABLED': 'false',
+    })
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+
+def seed_database(path, args):
+    """Insert artisans, products and generated content; returns {artisan_id: [content ids]}"""
+    from werkzeug.security import generate_password_hash
+    from models.database import connect
+    from utils.markdown_render import render_content
+
+    rng = random.Random(args.seed)
+    # Hashing is deliberately slow, so every account shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    crafts = ['pottery', 'weaving', 'woodwork', 'metalwork', 'embroidery', 'painting']
+    text = "**Handmade with care.** Each piece is shaped by hand using traditional techniques passed down for generations."
+    html, digest = render_content(text)
+    statuses = ['approved', 'approved', 'approved', 'pending']
+    base_time = time.time() - 365 * 24 * 3600
+
+    conn = connect(path)
+    artisan_rows = [(f'artisan{i}', f'artisan{i}@example.com', password_hash, f'Artisan {i}', rng.choice(crafts),
+                     'Jaipur', 'Third-generation maker.') for i in range(args.artisans)]
+    conn.executemany('INSERT INTO artisans (username, email, password_hash, full_name, craft_type, location, bio) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     artisan_rows)
+    artisan_ids = [row['id'] for row in conn.execute('SELECT id FROM artisans ORDER BY id')]
+
+    def timestamp():
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(base_time + rng.uniform(0, 365 * 24 * 3600)))
+
+    content_rows = []
+    product_rows = []
+    for artisan_id in artisan_ids:
+        for _ in range(args.content_per_artisan):
+            content_rows.append((artisan_id, 'ad_copy', 'benchmark prompt', text, html, digest, rng.choice(statuses), timestamp()))
+        for j in range(args.products_per_artisan):
+            product_rows.append((artisan_id, f'Product {j}', 'Hand-thrown vase', round(rng.uniform(5, 500), 2), timestamp()))
+    conn.executemany('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_html, content_hash, approval_status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                     content_rows)
+    conn.executemany('INSERT INTO products (artisan_id, name, description, price, created_at) VALUES (?, ?, ?, ?, ?)', product_rows)
+    conn.commit()
+
+    content_ids = {}
+    for row in conn.execute('SELECT id, artisan_id FROM generated_content'):
+        content_ids.setdefault(row['artisan_id'], []).append(row['id'])
+    conn.close()
+    return content_ids
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None):
+        response = self.session.request(method, self.base_url + path, data=data, allow_redirects=False)
+        response.content
+        return response.status_code
+
+
+def build_routes(args):
+    """Route name -> fn(client, artisan, content_ids, i) returning the status code"""
+    def description(i):
+        return 'Handmade pottery with traditional designs' + ('' if args.cached else f' #{i}')
+
+    def api(path):
+        return lambda client, artisan, content_ids, i: client.request(
+            'POST', path, {'craft_type': 'Pottery', 'description': description(i), 'platform': 'Instagram'})
+
+    def generate_content(generate_as):
+        return lambda client, artisan, content_ids, i: client.request(
+            'POST', '/generate_content', {'generate_as': generate_as, 'prompt': description(i), 'tone': 'friendly', 'language': 'english'})
+
+    return {
+        'login_page': lambda client, artisan, content_ids, i: client.request('GET', '/login'),
+        'login': lambda client, artisan, content_ids, i: client.request('POST', '/login', {'username': artisan, 'password': PASSWORD}),
+        'dashboard': lambda client, artisan, content_ids, i: client.request('GET', '/dashboard'),
+        'generate_content_form': lambda client, artisan, content_ids, i: client.request('GET', '/generate_content'),
+        'generate_content_text': generate_content('ad_copy'),
+        'generate_content_image': generate_content('image'),
+        'preview': lambda client, artisan, content_ids, i: client.request('GET', f'/preview/{content_ids[i % len(content_ids)]}'),
+        'api_generate_marketing_copy': api('/api/generate_marketing_copy'),
+        'api_generate_social_media_post': api('/api/generate_social_media_post'),
+        'api_generate_craft_story': api('/api/generate_craft_story'),
+        'api_generate_product_visual': api('/api/generate_product_visual'),
+        'api_models_health': lambda client, artisan, content_ids, i: client.request('GET', '/api/models/health'),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies_ms, errors, elapsed):
+    ordered = sorted(latencies_ms)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(ordered) / len(ordered), 3) if ordered else None,
+        'p50_ms': round(percentile(ordered, 50), 3) if ordered else None,
+        'p95_ms': round(percentile(ordered, 95), 3) if ordered else None,
+        'p99_ms': round(percentile(ordered, 99), 3) if ordered else None,
+        'max_ms': round(ordered[-1], 3) if ordered else None,
+    }
+
+
+def run_route(name, route, clients, args):
+    """Run args.requests calls of one route spread over the logged-in clients"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(worker_index, calls):
+        client, artisan, content_ids = clients[worker_index]
+        for i in calls:
+            started = time.perf_counter()
+            try:
+                status = route(client, artisan, content_ids, i)
+            except Exception as e:
+                print(f"{name}: request failed: {e}", file=sys.stderr)
+                status = 599
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                if status >= 400:
+                    errors[0] += 1
+
+    for i in range(args.warmup):
+        client, artisan, content_ids = clients[i % len(clients)]
+        route(client, artisan, content_ids, -1 - i)
+
+    batches = [range(w, args.requests, args.concurrency) for w in range(args.concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(worker, w, calls) for w, calls in enumerate(batches)]:
+            future.result()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Return a description of every route whose p95 regressed past max_regression"""
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous or not previous.get('p95_ms') or current.get('p95_ms') is None:
+            continue
+        change = current['p95_ms'] / previous['p95_ms'] - 1
+        if change > max_regression:
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = tempfile.mkdtemp(prefix='artisan-bench-')
+    server = None
+    try:
+        configure_environment(args, workdir)
+        from app import app
+        app.config['TESTING'] = True
+
+        started = time.perf_counter()
+        content_ids = seed_database(os.environ['DATABASE_PATH'], args)
+        seed_seconds = time.perf_counter() - started
+
+        if args.mode == 'server':
+            import logging
+            from werkzeug.serving import make_server
+            # Per-request access logs would dominate the output
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+            def make_client():
+                return HTTPClient(base_url)
+        else:
+            def make_client():
+                return InProcessClient(app)
+
+        # One logged-in session per concurrent client, each as a different artisan
+        clients = []
+        for w in range(args.concurrency):
+            artisan_id = sorted(content_ids)[w % len(content_ids)]
+            artisan = f'artisan{artisan_id - 1}'
+            client = make_client()
+            client.request('POST', '/login', {'username': artisan, 'password': PASSWORD})
+            if client.request('GET', '/dashboard') != 200:
+                raise SystemExit(f"Could not log in as {artisan}")
+            clients.append((client, artisan, content_ids[artisan_id]))
+
+        routes = build_routes(args)
+        selected = args.routes.split(',') if args.routes else list(routes)
+        unknown = [name for name in selected if name not in routes]
+        if unknown:
+            raise SystemExit(f"Unknown route(s): {', '.join(unknown)}. Choose from: {', '.join(routes)}")
+
+        results = {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'settings': {key: getattr(args, key) for key in ('mode', 'artisans', 'content_per_artisan', 'products_per_artisan', 'requests',
+                                                             'concurrency', 'stub_latency_ms', 'stub_error_rate', 'cached', 'async_jobs', 'seed')},
+            'seed_seconds': round(seed_seconds, 3),
+            'routes': {},
+        }
+        for name in selected:
+            summary = run_route(name, routes[name], clients, args)
+            results['routes'][name] = summary
+            print(f"{name:32} {summary['throughput_rps']:>9} req/s  p50 {summary['p50_ms']:>8}ms  "
+                  f"p95 {summary['p95_ms']:>8}ms  p99 {summary['p99_ms']:>8}ms  errors {summary['errors']}")
+
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output}")
+
+        if baseline_path:
+            with open(baseline_path) as f:
+                regressions = compare(results, json.load(f), args.max_regression)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                return 1
+        return 0
+    finally:
+        if server is not None:
+            server.shutdown()
+        if 'app' in sys.modules:
+            sys.modules['app'].app.extensions['job_queue'].stop(wait=False)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,8 +7,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Config:
+    APP_ENV = os.environ.get('APP_ENV', 'production')  # selects the config used by create_app: development or production
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     DATABASE_URI = 'sqlite:///artisans.db'
+    DATABASE_PATH = os.environ.get('DATABASE_PATH') or 'artisans.db'
+
+    # SQLite tuning
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16384))
+    SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get('SQLITE_STATEMENT_CACHE_SIZE', 256))
+    MIGRATE_ON_STARTUP = os.environ.get('MIGRATE_ON_STARTUP', 'true').lower() == 'true'  # false: refuse to start until 'flask db-upgrade' has run
+    MIGRATION_LOCK_TIMEOUT_SECONDS = int(os.environ.get('MIGRATION_LOCK_TIMEOUT_SECONDS', 60))
+    SLOW_QUERY_MS = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None  # unset disables the slow query log
     GOOGLE_CLOUD_PROJECT = os.environ.get('GOOGLE_CLOUD_PROJECT') or 'my-project-genai-471504'
 
     # Support for service account credentials in .env
@@ -21,6 +32,116 @@ class Config:
     VERTEX_AI_API_KEY = os.environ.get('VERTEX_AI_API_KEY') or os.environ.get('API_KEY') or os.environ.get('@GENAI')
     VERTEX_AI_LOCATION = 'asia-south1'  # Default location, can be changed
 
+    # Model backend: 'vertex' for Vertex AI, 'stub' for the offline deterministic backend
+    MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'vertex').lower()
+
+    # Model routing: circuit breaker, timeouts and retries for text generation
+    MODEL_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('MODEL_CIRCUIT_FAILURE_THRESHOLD', 5))  # consecutive failures
+    MODEL_CIRCUIT_COOLDOWN_SECONDS = float(os.environ.get('MODEL_CIRCUIT_COOLDOWN_SECONDS', 30))
+    MODEL_UNAVAILABLE_COOLDOWN_SECONDS = float(os.environ.get('MODEL_UNAVAILABLE_COOLDOWN_SECONDS', 600))  # after 404 / NOT_FOUND
+    MODEL_TIMEOUT_SECONDS = float(os.environ.get('MODEL_TIMEOUT_SECONDS', 60))
+    MODEL_MAX_ABANDONED_CALLS = int(os.environ.get('MODEL_MAX_ABANDONED_CALLS', 8))  # timed-out calls per model still running before new ones fail fast
+    MODEL_MAX_RETRIES = int(os.environ.get('MODEL_MAX_RETRIES', 2))  # per model, transient errors only
+    MODEL_RETRY_BASE_DELAY = float(os.environ.get('MODEL_RETRY_BASE_DELAY', 0.5))  # seconds
+
+    # Stub backend behaviour (load testing without network or quota)
+    STUB_LATENCY_DISTRIBUTION = os.environ.get('STUB_LATENCY_DISTRIBUTION', 'constant')  # constant, uniform, normal or lognormal
+    STUB_LATENCY_MS = float(os.environ.get('STUB_LATENCY_MS', 0))
+    STUB_LATENCY_JITTER_MS = float(os.environ.get('STUB_LATENCY_JITTER_MS', 0))
+    STUB_ERROR_RATE = float(os.environ.get('STUB_ERROR_RATE', 0))
+    STUB_SEED = int(os.environ.get('STUB_SEED', 42))
+
+    # Rate limits per artisan (or client address when logged out): token buckets refilled per minute, burst = bucket size, 0 disables
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_TEXT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_TEXT_PER_MINUTE', 20))
+    RATE_LIMIT_TEXT_BURST = int(os.environ.get('RATE_LIMIT_TEXT_BURST', 10))
+    RATE_LIMIT_IMAGE_PER_MINUTE = float(os.environ.get('RATE_LIMIT_IMAGE_PER_MINUTE', 4))
+    RATE_LIMIT_IMAGE_BURST = int(os.environ.get('RATE_LIMIT_IMAGE_BURST', 2))
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))  # in-process buckets kept
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # 'sqlite' shares limits between worker processes
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', 'rate_limits.db')
+    MODEL_MAX_CONCURRENCY = int(os.environ.get('MODEL_MAX_CONCURRENCY', 16))  # model calls in flight, 0 disables
+    MODEL_CONCURRENCY_WAIT_SECONDS = float(os.environ.get('MODEL_CONCURRENCY_WAIT_SECONDS', 2))  # queue this long for a slot before 429
+
+    # Asynchronous generation jobs behind /generate_content
+    JOB_QUEUE_ENABLED = os.environ.get('JOB_QUEUE_ENABLED', 'true').lower() == 'true'
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_BACKOFF_SECONDS = float(os.environ.get('JOB_BACKOFF_SECONDS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))  # renewed every third while a job runs; a stalled worker loses its job after this
+
+    # Responsive derivatives generated for each image (WebP and JPEG at each width)
+    IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '200,400,800').split(',')]
+    IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+
+    # Content-addressed image storage ('local' writes files under IMAGE_STORAGE_PATH)
+    IMAGE_STORAGE_BACKEND = os.environ.get('IMAGE_STORAGE_BACKEND', 'local')
+    IMAGE_STORAGE_PATH = os.environ.get('IMAGE_STORAGE_PATH', os.path.join('static', 'images'))
+    IMAGE_STORAGE_URL_PREFIX = os.environ.get('IMAGE_STORAGE_URL_PREFIX', '/static/images')
+    IMAGE_GC_GRACE_SECONDS = int(os.environ.get('IMAGE_GC_GRACE_SECONDS', 3600))  # unreferenced images younger than this are kept
+    IMAGE_GC_BATCH_SIZE = int(os.environ.get('IMAGE_GC_BATCH_SIZE', 500))
+
+    # Startup: model SDK import, credentials and model clients are warmed up on a background thread after the first request
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+    STARTUP_REPORT = os.environ.get('STARTUP_REPORT', 'false').lower() == 'true'  # print the startup timings once warm-up finishes
+
+    # Instrumentation: Prometheus text at /metrics; TRACE_REQUESTS logs one JSON trace line per request
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    TRACE_REQUESTS = os.environ.get('TRACE_REQUESTS', 'false').lower() == 'true'
+
+    # HTTP caching and compression
+    GENERATED_IMAGE_MAX_AGE = int(os.environ.get('GENERATED_IMAGE_MAX_AGE', 365 * 24 * 3600))  # content-addressed images
+    LEGACY_IMAGE_MAX_AGE = int(os.environ.get('LEGACY_IMAGE_MAX_AGE', 24 * 3600))  # images stored before content addressing
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'  # let nginx/Apache send image files
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))  # bytes
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+    # Artisan profile context cached per artisan for prompt building (LRU, checked against profile_version on each use)
+    PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get('PROFILE_CACHE_MAX_ENTRIES', 1024))
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 300))  # seconds
+    PROFILE_BIO_MAX_TOKENS = int(os.environ.get('PROFILE_BIO_MAX_TOKENS', 120))  # longer bios are shortened in prompts
+
+    # Scheduled pre-generation of product listing and social caption drafts (flask pregenerate-drafts)
+    PREGENERATE_CONCURRENCY = int(os.environ.get('PREGENERATE_CONCURRENCY', 4))  # model calls at once, capped by MODEL_MAX_CONCURRENCY
+    PREGENERATE_BATCH_SIZE = int(os.environ.get('PREGENERATE_BATCH_SIZE', 20))  # products per checkpoint
+
+    # Catalog export/import (/api/export, /api/import/products and the export/import-products commands)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))  # rows per query and streamed chunk
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))  # rows per insert transaction
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 100))  # row errors listed in the report (all are counted)
+
+    # Full-text search (/search)
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_SNIPPET_TOKENS = int(os.environ.get('SEARCH_SNIPPET_TOKENS', 24))  # words of context around matches
+
+    # Rows per dashboard page (keyset pagination)
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 20))
+
+    # Suggest similar approved content before generating (hashed n-gram vectors per artisan, kept in an LRU)
+    SIMILAR_ENABLED = os.environ.get('SIMILAR_ENABLED', 'true').lower() == 'true'
+    SIMILAR_VECTOR_DIM = int(os.environ.get('SIMILAR_VECTOR_DIM', 1024))
+    SIMILAR_MIN_SCORE = float(os.environ.get('SIMILAR_MIN_SCORE', 0.6))  # cosine similarity of the requests
+    SIMILAR_MAX_RESULTS = int(os.environ.get('SIMILAR_MAX_RESULTS', 3))
+    SIMILAR_CACHE_MAX_ARTISANS = int(os.environ.get('SIMILAR_CACHE_MAX_ARTISANS', 256))
+    SIMILAR_CACHE_TTL = int(os.environ.get('SIMILAR_CACHE_TTL', 600))  # seconds
+
+    # Language/tone variants generated together by one /generate_content request (one structured model call)
+    VARIANTS_MAX_ITEMS = int(os.environ.get('VARIANTS_MAX_ITEMS', 6))
+
+    # /api/generate_batch limits
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 100))
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))
+
+    # Generated text response cache (in-process LRU in front of SQLite)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_DB = os.environ.get('RESPONSE_CACHE_DB', 'response_cache.db')  # empty string disables the SQLite tier
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 3600))  # seconds
+    RESPONSE_CACHE_PERSISTENT_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_PERSISTENT_MAX_ENTRIES', 20000))
+    RESPONSE_CACHE_PERSISTENT_TTL = int(os.environ.get('RESPONSE_CACHE_PERSISTENT_TTL', 7 * 24 * 3600))  # seconds
+
     @classmethod
     def get_service_account_credentials(cls):
         """Get service account credentials from .env or file"""
@@ -1,67 +1,99 @@
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from flask import g
 import os
+from config import Config
+from utils.metrics import record_query
 
-DATABASE = 'artisans.db'
+DATABASE = Config.DATABASE_PATH
+
+_local = threading.local()
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that records statement metrics and logs statements slower than Config.SLOW_QUERY_MS"""
+
+    def _timed(self, method, query, args):
+        started = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            elapsed = time.perf_counter() - started
+            record_query(elapsed, query)
+            elapsed_ms = elapsed * 1000
+            if Config.SLOW_QUERY_MS is not None and elapsed_ms >= Config.SLOW_QUERY_MS:
+                print(f"Slow query ({elapsed_ms:.1f}ms): {' '.join(query.split())}")
+
+    def execute(self, query, args=()):
+        return self._timed(super().execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(super().executemany, query, args)
+
+def connect(path=None, isolation_level=''):
+    """Open a connection with WAL journaling, a busy timeout and tuned cache pragmas"""
+    conn = sqlite3.connect(path or DATABASE, timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           isolation_level=isolation_level, factory=TimedConnection,
+                           cached_statements=Config.SQLITE_STATEMENT_CACHE_SIZE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers proceed while a writer commits; NORMAL sync is durable across app crashes in WAL mode
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size = -{int(Config.SQLITE_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA busy_timeout = {int(Config.SQLITE_BUSY_TIMEOUT_MS)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_thread_connection(path=None):
+    """
+    Return this thread's pooled connection for path, opening it on first use.
+    Connections (and their prepared statement caches) are reused across requests.
+    """
+    path = path or DATABASE
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = connect(path)
+    return conn
 
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = get_thread_connection()
     return db
 
 def close_connection(exception):
     db = getattr(g, '_database', None)
     if db is not None:
-        db.close()
-
-def init_db():
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        # Create artisans table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS artisans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                full_name TEXT,
-                craft_type TEXT,
-                location TEXT,
-                bio TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # Create products table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                artisan_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                description TEXT,
-                price REAL,
-                image_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (artisan_id) REFERENCES artisans (id)
-            )
-        ''')
-        # Create generated_content table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS generated_content (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                artisan_id INTEGER NOT NULL,
-                content_type TEXT NOT NULL,  -- 'text' or 'image'
-                prompt TEXT,
-                generated_text TEXT,
-                generated_image_url TEXT,
-                approval_status TEXT DEFAULT 'pending',
-                include_quote INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (artisan_id) REFERENCES artisans (id)
-            )
-        ''')
-        conn.commit()
+        # The connection stays in the thread's pool; just make sure no transaction leaks into the next request
+        if db.in_transaction:
+            db.rollback()
+        g._database = None
+
+@contextmanager
+def transaction():
+    """
+    Group writes into one transaction: commits on success, rolls back on error.
+    insert_db calls inside the block do not commit individually. Nested blocks join the outer one.
+    """
+    db = get_db()
+    depth = getattr(g, '_transaction_depth', 0)
+    g._transaction_depth = depth + 1
+    try:
+        if depth == 0 and not db.in_transaction:
+            db.execute('BEGIN IMMEDIATE')
+        yield db
+        if depth == 0:
+            db.commit()
+    except BaseException:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        g._transaction_depth = depth
 
 def query_db(query, args=(), one=False):
     cur = get_db().execute(query, args)
@@ -72,29 +104,79 @@ def query_db(query, args=(), one=False):
 def insert_db(query, args=()):
     db = get_db()
     cur = db.execute(query, args)
-    db.commit()
+    if not getattr(g, '_transaction_depth', 0):
+        db.commit()
     return cur.lastrowid
 
-def migrate_db():
-    """Migrate the database schema by adding missing columns."""
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        # Add materials column to artisans table if not exists
-        try:
-            cursor.execute("ALTER TABLE artisans ADD COLUMN materials TEXT")
-        except sqlite3.OperationalError:
-            # Column already exists
-            pass
+def insert_many(query, rows):
+    """Bulk insert with executemany in a single transaction. Returns the number of rows inserted."""
+    with transaction() as db:
+        cur = db.executemany(query, rows)
+    return cur.rowcount
 
-        # Add approval_status and include_quote columns to generated_content table
-        try:
-            cursor.execute("ALTER TABLE generated_content ADD COLUMN approval_status TEXT DEFAULT 'pending'")
-        except sqlite3.OperationalError:
-            pass
+# Dashboard queries, newest first with keyset pagination on (created_at, id).
+# {keyset} is replaced by an optional "AND (created_at, id) < (?, ?)" clause.
+DASHBOARD_CONTENT_QUERY = """
+    SELECT id, content_type, generated_text, generated_html, content_hash, generated_image_url, image_variants, created_at
+    FROM generated_content
+    WHERE artisan_id = ? AND approval_status = ? {keyset}
+    ORDER BY created_at DESC, id DESC LIMIT ?
+"""
 
-        try:
-            cursor.execute("ALTER TABLE generated_content ADD COLUMN include_quote INTEGER DEFAULT 1")
-        except sqlite3.OperationalError:
-            pass
+DASHBOARD_PRODUCTS_QUERY = """
+    SELECT id, name, price, created_at
+    FROM products
+    WHERE artisan_id = ? {keyset}
+    ORDER BY created_at DESC, id DESC LIMIT ?
+"""
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the last row of a page"""
+    return f"{row['created_at']}|{row['id']}"
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, or None if it is missing or malformed"""
+    if not cursor or '|' not in cursor:
+        return None
+    created_at, row_id = cursor.rsplit('|', 1)
+    try:
+        return created_at, int(row_id)
+    except ValueError:
+        return None
+
+def keyset_query(query, cursor=None):
+    """Fill in the keyset clause of a paginated query"""
+    return query.format(keyset='AND (created_at, id) < (?, ?)' if cursor else '')
+
+def query_page(query, args, page_size, cursor=None):
+    """Run a keyset-paginated query. Returns (rows, next_cursor); next_cursor is None on the last page."""
+    position = decode_cursor(cursor)
+    page_args = list(args) + (list(position) if position else []) + [page_size + 1]
+    rows = query_db(keyset_query(query, position), page_args)
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+def explain_query_plan(conn, query, args=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, args).fetchall()]
 
-        conn.commit()
+def check_query_plans(conn):
+    """
+    Check that the hot dashboard queries are index searches with no full scan or
+    sort step. Returns a list of problems (empty when every plan is good).
+    """
+    checks = [
+        ('dashboard content', DASHBOARD_CONTENT_QUERY, 3),
+        ('dashboard products', DASHBOARD_PRODUCTS_QUERY, 2),
+    ]
+    problems = []
+    for name, query, arg_count in checks:
+        for cursor in (None, ('2000-01-01 00:00:00', 1)):
+            args = [1] * arg_count + (list(cursor) if cursor else [])
+            plan = explain_query_plan(conn, keyset_query(query, cursor), args)
+            label = f"{name} ({'next page' if cursor else 'first page'})"
+            if not any('USING INDEX' in line or 'USING COVERING INDEX' in line for line in plan):
+                problems.append(f"{label} does not use an index: {plan}")
+            if any(line.startswith('SCAN') or 'TEMP B-TREE' in line for line in plan):
+                problems.append(f"{label} scans or sorts: {plan}")
+    return problems
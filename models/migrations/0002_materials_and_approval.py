@@ -0,0 +1,8 @@
+"""Artisan materials, content approval status and include_quote (formerly fix_db_add_materials.py)"""
+from models.schema import add_column
+
+
+def upgrade(conn):
+    add_column(conn, 'artisans', 'materials', 'TEXT')
+    add_column(conn, 'generated_content', 'approval_status', "TEXT DEFAULT 'pending'")
+    add_column(conn, 'generated_content', 'include_quote', 'INTEGER DEFAULT 1')
@@ -0,0 +1,23 @@
+"""Persistent queue for asynchronous content generation"""
+
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            artisan_id INTEGER,
+            content_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'running', 'done' or 'failed'
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_run_at REAL NOT NULL,
+            locked_until REAL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, next_run_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generation_jobs_content ON generation_jobs (content_id)')
@@ -0,0 +1,7 @@
+"""Pre-rendered markdown HTML stored next to generated_text"""
+from models.schema import add_column
+
+
+def upgrade(conn):
+    add_column(conn, 'generated_content', 'generated_html', 'TEXT')  # pre-rendered markdown of generated_text
+    add_column(conn, 'generated_content', 'content_hash', 'TEXT')  # sha256 of the generated_text that generated_html was rendered from
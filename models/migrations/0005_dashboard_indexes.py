@@ -0,0 +1,6 @@
+"""Secondary indexes for the per-artisan, newest-first dashboard queries"""
+
+
+def upgrade(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generated_content_artisan_status_created ON generated_content (artisan_id, approval_status, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_artisan_created ON products (artisan_id, created_at)')
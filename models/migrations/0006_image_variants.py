@@ -0,0 +1,6 @@
+"""Responsive WebP/JPEG derivatives of generated images"""
+from models.schema import add_column
+
+
+def upgrade(conn):
+    add_column(conn, 'generated_content', 'image_variants', 'TEXT')  # JSON description of resized derivatives
@@ -0,0 +1,14 @@
+"""Reference counts for content-addressed image storage"""
+
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            key TEXT PRIMARY KEY,  -- '<sha256>.<extension>'
+            refcount INTEGER NOT NULL DEFAULT 0,
+            size INTEGER,
+            created_at REAL NOT NULL,
+            orphaned_at REAL  -- when refcount last dropped to zero; NULL while referenced
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_image_blobs_orphaned ON image_blobs (orphaned_at) WHERE refcount <= 0')
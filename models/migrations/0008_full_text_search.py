@@ -0,0 +1,44 @@
+"""FTS5 search indexes over generated content and products, kept in sync by triggers"""
+
+# Each index reads its text from a view over the base table. The extra owner column
+# holds an 'artisan<id>' token so a search is narrowed to one artisan inside the index
+# instead of ranking every artisan's matches and filtering afterwards.
+INDEXES = {
+    'generated_content': ('prompt', 'generated_text'),
+    'products': ('name', 'description'),
+}
+
+# bm25 column weights for ORDER BY rank (owner first, it never contributes)
+RANK = {
+    'generated_content': 'bm25(0.0, 0.5, 1.0)',
+    'products': 'bm25(0.0, 2.0, 1.0)',
+}
+
+TOKENIZE = "porter unicode61 remove_diacritics 2"
+
+
+def upgrade(conn):
+    for table, columns in INDEXES.items():
+        source, index = f'{table}_search_source', f'{table}_fts'
+        column_list = ', '.join(columns)
+        conn.execute(f"""
+            CREATE VIEW IF NOT EXISTS {source} AS
+            SELECT id, 'artisan' || artisan_id AS owner, {column_list} FROM {table}
+        """)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                owner, {column_list}, content='{source}', content_rowid='id', tokenize='{TOKENIZE}', prefix='2 3'
+            )
+        """)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        insert = f"INSERT INTO {index} (rowid, owner, {column_list}) VALUES (new.id, 'artisan' || new.artisan_id, {new_values});"
+        delete = (f"INSERT INTO {index} ({index}, rowid, owner, {column_list}) "
+                  f"VALUES ('delete', old.id, 'artisan' || old.artisan_id, {old_values});")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        # Only changes to indexed columns touch the index (not approval or rendering updates)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF artisan_id, {column_list} ON {table} "
+                     f"BEGIN {delete} {insert} END")
+        conn.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('rank', '{RANK[table]}')")
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
@@ -0,0 +1,14 @@
+"""Link generated content to the product it was drafted for, and checkpoints for resumable batch pipelines"""
+from models.schema import add_column
+
+
+def upgrade(conn):
+    add_column(conn, 'generated_content', 'product_id', 'INTEGER REFERENCES products (id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generated_content_product ON generated_content (product_id, content_type) WHERE product_id IS NOT NULL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_checkpoints (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,  -- last id fully processed; 0 starts a new pass
+            updated_at REAL NOT NULL
+        )
+    ''')
@@ -0,0 +1,10 @@
+"""Sibling language/tone variants of one generation request"""
+from models.schema import add_column
+
+
+def upgrade(conn):
+    # variant_group is the id of the first row generated by the request
+    add_column(conn, 'generated_content', 'variant_group', 'INTEGER')
+    add_column(conn, 'generated_content', 'language', 'TEXT')
+    add_column(conn, 'generated_content', 'tone', 'TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generated_content_variant_group ON generated_content (variant_group) WHERE variant_group IS NOT NULL')
@@ -0,0 +1,14 @@
+"""Artisan profile version, changed by triggers on every profile write so cached prompt context can be checked"""
+from models.schema import add_column
+
+# Columns the cached profile context is built from
+PROFILE_COLUMNS = ('username', 'full_name', 'craft_type', 'location', 'bio', 'materials')
+
+
+def upgrade(conn):
+    add_column(conn, 'artisans', 'profile_version', 'INTEGER NOT NULL DEFAULT 0')
+    # A new row starts from a random version, so a reused id never matches the deleted artisan's context
+    conn.execute("CREATE TRIGGER IF NOT EXISTS artisans_profile_version_insert AFTER INSERT ON artisans "
+                 "BEGIN UPDATE artisans SET profile_version = random() WHERE id = new.id; END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS artisans_profile_version_update AFTER UPDATE OF {', '.join(PROFILE_COLUMNS)} ON artisans "
+                 "BEGIN UPDATE artisans SET profile_version = old.profile_version + 1 WHERE id = new.id; END")
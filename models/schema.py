@@ -0,0 +1,158 @@
+import importlib.util
+import os
+import re
+import sqlite3
+import time
+from config import Config
+from models import database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+
+class SchemaError(Exception):
+    """The database schema is not at the version this code expects"""
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f'migration_{self.version:04d}_{self.name}', self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    @property
+    def description(self):
+        return (self.module.__doc__ or self.name).strip()
+
+    def upgrade(self, conn):
+        self.module.upgrade(conn)
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Migrations found in directory as NNNN_name.py, ordered by version"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise SchemaError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def add_column(conn, table, column, declaration):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there (databases created before migrations)"""
+    if not column_exists(conn, table, column):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    ''')
+
+
+def current_version(conn):
+    """Highest applied migration version, 0 for a new database"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def latest_version(migrations=None):
+    migrations = load_migrations() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+def _connect(path):
+    conn = database.connect(path or database.DATABASE, isolation_level=None)
+    # Wait for another process's migration instead of failing on the lock
+    conn.execute(f'PRAGMA busy_timeout = {int(Config.MIGRATION_LOCK_TIMEOUT_SECONDS * 1000)}')
+    return conn
+
+
+def upgrade(path=None, target=None, migrations=None, log=print):
+    """
+    Apply pending migrations up to target (default: latest). Each migration runs in
+    its own transaction under SQLite's write lock and the version is re-read after the
+    lock is taken, so concurrent workers apply every migration exactly once.
+    Returns the versions applied by this call.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    target = latest_version(migrations) if target is None else target
+    applied = []
+    conn = _connect(path)
+    try:
+        _ensure_version_table(conn)
+        for migration in migrations:
+            if migration.version > target:
+                break
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if current_version(conn) >= migration.version:
+                    conn.execute('COMMIT')
+                    continue
+                started = time.perf_counter()
+                migration.upgrade(conn)
+                conn.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                             [migration.version, migration.name, time.time()])
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            applied.append(migration.version)
+            if log:
+                log(f"Applied migration {migration.version:04d}_{migration.name} ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    finally:
+        conn.close()
+    return applied
+
+
+def status(path=None, migrations=None):
+    """(current version, pending migrations)"""
+    migrations = load_migrations() if migrations is None else migrations
+    conn = _connect(path)
+    try:
+        version = current_version(conn)
+    finally:
+        conn.close()
+    return version, [migration for migration in migrations if migration.version > version]
+
+
+def ensure_schema(path=None, auto_upgrade=None):
+    """
+    Startup check: one version query when the schema is current. Behind it is
+    upgraded when auto_upgrade (Config.MIGRATE_ON_STARTUP) is set, otherwise SchemaError.
+    """
+    auto_upgrade = Config.MIGRATE_ON_STARTUP if auto_upgrade is None else auto_upgrade
+    migrations = load_migrations()
+    version, pending = status(path, migrations)
+    if not pending:
+        return version
+    if not auto_upgrade:
+        raise SchemaError(f"Database schema is at version {version} but {latest_version(migrations)} is required; "
+                          f"run 'flask --app app db-upgrade'")
+    upgrade(path, migrations=migrations)
+    return latest_version(migrations)
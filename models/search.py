@@ -0,0 +1,84 @@
+import re
+from markupsafe import Markup, escape
+from config import Config
+from models.database import query_db
+
+# Private-use characters mark matches in highlight()/snippet() output so the text
+# can be HTML-escaped before the markers become <mark> tags
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+MAX_TERMS = 16
+TERM = re.compile(r'\w+')
+
+SEARCH_QUERIES = {
+    'content': """
+        SELECT c.id, c.content_type, c.approval_status, c.generated_image_url, c.created_at,
+               highlight(generated_content_fts, 1, :start, :end) AS title,
+               snippet(generated_content_fts, 2, :start, :end, '...', :snippet_tokens) AS snippet
+        FROM generated_content_fts
+        JOIN generated_content c ON c.id = generated_content_fts.rowid
+        WHERE generated_content_fts MATCH :match
+        ORDER BY rank LIMIT :limit OFFSET :offset
+    """,
+    'products': """
+        SELECT p.id, p.price, p.image_url, p.created_at,
+               highlight(products_fts, 1, :start, :end) AS title,
+               snippet(products_fts, 2, :start, :end, '...', :snippet_tokens) AS snippet
+        FROM products_fts
+        JOIN products p ON p.id = products_fts.rowid
+        WHERE products_fts MATCH :match
+        ORDER BY rank LIMIT :limit OFFSET :offset
+    """,
+}
+
+SEARCH_COLUMNS = {
+    'content': 'prompt generated_text',
+    'products': 'name description',
+}
+
+
+def fts_query(text):
+    """
+    FTS5 expression for free text typed by a user: every word must match, the last
+    one as a prefix. Words are quoted so FTS5 operators and syntax are never parsed
+    from user input. Returns None when the text has no words.
+    """
+    terms = TERM.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def render_highlight(text):
+    """Escape highlighted index text and turn its match markers into <mark> tags"""
+    if text is None:
+        return None
+    return Markup(str(escape(text)).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
+
+
+def full_text_search(kind, artisan_id, text, page=1, page_size=None):
+    """
+    Ranked full-text search of one artisan's generated content or products.
+    Returns (results, has_next); title and snippet are HTML with matches in <mark>.
+    """
+    page_size = page_size or Config.SEARCH_PAGE_SIZE
+    terms = fts_query(text)
+    if terms is None:
+        return [], False
+    rows = query_db(SEARCH_QUERIES[kind], {
+        'match': f'owner:"artisan{int(artisan_id)}" AND {{{SEARCH_COLUMNS[kind]}}} : ({terms})',
+        'start': MATCH_START,
+        'end': MATCH_END,
+        'snippet_tokens': Config.SEARCH_SNIPPET_TOKENS,
+        'limit': page_size + 1,
+        'offset': (max(page, 1) - 1) * page_size,
+    })
+    results = []
+    for row in rows[:page_size]:
+        result = dict(row)
+        result['title'] = render_highlight(result['title'])
+        result['snippet'] = render_highlight(result['snippet'])
+        results.append(result)
+    return results, len(rows) > page_size
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+import math
+from config import Config
+from models import database
+
+# Columns written by export, in order. Pre-rendered HTML and image derivatives are left
+# out because they are rebuilt from the exported text and image.
+EXPORT_COLUMNS = {
+    'products': ('id', 'name', 'description', 'price', 'image_url', 'created_at'),
+    'generated_content': ('id', 'content_type', 'prompt', 'generated_text', 'generated_image_url',
+                          'approval_status', 'include_quote', 'created_at'),
+}
+
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+PRODUCT_NAME_MAX_LENGTH = 200
+PRODUCT_INSERT = 'INSERT INTO products (artisan_id, name, description, price, image_url) VALUES (?, ?, ?, ?, ?)'
+
+
+def iter_rows(table, artisan_id, batch_size=None, path=None):
+    """
+    Yield batches of an artisan's rows in id order. Each batch is its own keyset query
+    on a dedicated connection, so memory and read snapshots stay bounded however many
+    rows there are.
+    """
+    batch_size = batch_size or Config.EXPORT_BATCH_SIZE
+    columns = ', '.join(EXPORT_COLUMNS[table])
+    conn = database.connect(path)
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute(f'SELECT {columns} FROM {table} WHERE artisan_id = ? AND id > ? ORDER BY id LIMIT ?',
+                                [artisan_id, last_id, batch_size]).fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1]['id']
+    finally:
+        conn.close()
+
+
+def export_jsonl(batches):
+    """One JSON object per line, one chunk per batch"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(row), ensure_ascii=False) + '\n' for row in rows)
+
+
+def export_csv(batches, columns):
+    """CSV with a header row, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_rows(table, artisan_id, fmt, path=None):
+    """Generator of export chunks for an artisan's table in 'jsonl' or 'csv'"""
+    batches = iter_rows(table, artisan_id, path=path)
+    if fmt == 'csv':
+        return export_csv(batches, EXPORT_COLUMNS[table])
+    return export_jsonl(batches)
+
+
+def read_records(stream, fmt):
+    """
+    Yield (line number, record or error message) from a binary stream of JSONL or
+    CSV, one line at a time.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'Invalid JSON: {e}'
+            continue
+        yield line_number, record if isinstance(record, dict) else 'Expected a JSON object'
+
+
+def _optional_text(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value
+
+
+def validate_product(record):
+    """Return (name, description, price, image_url) for an import record, raising ValueError if it is invalid"""
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('name is required')
+    if len(name) > PRODUCT_NAME_MAX_LENGTH:
+        raise ValueError(f'name is longer than {PRODUCT_NAME_MAX_LENGTH} characters')
+    price = record.get('price')
+    if price is not None and price != '':
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            raise ValueError(f'price must be a number, got {price!r}')
+        if not math.isfinite(price) or price < 0:
+            raise ValueError('price must be zero or more')
+    else:
+        price = None
+    return name.strip(), _optional_text(record, 'description'), price, _optional_text(record, 'image_url')
+
+
+def import_products(artisan_id, records, batch_size=None, path=None):
+    """
+    Insert valid product records for an artisan with executemany, one transaction per
+    batch. Invalid records are skipped and reported with their line number. Returns
+    {'imported', 'failed', 'errors'} with at most IMPORT_MAX_ERRORS errors listed.
+    """
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    conn = database.connect(path, isolation_level=None)
+
+    def flush(batch):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(PRODUCT_INSERT, batch)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        report['imported'] += len(batch)
+
+    try:
+        batch = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, str):
+                    raise ValueError(record)
+                batch.append((artisan_id,) + validate_product(record))
+            except ValueError as e:
+                report['failed'] += 1
+                if len(report['errors']) < Config.IMPORT_MAX_ERRORS:
+                    report['errors'].append({'line': line_number, 'error': str(e)})
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        conn.close()
+    return report
@@ -13,5 +13,112 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Poll generation job status on the preview page and reload once it finishes
+    const jobStatus = document.getElementById('job-status');
+    if (jobStatus && jobStatus.dataset.status !== 'failed') {
+        const statusText = jobStatus.querySelector('.job-status-text');
+        const poll = function() {
+            fetch(jobStatus.dataset.statusUrl, {credentials: 'same-origin'})
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'done' || job.status === 'failed') {
+                        window.location.reload();
+                        return;
+                    }
+                    if (statusText) {
+                        const attempt = job.attempts > 1 ? ` (attempt ${job.attempts})` : '';
+                        statusText.textContent = (job.status === 'running' ? 'Generating' : 'Queued') + attempt + '...';
+                    }
+                    setTimeout(poll, 1500);
+                })
+                .catch(() => setTimeout(poll, 3000));
+        };
+        setTimeout(poll, 1000);
+    }
+
+    // Stream text generation into the page as tokens arrive, then open the saved preview
+    const generatorForm = document.getElementById('content-generator-form');
+    if (generatorForm && window.fetch && window.ReadableStream && window.TextDecoder) {
+        generatorForm.addEventListener('submit', function(e) {
+            if (generatorForm.elements['generate_as'].value === 'image') {
+                return;  // Images go through the regular form post and job queue
+            }
+            if (generatorForm.querySelectorAll('input[name="language"]:checked').length > 1 ||
+                generatorForm.querySelectorAll('input[name="tone"]:checked').length > 1) {
+                return;  // Several variants are generated together by the regular form post
+            }
+            e.preventDefault();
+
+            // Approved content for a similar request is offered first, by the regular form post
+            fetch(generatorForm.dataset.similarUrl + '?' + new URLSearchParams(new FormData(generatorForm)), {credentials: 'same-origin'})
+                .then(response => response.ok ? response.json() : {suggestions: []})
+                .catch(() => ({suggestions: []}))
+                .then(result => result.suggestions.length ? generatorForm.submit() : streamGeneration());
+        });
+
+        const streamGeneration = function() {
+            const output = document.getElementById('stream-output');
+            const outputText = output.querySelector('.stream-text');
+            const submitButton = generatorForm.querySelector('button[type="submit"]');
+            outputText.textContent = '';
+            output.classList.remove('d-none');
+            submitButton.disabled = true;
+
+            const handleEvent = function(frame) {
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                });
+                if (!data) {
+                    return;
+                }
+                const payload = JSON.parse(data);
+                if (event === 'token') {
+                    outputText.textContent += payload.text;
+                } else if (event === 'done') {
+                    window.location.href = payload.preview_url;
+                } else if (event === 'error') {
+                    outputText.textContent = payload.error;
+                    output.querySelector('h5').textContent = 'Generation failed';
+                    submitButton.disabled = false;
+                }
+            };
+
+            fetch(generatorForm.dataset.streamUrl, {
+                method: 'POST',
+                body: new FormData(generatorForm),
+                credentials: 'same-origin'
+            }).then(response => {
+                if (!response.ok) {
+                    // Fall back to the regular (queued) form submission
+                    generatorForm.submit();
+                    return;
+                }
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                const read = function() {
+                    return reader.read().then(({done, value}) => {
+                        buffer += decoder.decode(value || new Uint8Array(), {stream: !done});
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                            handleEvent(buffer.slice(0, boundary));
+                            buffer = buffer.slice(boundary + 2);
+                        }
+                        if (!done) {
+                            return read();
+                        }
+                    });
+                };
+                return read();
+            }).catch(() => generatorForm.submit());
+        };
+    }
+
     // Add more interactive features as needed
 });
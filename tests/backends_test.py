@@ -0,0 +1,90 @@
+import pytest
+from utils import ai_helper
+from utils.backends import StubBackend, StubBackendError, set_backend
+from utils.model_router import ModelRouter
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    backend = StubBackend(latency_ms=0, error_rate=0, seed=1)
+    set_backend(backend)
+    monkeypatch.setattr(ai_helper.Config, 'RESPONSE_CACHE_ENABLED', False)
+    monkeypatch.setattr(ai_helper, 'text_router', ModelRouter(ai_helper.TEXT_MODELS, retry_base_delay=0))
+    yield backend
+    set_backend(None)
+
+
+def test_stub_text_is_deterministic():
+    first = StubBackend(latency_ms=0, error_rate=0).generate_text("gemini-1.5-flash", "Handmade pottery", 500)
+    second = StubBackend(latency_ms=0, error_rate=0).generate_text("gemini-1.5-flash", "Handmade pottery", 500)
+    other = StubBackend(latency_ms=0, error_rate=0).generate_text("gemini-1.5-flash", "Woven baskets", 500)
+    assert first == second
+    assert first != other
+
+
+def test_stub_image_is_png():
+    image_bytes = StubBackend(latency_ms=0, error_rate=0).generate_image("imagen-3.0-generate-001", "A clay pot", "16:9")
+    assert image_bytes.startswith(b"\x89PNG")
+    assert image_bytes == StubBackend(latency_ms=0, error_rate=0).generate_image("imagen-3.0-generate-001", "A clay pot", "16:9")
+
+
+def test_stub_error_injection():
+    backend = StubBackend(latency_ms=0, error_rate=1)
+    with pytest.raises(StubBackendError):
+        backend.generate_text("gemini-1.5-flash", "Handmade pottery", 500)
+
+
+def test_generate_text_goes_through_backend(stub_backend):
+    text = ai_helper.generate_craft_story("Pottery with description: blue glaze")
+    assert "Stub response" in text
+    assert "gemini-1.5-flash" in text
+
+
+def test_generate_text_reports_backend_errors(stub_backend):
+    stub_backend.error_rate = 1
+    assert ai_helper.generate_text("Handmade pottery").startswith("Error generating text:")
+
+
+def test_stream_text_matches_generate_text(stub_backend):
+    chunks = list(ai_helper.stream_text("Handmade pottery"))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == ai_helper.generate_text("Handmade pottery")
+
+
+def test_stream_text_raises_on_error(stub_backend):
+    stub_backend.error_rate = 1
+    with pytest.raises(ai_helper.GenerationError):
+        list(ai_helper.stream_text("Handmade pottery"))
+
+
+def test_vertex_client_manager_caches_bound_models(monkeypatch):
+    from utils.vertex_clients import VertexClientManager, APIKeyCredentials, API_KEY
+    monkeypatch.setattr(ai_helper.Config, 'VERTEX_AI_API_KEY', 'test-key')
+    monkeypatch.setattr(ai_helper.Config, 'GOOGLE_SERVICE_ACCOUNT_JSON', None)
+    monkeypatch.setattr(ai_helper.Config, 'GOOGLE_SERVICE_ACCOUNT_KEY_B64', None)
+    manager = VertexClientManager()
+    model = manager.text_model("gemini-1.5-flash")
+    assert manager.text_model("gemini-1.5-flash") is model
+    assert manager.credential_kinds()[0] == API_KEY
+    assert isinstance(manager.get_credentials(API_KEY), APIKeyCredentials)
+    assert manager.get_credentials(API_KEY) is manager.get_credentials(API_KEY)
+
+
+def test_stream_bad_request_releases_a_half_open_trial(stub_backend, monkeypatch):
+    from google.api_core import exceptions as google_exceptions
+    router = ModelRouter(["flash"], failure_threshold=1, cooldown_seconds=0, retry_base_delay=0)
+    monkeypatch.setattr(ai_helper, 'text_router', router)
+    monkeypatch.setattr(ai_helper, 'TEXT_MODELS', ["flash"])
+    router.record_failure("flash", google_exceptions.ServiceUnavailable("down"))
+
+    def bad_request(model_name, prompt, max_tokens):
+        raise google_exceptions.InvalidArgument("prompt too long")
+        yield
+
+    monkeypatch.setattr(stub_backend, 'stream_text', bad_request)
+    with pytest.raises(ai_helper.GenerationError) as error:
+        list(ai_helper.stream_text("Handmade pottery"))
+    assert isinstance(error.value.__cause__, google_exceptions.InvalidArgument)
+    # The trial slot is free again, so the next request may still try the model
+    assert router.snapshot()['models']['flash']['state'] == 'half_open'
+    assert router.ordered_models() == ["flash"]
@@ -0,0 +1,62 @@
+import time
+import pytest
+from config import Config
+
+
+def item(kind, craft_type='Pottery', description='Blue glazed vases'):
+    return {'kind': kind, 'craft_type': craft_type, 'description': description}
+
+
+def test_results_come_back_in_input_order(client, backend, monkeypatch):
+    generate_text = backend.generate_text
+
+    def slow_first(model_name, prompt, max_tokens):
+        # The first item finishes last
+        if 'Weaving' in prompt:
+            time.sleep(0.2)
+        return generate_text(model_name, prompt, max_tokens)
+
+    monkeypatch.setattr(backend, 'generate_text', slow_first)
+    items = [item('craft_story', 'Weaving'), item('marketing_copy'), item('social_media_post'), item('product_visual')]
+    response = client.post('/api/generate_batch', json={'items': items})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['count'] == 4 and data['errors'] == 0
+    assert [result['index'] for result in data['results']] == [0, 1, 2, 3]
+    assert [result['kind'] for result in data['results']] == ['craft_story', 'marketing_copy', 'social_media_post', 'product_visual']
+    assert 'Weaving' in data['results'][0]['craft_story']
+    assert 'Stub response' in data['results'][3]['product_visual_description']
+    assert data['results'][0]['elapsed_ms'] >= 200
+    assert all(result['elapsed_ms'] < data['results'][0]['elapsed_ms'] for result in data['results'][1:])
+
+
+def test_invalid_items_get_their_own_errors(client):
+    items = [item('poem'), {'kind': 'craft_story', 'craft_type': 'Pottery'}, 'craft_story', item('craft_story')]
+    data = client.post('/api/generate_batch', json=items).get_json()
+    assert data['count'] == 4 and data['errors'] == 3
+    unknown, missing, not_object, ok = data['results']
+    assert unknown['error'].startswith("Unknown kind 'poem'")
+    assert missing['error'] == 'Missing craft_type or description'
+    assert not_object == {'index': 2, 'kind': None, 'error': 'Item must be an object', 'elapsed_ms': not_object['elapsed_ms']}
+    assert 'error' not in ok and ok['craft_story']
+    assert all('elapsed_ms' in result for result in data['results'])
+
+
+@pytest.mark.parametrize('requested, expected', [(None, 2), ('1', 1), ('50', 2), ('0', 1)])
+def test_concurrency_can_be_lowered_but_not_raised(client, monkeypatch, requested, expected):
+    monkeypatch.setattr(Config, 'BATCH_CONCURRENCY', 2)
+    url = '/api/generate_batch' if requested is None else f'/api/generate_batch?concurrency={requested}'
+    data = client.post(url, json=[item('craft_story')] * 3).get_json()
+    assert data['concurrency'] == expected
+    assert data['errors'] == 0
+
+
+def test_oversized_and_malformed_batches_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_MAX_ITEMS', 2)
+    response = client.post('/api/generate_batch', json=[item('craft_story')] * 3)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Too many items, the maximum is 2'
+
+    for body in ({'items': 'craft_story'}, {'kind': 'craft_story'}, [], 'craft_story'):
+        assert client.post('/api/generate_batch', json=body).status_code == 400
+    assert client.post('/api/generate_batch', data='not json', content_type='application/json').status_code == 400
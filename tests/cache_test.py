@@ -0,0 +1,56 @@
+import time
+from utils.cache import MemoryCache, SQLiteCache, ResponseCache, make_cache_key
+
+
+def test_cache_key_normalizes_whitespace():
+    assert make_cache_key("Handmade  pottery\n", "gemini-1.5-flash", 500) == make_cache_key("Handmade pottery", "gemini-1.5-flash", 500)
+    assert make_cache_key("Handmade pottery", "gemini-1.5-flash", 500) != make_cache_key("Handmade pottery", "gemini-1.5-pro", 500)
+    assert make_cache_key("Handmade pottery", "gemini-1.5-flash", 500) != make_cache_key("Handmade pottery", "gemini-1.5-flash", 200)
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.evictions == 1
+
+    cache.set("d", "4", ttl=-1)
+    assert cache.get("d") is None
+
+
+def test_response_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(MemoryCache(10, 60), SQLiteCache(path, 60, 100))
+    assert cache.get("Write a story", ["gemini-1.5-flash", "gemini-1.5-pro"], 500) is None
+    cache.set("Write a story", "gemini-1.5-pro", 500, "Once upon a time")
+
+    restarted = ResponseCache(MemoryCache(10, 60), SQLiteCache(path, 60, 100))
+    assert restarted.get("Write  a story", ["gemini-1.5-flash", "gemini-1.5-pro"], 500) == "Once upon a time"
+    assert restarted.get("Write a story", ["gemini-1.5-pro"], 500) == "Once upon a time"
+    stats = restarted.stats()
+    assert stats['persistent_hits'] == 1
+    assert stats['memory_hits'] == 1
+    assert stats['misses'] == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_persistent_entries_expire(tmp_path):
+    persistent = SQLiteCache(str(tmp_path / "cache.db"), -1, 100)
+    persistent.set("key", "gemini-1.5-flash", "value")
+    time.sleep(0.01)
+    assert persistent.get("key") == (None, None)
+    assert persistent.evictions == 1
+
+
+def test_json_and_text_responses_are_cached_apart():
+    assert make_cache_key("Write a story", "gemini-1.5-flash", 500) != make_cache_key("Write a story", "gemini-1.5-flash", 500, 'json')
+    cache = ResponseCache(MemoryCache(10, 60))
+    cache.set("Write a story", "gemini-1.5-flash", 500, "Once upon a time")
+    assert cache.get("Write a story", ["gemini-1.5-flash"], 500, 'json') is None
+    cache.set("Write a story", "gemini-1.5-flash", 500, '{"text": "Once"}', 'json')
+    assert cache.get("Write a story", ["gemini-1.5-flash"], 500) == "Once upon a time"
+    assert cache.get("Write a story", ["gemini-1.5-flash"], 500, 'json') == '{"text": "Once"}'
@@ -0,0 +1,85 @@
+import itertools
+import pytest
+from config import Config
+from flask import Flask
+from models import database, schema
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Path of a migrated SQLite database that models.database uses for the test"""
+    path = str(tmp_path / "artisans.db")
+    monkeypatch.setattr(database, 'DATABASE', path)
+    schema.upgrade(log=None)
+    return path
+
+
+@pytest.fixture
+def app(db):
+    """Bare Flask app whose app context gives get_db/query_db the test database"""
+    app = Flask(__name__)
+    app.teardown_appcontext(database.close_connection)
+    return app
+
+
+@pytest.fixture
+def make_artisan(db):
+    """make_artisan(artisan_id=None, username=None, **profile columns) inserts an artisan and returns its id"""
+    numbers = itertools.count(1)
+
+    def make(artisan_id=None, username=None, password_hash='x', **profile):
+        username = username or f'artisan{artisan_id or next(numbers)}'
+        columns = {'id': artisan_id, 'username': username, 'email': f'{username}@example.com',
+                   'password_hash': password_hash, **profile}
+        conn = database.connect()
+        try:
+            cur = conn.execute(f"INSERT INTO artisans ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                               list(columns.values()))
+            conn.commit()
+        finally:
+            conn.close()
+        return cur.lastrowid
+
+    return make
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Instant, deterministic stub model backend behind a fresh text model router, without the response cache"""
+    from utils import ai_helper
+    from utils.backends import StubBackend, set_backend
+    from utils.model_router import ModelRouter
+
+    backend = StubBackend(latency_ms=0, error_rate=0, seed=1)
+    set_backend(backend)
+    monkeypatch.setattr(Config, 'RESPONSE_CACHE_ENABLED', False)
+    monkeypatch.setattr(ai_helper, 'text_router', ModelRouter(ai_helper.TEXT_MODELS, retry_base_delay=0))
+    yield backend
+    set_backend(None)
+
+
+@pytest.fixture
+def web_app(db, backend, monkeypatch):
+    """The application on the test database, generating inline (no job workers, warm-up or rate limits)"""
+    for name in ('JOB_QUEUE_ENABLED', 'WARMUP_ENABLED', 'RATE_LIMIT_ENABLED'):
+        monkeypatch.setattr(Config, name, False)
+    # Imported here so the module-level app's schema check runs against the test database
+    import app as app_module
+    from utils.profile_context import get_profile_cache
+    from utils.similar import get_similar_index
+
+    get_profile_cache().clear()
+    get_similar_index().clear()
+    web_app = app_module.create_app('development')
+    web_app.config['TESTING'] = True
+    return web_app
+
+
+@pytest.fixture
+def client(web_app, make_artisan):
+    """Test client logged in as a new artisan, whose id is client.artisan_id"""
+    client = web_app.test_client()
+    client.artisan_id = make_artisan(full_name='Meera Devi', craft_type='Pottery', location='Jaipur')
+    with client.session_transaction() as sess:
+        sess['user_id'] = client.artisan_id
+    return client
@@ -0,0 +1,77 @@
+import sqlite3
+import pytest
+from models import database
+
+
+@pytest.fixture
+def db_app(app):
+    with app.app_context():
+        yield app
+
+
+def test_dashboard_query_plans_use_indexes(db_app):
+    assert database.check_query_plans(database.get_db()) == []
+
+
+def test_query_plan_check_catches_missing_index(db_app):
+    db = database.get_db()
+    db.execute('DROP INDEX idx_generated_content_artisan_status_created')
+    problems = database.check_query_plans(db)
+    assert problems
+    assert all('dashboard content' in problem for problem in problems)
+
+
+def test_keyset_pagination_walks_all_rows(db_app):
+    db = database.get_db()
+    # Several rows share a timestamp so the id tie-breaker matters
+    rows = [(1, 'ad_copy', f'text {i}', 'approved', f'2024-01-0{1 + i // 3} 10:00:00') for i in range(8)]
+    rows.append((2, 'ad_copy', 'other artisan', 'approved', '2024-01-01 10:00:00'))
+    db.executemany('INSERT INTO generated_content (artisan_id, content_type, generated_text, approval_status, created_at) VALUES (?, ?, ?, ?, ?)', rows)
+    db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = database.query_page(database.DASHBOARD_CONTENT_QUERY, [1, 'approved'], 3, cursor)
+        seen.extend(row['id'] for row in page)
+        if cursor is None:
+            break
+    assert seen == [8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_malformed_cursor_returns_first_page(db_app):
+    page, cursor = database.query_page(database.DASHBOARD_CONTENT_QUERY, [1, 'approved'], 3, 'garbage')
+    assert page == [] and cursor is None
+
+
+def test_connection_is_tuned_and_pooled(db_app):
+    db = database.get_db()
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db.execute('PRAGMA busy_timeout').fetchone()[0] == database.Config.SQLITE_BUSY_TIMEOUT_MS
+    assert database.get_thread_connection() is db
+
+
+def test_transaction_groups_writes(db_app):
+    with database.transaction():
+        database.insert_db('INSERT INTO products (artisan_id, name) VALUES (?, ?)', [1, 'Vase'])
+        database.insert_db('INSERT INTO products (artisan_id, name) VALUES (?, ?)', [1, 'Bowl'])
+    assert len(database.query_db('SELECT id FROM products')) == 2
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with database.transaction():
+            database.insert_db('INSERT INTO products (artisan_id, name) VALUES (?, ?)', [1, 'Plate'])
+            database.insert_db('INSERT INTO products (artisan_id, name) VALUES (?, ?)', [1, None])
+    assert len(database.query_db('SELECT id FROM products')) == 2
+
+
+def test_insert_many(db_app):
+    count = database.insert_many('INSERT INTO products (artisan_id, name, price) VALUES (?, ?, ?)',
+                                 [(1, f'Item {i}', i) for i in range(50)])
+    assert count == 50
+    assert database.query_db('SELECT COUNT(*) AS n FROM products', one=True)['n'] == 50
+
+
+def test_slow_query_log(db_app, monkeypatch, capsys):
+    monkeypatch.setattr(database.Config, 'SLOW_QUERY_MS', 0)
+    database.query_db('SELECT id FROM products')
+    assert 'Slow query' in capsys.readouterr().out
@@ -0,0 +1,57 @@
+import gzip
+import pytest
+from flask import Flask, jsonify, request
+from utils.delivery import compress_response, image_response
+from utils.storage import ImageStore, LocalStorage
+
+
+@pytest.fixture
+def client(db, tmp_path):
+    store = ImageStore(LocalStorage(str(tmp_path / "images"), '/static/images'))
+    app = Flask(__name__)
+    app.store = store
+
+    @app.route('/static/images/<key>')
+    def generated_image(key):
+        return image_response(store, key)
+
+    @app.route('/api/data')
+    def data():
+        return jsonify(items=['handwoven basket'] * 200)
+
+    app.after_request(lambda response: compress_response(request, response))
+    return app.test_client()
+
+
+def test_content_addressed_image_is_immutable_and_conditional(client):
+    key = client.application.store.put(b'image bytes ' * 100, 'png')
+    response = client.get(f'/static/images/{key}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{key.split(".")[0]}"'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+
+    assert client.get(f'/static/images/{key}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    partial = client.get(f'/static/images/{key}', headers={'Range': 'bytes=0-4'})
+    assert partial.status_code == 206
+    assert partial.data == b'image'
+
+
+def test_legacy_and_missing_images(client):
+    client.application.store.backend.put('legacy.png', b'old image')
+    response = client.get('/static/images/legacy.png')
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert client.get('/static/images/missing.png').status_code == 404
+
+
+def test_json_is_compressed_and_revalidated(client):
+    response = client.get('/api/data', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'handwoven basket' in gzip.decompress(response.data)
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    cached = client.get('/api/data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert 'Content-Encoding' not in client.get('/api/data').headers
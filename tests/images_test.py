@@ -0,0 +1,37 @@
+import io
+from PIL import Image
+from config import Config
+from utils.images import create_variants, load_variants, srcset, variant_urls
+
+
+def make_png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_create_variants_resizes_without_upscaling(monkeypatch):
+    monkeypatch.setattr(Config, 'IMAGE_VARIANT_WIDTHS', [200, 400, 1600])
+    saved = []
+
+    def save(data, extension):
+        saved.append(data)
+        return f"/static/images/{len(saved)}.{extension}"
+
+    variants = create_variants(make_png(800, 600), save)
+
+    assert variants['width'] == 800 and variants['height'] == 600
+    assert [v['width'] for v in variants['webp']] == [200, 400, 800]
+    assert [v['width'] for v in variants['jpeg']] == [200, 400, 800]
+    assert variants['thumbnail'] == '/static/images/4.jpg'
+    assert len(saved) == 6
+    with Image.open(io.BytesIO(saved[0])) as image:
+        assert image.format == 'WEBP' and image.size == (200, 150)
+    assert srcset(variants, 'jpeg') == '/static/images/4.jpg 200w, /static/images/5.jpg 400w, /static/images/6.jpg 800w'
+    assert len(variant_urls(variants)) == 6
+
+
+def test_load_variants_tolerates_missing_or_bad_values():
+    assert load_variants(None) is None
+    assert load_variants('not json') is None
+    assert load_variants('{"webp": []}') == {'webp': []}
@@ -0,0 +1,93 @@
+import time
+import pytest
+from utils.jobs import JobQueue
+
+
+@pytest.fixture
+def queue(app, db):
+    queue = JobQueue(app, db, workers=2, max_attempts=3, backoff_seconds=0.01, poll_interval=0.05, lease_seconds=60)
+    yield queue
+    queue.stop()
+
+
+def wait_for(queue, job_id, statuses=('done', 'failed'), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {queue.get(job_id)}")
+
+
+def test_job_runs_and_stores_result(queue):
+    queue.register('echo', lambda payload: {'echo': payload['value']})
+    queue.start()
+    job = wait_for(queue, queue.enqueue('echo', {'value': 7}))
+    assert job['status'] == 'done'
+    assert job['result'] == '{"echo": 7}'
+    assert job['attempts'] == 1
+
+
+def test_job_retries_then_fails(queue):
+    calls = []
+
+    def flaky(payload):
+        calls.append(1)
+        if len(calls) < 2:
+            raise RuntimeError("503 Service Unavailable")
+        return {}
+
+    queue.register('flaky', flaky)
+    queue.register('broken', lambda payload: 1 / 0)
+    queue.start()
+    assert wait_for(queue, queue.enqueue('flaky', {}))['attempts'] == 2
+    failed = wait_for(queue, queue.enqueue('broken', {}))
+    assert failed['status'] == 'failed'
+    assert failed['attempts'] == 3
+    assert 'division by zero' in failed['error']
+
+
+def test_expired_lease_is_recovered(queue):
+    queue.register('echo', lambda payload: {})
+    job_id = queue.enqueue('echo', {})
+    # Simulate a worker that crashed mid-job
+    queue._update(job_id, status='running', attempts=1, locked_until=time.time() - 1)
+    queue.start()
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'done'
+    assert job['attempts'] == 2
+
+
+def test_lease_is_renewed_while_the_handler_runs(app, db):
+    queue = JobQueue(app, db, workers=2, poll_interval=0.05, lease_seconds=0.3)
+    calls = []
+    queue.register('slow', lambda payload: calls.append(1) or time.sleep(1) or {})
+    try:
+        queue.start()
+        job = wait_for(queue, queue.enqueue('slow', {}))
+    finally:
+        queue.stop()
+    # Without the heartbeat the lease would expire and a second worker would run the job again
+    assert job['status'] == 'done'
+    assert job['attempts'] == 1 and calls == [1]
+
+
+def test_outcome_is_discarded_after_losing_the_lease(queue):
+    job_ids = []
+
+    def overtaken(payload):
+        # Another worker recovers the job, as if this one had stalled past its lease
+        queue._update(job_ids[0], attempts=2, locked_until=time.time() + 600)
+        return {'written': True}
+
+    queue.register('overtaken', overtaken)
+    job_ids.append(queue.enqueue('overtaken', {}))
+    queue.start()
+    deadline = time.time() + 5
+    while queue.get(job_ids[0])['attempts'] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.2)
+    job = queue.get(job_ids[0])
+    assert job['status'] == 'running'
+    assert job['result'] is None and job['locked_until'] > time.time()
@@ -0,0 +1,66 @@
+import pytest
+from models import database
+from utils.markdown_render import content_hash, render_content
+
+
+@pytest.fixture
+def add_content(web_app, client):
+    """add_content(text, status='pending', html=None, text_hash=None) stores a generated_content row of the client's artisan"""
+    def add(text, status='pending', html=None, text_hash=None):
+        with web_app.app_context():
+            return database.insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text, generated_html, content_hash, approval_status) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                      [client.artisan_id, 'social_caption', 'vases', text, html, text_hash, status])
+    return add
+
+
+def stored(web_app, content_id):
+    with web_app.app_context():
+        return database.query_db('SELECT generated_text, generated_html, content_hash, approval_status FROM generated_content WHERE id = ?',
+                                 [content_id], one=True)
+
+
+def test_approving_stores_the_rendered_html(web_app, client, add_content):
+    content_id = add_content('**Blue** vases')
+    response = client.post(f'/preview/{content_id}', data={'action': 'approve'})
+    assert response.status_code == 302
+    row = stored(web_app, content_id)
+    assert row['approval_status'] == 'approved'
+    assert row['generated_html'] == '<p><strong>Blue</strong> vases</p>'
+    assert row['content_hash'] == content_hash('**Blue** vases')
+
+
+def test_editing_stores_the_rendered_html(web_app, client, add_content):
+    content_id = add_content('**Blue** vases', html='<p><strong>Blue</strong> vases</p>', text_hash=content_hash('**Blue** vases'))
+    assert client.post(f'/preview/{content_id}', data={'action': 'edit', 'generated_text': '*Green* cups'}).status_code == 200
+    row = stored(web_app, content_id)
+    assert (row['generated_text'], row['generated_html']) == ('*Green* cups', '<p><em>Green</em> cups</p>')
+    assert row['content_hash'] == content_hash('*Green* cups')
+
+
+def test_dashboard_uses_stored_html_only_while_its_hash_matches(client, add_content):
+    add_content('**Blue** vases', status='approved', html='<p>stored blue</p>', text_hash=content_hash('**Blue** vases'))
+    # Text changed after its HTML was stored
+    add_content('*Green* cups', status='approved', html='<p>stored green</p>', text_hash=content_hash('*Red* cups'))
+    page = client.get('/dashboard').get_data(as_text=True)
+    assert '<p>stored blue</p>' in page
+    assert 'stored green' not in page and '<em>Green</em> cups' in page
+
+
+def test_backfill_renders_rows_without_stored_html(web_app, add_content):
+    missing = add_content('**Blue** vases', status='approved')
+    stale = add_content('*Green* cups', status='approved', html='<p>old</p>', text_hash=content_hash('old'))
+    current = add_content('Clay', status='approved', html='<p>kept</p>', text_hash=content_hash('Clay'))
+    image = add_content(None)
+
+    result = web_app.test_cli_runner().invoke(args=['backfill-markdown', '--batch-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'Rendered markdown for 2 row(s)'
+    for content_id, text in ((missing, '**Blue** vases'), (stale, '*Green* cups')):
+        row = stored(web_app, content_id)
+        assert (row['generated_html'], row['content_hash']) == render_content(text)
+    assert stored(web_app, current)['generated_html'] == '<p>kept</p>'
+    assert stored(web_app, image)['generated_html'] is None
+
+    result = web_app.test_cli_runner().invoke(args=['backfill-markdown', '--force'])
+    assert result.output.strip() == 'Rendered markdown for 3 row(s)'
+    assert stored(web_app, current)['generated_html'] == '<p>Clay</p>'
@@ -0,0 +1,64 @@
+from flask import Flask, g, request
+from google.api_core import exceptions as google_exceptions
+from models import database
+from utils import metrics
+from utils.metrics import Counter, Histogram, Registry, trace_span
+from utils.model_router import ModelRouter
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    requests.inc(route='/a')
+    requests.inc(2, route='/a')
+    latency.observe(0.1)
+    latency.observe(5)
+    registry.add_collector(lambda: [('open', 'gauge', 'Open circuits', [({'model': 'm"1'}, 1)])])
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{route="/a"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert 'open{model="m\\"1"} 1' in lines
+
+
+def test_request_hooks_count_queries_and_trace(app, monkeypatch, capsys):
+    monkeypatch.setattr(metrics.Config, 'TRACE_REQUESTS', True)
+    monkeypatch.setattr(metrics, 'SQLITE_REQUEST_QUERIES', Histogram('q', 'q', ('route',), metrics.COUNT_BUCKETS))
+    database.get_thread_connection()  # opening the pooled connection would add its PRAGMA statements
+    app.before_request(metrics.begin_request)
+    app.after_request(lambda response: metrics.end_request(request, response))
+
+    @app.route('/items/<int:item_id>')
+    def item(item_id):
+        with trace_span('lookup', item=item_id):
+            database.query_db('SELECT * FROM artisans WHERE id = ?', [item_id])
+            database.query_db('SELECT * FROM products WHERE id = ?', [item_id])
+        return str(g._query_count)
+
+    assert app.test_client().get('/items/7').data == b'2'
+    assert metrics.SQLITE_REQUEST_QUERIES.count(route='/items/<int:item_id>') == 1
+    trace = capsys.readouterr().out
+    assert '"route": "/items/<int:item_id>"' in trace
+    assert '"name": "lookup"' in trace and '"item": 7' in trace
+    assert '"sqlite_queries": 2' in trace
+
+
+def test_router_records_model_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, 'MODEL_ERRORS', Counter('e', 'e', ('model', 'reason')))
+    monkeypatch.setattr('utils.model_router.MODEL_ERRORS', metrics.MODEL_ERRORS)
+    monkeypatch.setattr('utils.model_router.MODEL_FALLBACKS', Counter('f', 'f'))
+    router = ModelRouter(['flash', 'pro'], max_retries=0, retry_base_delay=0, timeout_seconds=0)
+
+    def call(model_name):
+        if model_name == 'flash':
+            raise google_exceptions.NotFound('model not available')
+        return 'ok'
+
+    assert router.call(call) == ('ok', 'pro')
+    assert metrics.MODEL_ERRORS.value(model='flash', reason='unavailable') == 1
+    assert router.fallbacks == 1
@@ -0,0 +1,140 @@
+import grpc
+import pytest
+from google.api_core import exceptions as google_exceptions
+from utils.backends import StubBackendError
+from utils.model_router import (ModelRouter, ModelUnavailableError, ModelCallTimeout, OPEN, HALF_OPEN, CLOSED,
+                                is_transient_error, is_unavailable_error)
+
+
+def make_router(**kwargs):
+    options = dict(failure_threshold=2, cooldown_seconds=60, retry_base_delay=0, max_retries=1, timeout_seconds=0)
+    options.update(kwargs)
+    return ModelRouter(["flash", "pro"], **options)
+
+
+def test_unavailable_model_is_skipped_until_cooldown():
+    router = make_router()
+    calls = []
+
+    def call(model_name):
+        calls.append(model_name)
+        if model_name == "flash":
+            raise google_exceptions.NotFound("Publisher model flash is not available")
+        return "ok"
+
+    assert router.call(call) == ("ok", "pro")
+    assert router.call(call) == ("ok", "pro")
+    # The second request no longer pays for the doomed round-trip
+    assert calls == ["flash", "pro", "pro"]
+    snapshot = router.snapshot()
+    assert snapshot['models']['flash']['state'] == OPEN
+    assert snapshot['fallbacks'] == 1
+
+
+def test_transient_errors_retry_then_open_circuit():
+    router = make_router()
+    attempts = []
+
+    def call(model_name):
+        attempts.append(model_name)
+        if model_name == "flash":
+            raise google_exceptions.ServiceUnavailable("Service Unavailable")
+        return "ok"
+
+    assert router.call(call) == ("ok", "pro")
+    assert attempts == ["flash", "flash", "pro"]
+    assert router.snapshot()['models']['flash']['state'] == OPEN
+
+
+def test_half_open_trial_closes_circuit():
+    router = make_router(cooldown_seconds=0)
+    router.record_failure("flash", google_exceptions.ServiceUnavailable("Service Unavailable"))
+    router.record_failure("flash", google_exceptions.ServiceUnavailable("Service Unavailable"))
+    assert router.snapshot()['models']['flash']['state'] == OPEN
+    # The recovering model gets its trial request, but behind the healthy one
+    assert router.ordered_models() == ["pro", "flash"]
+    assert router.snapshot()['models']['flash']['state'] == HALF_OPEN
+    # Only one trial request is let through while half-open
+    assert router.ordered_models() == ["pro"]
+    router.record_success("flash", 10)
+    assert router.snapshot()['models']['flash']['state'] == CLOSED
+
+
+def test_bad_request_is_not_retried_or_counted():
+    router = make_router()
+    with pytest.raises(ValueError):
+        router.call(lambda model_name: (_ for _ in ()).throw(ValueError("400 invalid argument")))
+    assert router.snapshot()['models']['flash']['failures'] == 0
+
+
+def test_all_circuits_open():
+    router = make_router()
+    for name in ("flash", "pro"):
+        router.record_failure(name, google_exceptions.NotFound("Not found"))
+    with pytest.raises(ModelUnavailableError):
+        router.call(lambda model_name: "ok")
+
+
+def test_timeout_counts_as_transient():
+    import time
+    router = make_router(timeout_seconds=0.05, max_retries=0)
+
+    def call(model_name):
+        if model_name == "flash":
+            time.sleep(0.2)
+        return model_name
+
+    assert router.call(call) == ("pro", "pro")
+    assert "timed out" in router.snapshot()['models']['flash']['recent_errors'][0]
+
+
+def test_errors_are_classified_by_status_not_message():
+    # google.api_core exceptions carry an HTTP status and a gRPC status name
+    assert is_transient_error(google_exceptions.TooManyRequests("quota"))
+    assert is_transient_error(google_exceptions.DeadlineExceeded("slow"))
+    assert is_transient_error(google_exceptions.ResourceExhausted("quota"))
+    assert is_unavailable_error(google_exceptions.NotFound("no such model"))
+    assert not is_transient_error(google_exceptions.InvalidArgument("prompt mentions 500 vases and 429 bowls"))
+    assert not is_unavailable_error(google_exceptions.InvalidArgument("404 characters is too long"))
+    assert not is_transient_error(ValueError("503 Service Unavailable"))
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(StubBackendError("injected"))
+
+    class RpcError(Exception):
+        def code(self):
+            return grpc.StatusCode.UNAVAILABLE
+
+    assert is_transient_error(RpcError())
+
+
+def test_timed_out_calls_are_counted_and_bounded(monkeypatch):
+    import threading
+    import time
+    from utils.metrics import Counter
+    abandoned = Counter('a', 'a', ('model',))
+    monkeypatch.setattr('utils.model_router.MODEL_CALLS_ABANDONED', abandoned)
+    router = ModelRouter(["flash"], timeout_seconds=0.05, max_retries=0, retry_base_delay=0, failure_threshold=10,
+                         max_abandoned_calls=1)
+    release = threading.Event()
+    calls = []
+
+    def call(model_name):
+        calls.append(model_name)
+        release.wait(5)
+        return model_name
+
+    with pytest.raises(ModelCallTimeout, match="timed out"):
+        router.call(call)
+    assert abandoned.value(model="flash") == 1
+    assert router.snapshot()['models']['flash']['abandoned_calls'] == 1
+    # The hung call still holds its thread, so the next one fails fast instead of taking another
+    with pytest.raises(ModelCallTimeout, match="1 timed-out calls still running"):
+        router.call(call)
+    assert calls == ["flash"]
+
+    release.set()
+    deadline = time.time() + 5
+    while router.snapshot()['models']['flash']['abandoned_calls'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert router.snapshot()['models']['flash']['abandoned_calls'] == 0
+    assert router.call(call) == ("flash", "flash")
@@ -0,0 +1,85 @@
+import pytest
+from models import database
+from utils.pregenerate import load_checkpoint, pregenerate_drafts, product_prompt
+
+
+@pytest.fixture
+def app(app, make_artisan):
+    make_artisan(1, 'meera')
+    with app.app_context():
+        for name in ('Blue vase', 'Brass diya', 'Clay cup'):
+            database.insert_db('INSERT INTO products (artisan_id, name, description, price) VALUES (1, ?, ?, ?)', [name, 'Handmade', 10])
+        # Product of an artisan that no longer exists
+        database.insert_db("INSERT INTO products (artisan_id, name) VALUES (99, 'Orphan')")
+    return app
+
+
+def build_request(product, content_type):
+    return {'prompt': product_prompt(product), 'full_prompt': f"{content_type}: {product['name']}"}
+
+
+def drafts():
+    return [tuple(row) for row in database.query_db(
+        'SELECT product_id, content_type, generated_text, approval_status FROM generated_content ORDER BY product_id, content_type')]
+
+
+def test_product_prompt():
+    assert product_prompt({'name': 'Vase', 'description': 'Blue pottery', 'price': 12.5}) == 'Product: Vase. Blue pottery. Price: 12.50'
+    assert product_prompt({'name': 'Vase', 'description': None, 'price': None}) == 'Product: Vase'
+
+
+def test_missing_drafts_are_stored_as_pending(app):
+    with app.app_context():
+        report = pregenerate_drafts(build_request, lambda request: request['full_prompt'].upper(), concurrency=2, batch_size=2, log=None)
+        assert report == {'products': 3, 'drafts': 6, 'failed': 0, 'complete': True}
+        assert drafts()[:2] == [(1, 'product_listing', 'PRODUCT_LISTING: BLUE VASE', 'pending'),
+                                (1, 'social_caption', 'SOCIAL_CAPTION: BLUE VASE', 'pending')]
+        assert load_checkpoint(database.get_db()) == 0
+
+        # Products that already have drafts are not sent to the model again
+        report = pregenerate_drafts(build_request, lambda request: pytest.fail('regenerated'), log=None)
+        assert report['drafts'] == 0 and report['complete']
+
+
+def test_failed_drafts_are_retried_on_the_next_pass(app):
+    def flaky(request):
+        if request['full_prompt'] == 'social_caption: Brass diya':
+            raise RuntimeError('model unavailable')
+        return 'draft'
+
+    with app.app_context():
+        messages = []
+        report = pregenerate_drafts(build_request, flaky, batch_size=10, log=messages.append)
+        assert report['drafts'] == 5 and report['failed'] == 1
+        assert messages == ['Product 2 social_caption: model unavailable']
+
+        generated = []
+        pregenerate_drafts(build_request, lambda request: generated.append(request['full_prompt']) or 'draft', log=None)
+        assert generated == ['social_caption: Brass diya']
+        assert len(drafts()) == 6
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(app):
+    def interrupted(request):
+        if 'Clay cup' in request['full_prompt']:
+            raise KeyboardInterrupt
+        return 'draft'
+
+    with app.app_context():
+        with pytest.raises(KeyboardInterrupt):
+            pregenerate_drafts(build_request, interrupted, concurrency=1, batch_size=1, log=None)
+        assert load_checkpoint(database.get_db()) == 2
+        assert len(drafts()) == 4
+
+        messages, built = [], []
+        report = pregenerate_drafts(lambda product, content_type: built.append(product['id']) or build_request(product, content_type),
+                                    lambda request: 'draft', batch_size=1, log=messages.append)
+        assert messages == ['Resuming after product 2']
+        assert built == [3, 3]
+        assert report == {'products': 1, 'drafts': 2, 'failed': 0, 'complete': True}
+
+
+def test_deadline_stops_before_the_next_batch(app):
+    with app.app_context():
+        report = pregenerate_drafts(build_request, lambda request: 'draft', batch_size=1, deadline=0, log=None)
+        assert report == {'products': 0, 'drafts': 0, 'failed': 0, 'complete': False}
@@ -0,0 +1,57 @@
+import pytest
+from models import database
+from utils.profile_context import ProfileContextCache, build_prompt_prefix, compact_text, estimate_tokens
+
+
+@pytest.fixture
+def app(app, make_artisan):
+    make_artisan(username='meera', full_name='Meera Devi', craft_type='Pottery', location='Jaipur',
+                 bio='Blue pottery since 1998.', materials='quartz')
+    return app
+
+
+def test_compact_text_keeps_whole_sentences_within_budget():
+    bio = 'I learned blue pottery from my grandmother.   We glaze by hand. ' * 20
+    compacted = compact_text(bio, 20)
+    assert estimate_tokens(compacted) <= 20
+    assert compacted.endswith('.')
+    assert '  ' not in compacted
+    assert compact_text('short bio', 20) == 'short bio'
+    assert compact_text('word ' * 100, 5) == 'word word word word...'
+
+
+def test_prefix_matches_the_original_prompt_format():
+    profile = {'full_name': 'Meera Devi', 'craft_type': 'Pottery', 'location': 'Jaipur', 'bio': None, 'materials': None}
+    assert build_prompt_prefix(profile) == 'Artisan: Meera Devi, Craft: Pottery, Location: Jaipur, Bio: None, Materials: '
+
+
+def test_bio_within_budget_is_kept_verbatim():
+    bio = 'Blue pottery since 1998.\n\nNow teaching  workshops.'
+    assert compact_text(bio, 20) == bio
+    profile = {'full_name': 'Meera Devi', 'craft_type': 'Pottery', 'location': 'Jaipur', 'bio': bio, 'materials': 'quartz'}
+    assert build_prompt_prefix(profile) == f"Artisan: Meera Devi, Craft: Pottery, Location: Jaipur, Bio: {bio}, Materials: quartz"
+
+
+def test_context_is_reloaded_after_any_profile_write(app):
+    cache = ProfileContextCache(max_entries=10, ttl=60)
+    with app.app_context():
+        context = cache.get(1)
+        assert context['profile']['username'] == 'meera'
+        assert 'Bio: Blue pottery since 1998.' in context['prefix']
+        assert cache.get(1) is context
+
+        # A write the cache was never told about, as another route or worker would make
+        database.get_db().execute("UPDATE artisans SET bio = 'Now teaching workshops.' WHERE id = 1")
+        assert 'Now teaching workshops.' in cache.get(1)['prefix']
+        assert cache.get(99) is None
+
+
+def test_reused_id_does_not_serve_the_deleted_artisans_context(app, make_artisan):
+    cache = ProfileContextCache(max_entries=10, ttl=60)
+    with app.app_context():
+        assert cache.get(1)['profile']['username'] == 'meera'
+        db = database.get_db()
+        db.execute('DELETE FROM artisans WHERE id = 1')
+        db.commit()
+        make_artisan(artisan_id=1, username='ravi', full_name='Ravi Kumar')
+        assert cache.get(1)['profile']['username'] == 'ravi'
@@ -0,0 +1,122 @@
+import threading
+import pytest
+from utils import ratelimit
+from utils.ratelimit import (MemoryBuckets, MemoryConcurrencyLimit, OverCapacity, RateLimited, RateLimiter, SQLiteBuckets,
+                             SQLiteConcurrencyLimit, model_call_slot, set_limiters)
+
+
+def test_bucket_allows_burst_then_reports_wait():
+    limiter = RateLimiter(MemoryBuckets(100), {'text': (60, 3), 'image': (6, 1)})
+    for _ in range(3):
+        limiter.hit('text', 'artisan:1')
+    with pytest.raises(RateLimited) as error:
+        limiter.hit('text', 'artisan:1')
+    assert error.value.retry_after == 1
+    # Buckets are separate per identity and per kind
+    limiter.hit('text', 'artisan:2')
+    limiter.hit('image', 'artisan:1')
+    assert limiter.check('image', 'artisan:1') == pytest.approx(10, abs=0.1)
+
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    first = RateLimiter(SQLiteBuckets(path), {'text': (60, 2)})
+    second = RateLimiter(SQLiteBuckets(path), {'text': (60, 2)})
+    assert first.check('text', 'ip:10.0.0.1') == 0
+    assert second.check('text', 'ip:10.0.0.1') == 0
+    assert first.check('text', 'ip:10.0.0.1') > 0
+    assert second.check('text', 'ip:10.0.0.2') == 0
+
+
+@pytest.mark.parametrize('make_limit', [
+    lambda tmp_path: MemoryConcurrencyLimit(1),
+    lambda tmp_path: SQLiteConcurrencyLimit(str(tmp_path / "rate_limits.db"), 1, lease_seconds=60),
+])
+def test_concurrency_ceiling(tmp_path, monkeypatch, make_limit):
+    limit = make_limit(tmp_path)
+    monkeypatch.setattr(ratelimit.Config, 'MODEL_CONCURRENCY_WAIT_SECONDS', 0.1)
+    set_limiters(concurrency_limit=limit)
+    try:
+        entered, release = threading.Event(), threading.Event()
+
+        def hold():
+            with model_call_slot():
+                entered.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=hold)
+        worker.start()
+        assert entered.wait(5)
+        assert limit.in_flight() == 1
+        with pytest.raises(RateLimited):
+            with model_call_slot():
+                pass
+        release.set()
+        worker.join()
+        with model_call_slot():
+            assert limit.in_flight() == 1
+        assert limit.in_flight() == 0
+    finally:
+        set_limiters()
+
+
+def test_cost_above_the_burst_is_rejected_without_taking_tokens():
+    limiter = RateLimiter(MemoryBuckets(100), {'text': (60, 3), 'image': (0, 1)})
+    with pytest.raises(OverCapacity) as error:
+        limiter.hit('text', 'artisan:1', cost=4)
+    assert (error.value.cost, error.value.capacity) == (4, 3)
+    limiter.hit('text', 'artisan:1', cost=3)
+    # A disabled bucket has no capacity to exceed
+    limiter.hit('image', 'artisan:1', cost=5)
+
+
+def test_variants_beyond_the_burst_are_a_bad_request(client, monkeypatch):
+    monkeypatch.setattr(ratelimit.Config, 'RATE_LIMIT_ENABLED', True)
+    set_limiters(rate_limiter=RateLimiter(MemoryBuckets(100), {'text': (60, 3), 'image': (6, 1)}))
+    try:
+        form = {'generate_as': 'social_caption', 'prompt': 'Blue vases', 'language': ['english', 'hindi'], 'tone': ['friendly', 'formal']}
+        response = client.post('/generate_content', data=form)
+        assert response.status_code == 400
+        assert 'Retry-After' not in response.headers
+        assert 'at most 3 are allowed' in response.get_data(as_text=True)
+
+        response = client.post('/api/generate_batch', json=[{'kind': 'craft_story', 'craft_type': 'Pottery', 'description': 'Vases'}])
+        assert response.status_code == 200
+    finally:
+        set_limiters()
+
+
+def test_abandoned_model_call_keeps_its_concurrency_slot(monkeypatch):
+    import time
+    from utils.model_router import ModelRouter
+    limit = MemoryConcurrencyLimit(1)
+    monkeypatch.setattr(ratelimit.Config, 'MODEL_CONCURRENCY_WAIT_SECONDS', 0.1)
+    set_limiters(concurrency_limit=limit)
+    router = ModelRouter(["flash", "pro"], timeout_seconds=0.05, max_retries=0, retry_base_delay=0, failure_threshold=10)
+    release = threading.Event()
+    calls = []
+
+    def call(model_name):
+        calls.append(model_name)
+        release.wait(5)
+        return model_name
+
+    try:
+        # The timed-out call on flash keeps running, so the fallback to pro finds no free slot
+        with pytest.raises(RateLimited):
+            with model_call_slot() as slot:
+                router.call(call, slot=slot)
+        assert calls == ["flash"]
+        assert limit.in_flight() == 1
+        release.set()
+        deadline = time.time() + 5
+        while limit.in_flight() and time.time() < deadline:
+            time.sleep(0.01)
+        assert limit.in_flight() == 0
+        with model_call_slot() as slot:
+            result, model_name = router.call(call, slot=slot)
+            assert result == model_name
+            assert limit.in_flight() == 1
+        assert limit.in_flight() == 0
+    finally:
+        set_limiters()
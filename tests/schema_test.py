@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+import pytest
+from models import database, schema
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "artisans.db")
+    monkeypatch.setattr(database, 'DATABASE', path)
+    return path
+
+
+def columns(path, table):
+    with sqlite3.connect(path) as conn:
+        return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def test_upgrade_applies_migrations_once_in_order(db_path):
+    latest = schema.latest_version()
+    assert schema.upgrade(log=None) == list(range(1, latest + 1))
+    assert schema.upgrade(log=None) == []
+    version, pending = schema.status()
+    assert version == latest and pending == []
+    assert {'materials'} <= columns(db_path, 'artisans')
+    assert {'approval_status', 'generated_html', 'image_variants'} <= columns(db_path, 'generated_content')
+
+
+def test_upgrade_adopts_database_created_before_migrations(db_path):
+    # Baseline schema plus the columns fix_db_add_materials.py used to add
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE artisans (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, full_name TEXT, craft_type TEXT, location TEXT, bio TEXT, materials TEXT, created_at TIMESTAMP)')
+        conn.execute('CREATE TABLE generated_content (id INTEGER PRIMARY KEY AUTOINCREMENT, artisan_id INTEGER NOT NULL, content_type TEXT NOT NULL, prompt TEXT, generated_text TEXT, generated_image_url TEXT, approval_status TEXT, include_quote INTEGER, created_at TIMESTAMP)')
+        conn.execute("INSERT INTO generated_content (artisan_id, content_type, generated_text) VALUES (1, 'ad_copy', 'kept')")
+    schema.upgrade(log=None)
+    assert 'content_hash' in columns(db_path, 'generated_content')
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT generated_text FROM generated_content').fetchone()[0] == 'kept'
+
+
+def test_concurrent_upgrades_apply_each_migration_once(db_path):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(schema.upgrade(log=None))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    applied = sorted(version for versions in results for version in versions)
+    assert applied == list(range(1, schema.latest_version() + 1))
+
+
+def test_failed_migration_rolls_back(db_path, tmp_path):
+    migrations_dir = tmp_path / "migrations"
+    migrations_dir.mkdir()
+    (migrations_dir / "0001_create.py").write_text("def upgrade(conn):\n    conn.execute('CREATE TABLE things (id INTEGER)')\n")
+    (migrations_dir / "0002_broken.py").write_text("def upgrade(conn):\n    conn.execute('CREATE TABLE other (id INTEGER)')\n    raise RuntimeError('boom')\n")
+    migrations = schema.load_migrations(str(migrations_dir))
+    with pytest.raises(RuntimeError):
+        schema.upgrade(migrations=migrations, log=None)
+    version, pending = schema.status(migrations=migrations)
+    assert version == 1 and [m.version for m in pending] == [2]
+    with sqlite3.connect(db_path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'things' in tables and 'other' not in tables
+
+
+def test_ensure_schema_without_auto_upgrade_raises(db_path):
+    with pytest.raises(schema.SchemaError):
+        schema.ensure_schema(auto_upgrade=False)
+    assert schema.ensure_schema(auto_upgrade=True) == schema.latest_version()
@@ -0,0 +1,59 @@
+import pytest
+from models import database
+from models.search import fts_query, full_text_search
+
+
+@pytest.fixture
+def app(app, make_artisan):
+    make_artisan(1)
+    make_artisan(2)
+    with app.app_context():
+        content = [
+            (1, 'social_caption', 'Diwali lamps', 'Brass lamps polished by hand for the festival <script>'),
+            (1, 'about_press', 'Our story', 'Brass casting, brass polishing and brass engraving in Moradabad.'),
+            (1, 'ad_copy', 'Pottery sale', 'Blue pottery vases from Jaipur.'),
+            (2, 'social_caption', 'Brass bells', 'Temple bells cast in brass.'),
+        ]
+        for row in content:
+            database.insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, generated_text) VALUES (?, ?, ?, ?)', row)
+        database.insert_db("INSERT INTO products (artisan_id, name, description, price) VALUES (1, 'Brass diya', 'Hand-polished oil lamp', 12.5)")
+    return app
+
+
+def test_fts_query_quotes_user_input():
+    assert fts_query('brass "lamp') == '"brass" "lamp"*'
+    assert fts_query('NEAR( OR * -') == '"NEAR" "OR"*'
+    assert fts_query('  ') is None
+
+
+def test_search_is_ranked_scoped_and_highlighted(app):
+    with app.app_context():
+        results, has_next = full_text_search('content', 1, 'brass')
+        assert [result['content_type'] for result in results] == ['about_press', 'social_caption']
+        assert not has_next
+        # Matches are marked and the stored text is escaped
+        assert '<mark>Brass</mark>' in results[1]['snippet']
+        assert '&lt;script&gt;' in results[1]['snippet']
+        # Prefix match on the last word, stemming on the others
+        assert len(full_text_search('content', 1, 'lamp festiv')[0]) == 1
+        assert full_text_search('products', 1, 'brass')[0][0]['title'] == '<mark>Brass</mark> diya'
+        assert len(full_text_search('content', 2, 'brass')[0]) == 1
+
+
+def test_triggers_keep_the_index_in_sync(app):
+    with app.app_context():
+        db = database.get_db()
+        db.execute("UPDATE generated_content SET generated_text = 'Terracotta planters' WHERE prompt = 'Pottery sale'")
+        db.execute("DELETE FROM generated_content WHERE prompt = 'Our story'")
+        db.commit()
+        assert [result['title'] for result in full_text_search('content', 1, 'terracotta')[0]] == ['Pottery sale']
+        assert full_text_search('content', 1, 'jaipur')[0] == []
+        assert len(full_text_search('content', 1, 'brass')[0]) == 1
+
+
+def test_pagination(app):
+    with app.app_context():
+        first, has_next = full_text_search('content', 1, 'brass', page=1, page_size=1)
+        second, last = full_text_search('content', 1, 'brass', page=2, page_size=1)
+        assert has_next and not last
+        assert first[0]['id'] != second[0]['id']
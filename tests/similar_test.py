@@ -0,0 +1,80 @@
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from models import database
+from utils.similar import ArtisanVectors, SimilarContentIndex, embed
+
+
+@pytest.fixture
+def app(app, make_artisan):
+    make_artisan(1)
+    make_artisan(2)
+    with app.app_context():
+        content = [
+            (1, 'social_caption', 'Blue pottery vase for a Diwali gift', 'english', 'friendly', 'approved'),
+            (1, 'social_caption', 'Blue pottery vase for a Diwali gift', 'hindi', None, 'approved'),
+            (1, 'social_caption', 'Blue pottery vases for Diwali', None, None, 'pending'),
+            (1, 'ad_copy', 'Blue pottery vase for a Diwali gift', 'english', 'friendly', 'approved'),
+            (2, 'social_caption', 'Blue pottery vase for a Diwali gift', 'english', 'friendly', 'approved'),
+            (1, 'social_caption', 'Blue pottery vase for a Diwali gift', 'english', 'formal', 'approved'),
+        ]
+        for row in content:
+            database.insert_db('INSERT INTO generated_content (artisan_id, content_type, prompt, language, tone, approval_status, generated_text) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               row + ('text',))
+    return app
+
+
+def test_embeddings_are_normalised_and_tolerate_rewording():
+    vectors = embed(['Blue pottery vase for a Diwali gift', 'Diwali gift: blue pottery vases', 'Brass temple lamps', 'the of a'], dim=512)
+    assert vectors.shape == (4, 512) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1)
+    assert vectors[0] @ vectors[1] > 0.8
+    assert vectors[0] @ vectors[2] < 0.2
+    # Only stopwords: a zero vector matches nothing
+    assert not vectors[3].any()
+
+
+def test_vectors_grow_and_search_top_k():
+    vectors = ArtisanVectors(256)
+    prompts = ['blue pottery vase', 'blue pottery vases', 'blue pottery mug', 'brass lamp'] * 5
+    for content_id, prompt in enumerate(prompts, start=1):
+        vectors.add(content_id, 'social_caption/english/friendly', prompt)
+    assert len(vectors) == 20 and len(vectors.ids) == 32
+    query = embed(['blue pottery vase'], 256)[0]
+    # Exact matches (ids 1, 5, 9, ...) first, then the plural, then nothing below min_score
+    results = vectors.search(query, 'social_caption/english/friendly', 7, 0.5)
+    assert {content_id for content_id, _ in results[:5]} == {1, 5, 9, 13, 17}
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert results[5][0] % 4 == 2 and results[5][1] < results[4][1]
+    assert vectors.search(query, 'ad_copy/english/friendly', 3, 0.5) == []
+
+    vectors.remove(5)
+    assert len(vectors) == 19
+    assert {content_id for content_id, _ in vectors.search(query, 'social_caption/english/friendly', 4, 0.99)} == {1, 9, 13, 17}
+
+
+def test_index_scopes_to_approved_content_of_the_same_kind(app):
+    index = SimilarContentIndex(max_artisans=10, ttl=60, dim=512)
+    with app.app_context():
+        results = index.search(1, 'social_caption', 'english', 'friendly', 'Diwali gift blue pottery vases')
+        assert [content_id for content_id, _ in results] == [1]
+        assert [content_id for content_id, _ in index.search(1, 'social_caption', 'hindi', 'friendly', 'blue pottery vase')] == [2]
+        assert [content_id for content_id, _ in index.search(1, 'social_caption', 'english', 'formal', 'blue pottery vase')] == [6]
+        assert index.search(1, 'social_caption', 'hindi', 'formal', 'blue pottery vase') == []
+        assert index.search(1, 'social_caption', 'english', 'friendly', 'Brass temple lamps') == []
+
+        # Approving pending content updates the loaded index in place
+        database.get_db().execute("UPDATE generated_content SET approval_status = 'approved' WHERE id = 3")
+        index.add(1, {'id': 3, 'content_type': 'social_caption', 'language': None, 'tone': None, 'prompt': 'Blue pottery vases for Diwali'})
+        assert [content_id for content_id, _ in index.search(1, 'social_caption', 'english', 'friendly', 'blue pottery vases for Diwali')] == [3, 1]
+        index.remove(1, 1)
+        assert [content_id for content_id, _ in index.search(1, 'social_caption', 'english', 'friendly', 'blue pottery vases for Diwali')] == [3]
+
+
+def test_importing_the_module_does_not_load_numpy():
+    # numpy is only needed once an index is built, so importing the app stays fast
+    code = "import sys, utils.similar; print('numpy' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'False'
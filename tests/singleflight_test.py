@@ -0,0 +1,91 @@
+import threading
+import time
+import pytest
+from utils import ai_helper
+from utils.backends import StubBackend, set_backend
+from utils.metrics import Counter
+from utils.model_router import ModelRouter
+from utils.singleflight import SingleFlight
+
+
+def run_concurrently(count, function):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(index):
+        try:
+            results[index] = function()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'vase'
+
+    threading.Timer(0.1, release.set).start()
+    results, errors = run_concurrently(5, lambda: flights.do('key', slow))
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {'vase'}
+    assert flights.in_flight() == 0
+    # A finished call is not reused
+    assert flights.do('key', lambda: 'bowl') == ('bowl', False)
+
+
+def test_errors_are_shared():
+    flights = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError('503 Service Unavailable')
+
+    _, errors = run_concurrently(3, lambda: flights.do('key', failing))
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert flights.in_flight() == 0
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__(latency_ms=100, error_rate=0, seed=1)
+        self.calls = 0
+
+    def generate_text(self, model_name, prompt, max_tokens):
+        self.calls += 1
+        return super().generate_text(model_name, prompt, max_tokens)
+
+
+@pytest.fixture
+def counting_backend(monkeypatch):
+    backend = CountingBackend()
+    set_backend(backend)
+    monkeypatch.setattr(ai_helper.Config, 'RESPONSE_CACHE_ENABLED', False)
+    monkeypatch.setattr(ai_helper, 'text_router', ModelRouter(ai_helper.TEXT_MODELS, retry_base_delay=0))
+    monkeypatch.setattr(ai_helper, 'MODEL_CALLS_COALESCED', Counter('c', 'c', ('kind',)))
+    yield backend
+    set_backend(None)
+
+
+def test_identical_generations_are_coalesced(counting_backend):
+    results, errors = run_concurrently(4, lambda: ai_helper.generate_text('Handmade pottery', raise_errors=True))
+    assert errors == [None] * 4
+    assert len(set(results)) == 1
+    assert counting_backend.calls == 1
+    assert ai_helper.MODEL_CALLS_COALESCED.value(kind='text') == 3
+
+    # Different parameters are separate calls
+    run_concurrently(2, lambda: ai_helper.generate_text('Handmade pottery', max_tokens=100))
+    assert counting_backend.calls == 2
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import pytest
+from utils.startup import BackgroundWarmUp, StartupProfile
+
+
+def test_profile_records_phases_and_failures():
+    profile = StartupProfile()
+    with profile.phase('schema check'):
+        pass
+    with profile.phase('credentials', suppress=True):
+        raise RuntimeError('no\ncredentials')
+    with pytest.raises(ValueError):
+        with profile.phase('job queue'):
+            raise ValueError('bad config')
+
+    phases = profile.report()['phases']
+    assert [phase['name'] for phase in phases] == ['schema check', 'credentials', 'job queue']
+    assert 'error' not in phases[0]
+    assert phases[1]['error'] == 'no credentials'
+    assert 'credentials [MainThread]  FAILED: no credentials' in profile.format()
+
+
+def test_warm_up_runs_once_in_background():
+    calls = []
+    warm_up = BackgroundWarmUp(StartupProfile(), lambda profile: calls.append(profile))
+    assert warm_up.status() == 'not_started'
+    warm_up.start()
+    warm_up.start()
+    assert warm_up.done.wait(5)
+    assert warm_up.status() == 'done'
+    assert len(calls) == 1
+    assert warm_up.profile.report()['phases'][-1]['thread'] == 'warm-up'
+
+
+def test_vertex_sdk_is_imported_lazily():
+    # A fresh interpreter, since other tests may already have imported the SDK
+    code = ("import sys; from utils.backends import VertexBackend; backend = VertexBackend(); "
+            "assert 'vertexai' not in sys.modules, 'imported eagerly'")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import os
+import time
+import pytest
+from models import database
+from utils.storage import ImageStore, LocalStorage, content_key
+
+
+@pytest.fixture
+def store(db, tmp_path):
+    return ImageStore(LocalStorage(str(tmp_path / "images"), '/static/images'), grace_seconds=0)
+
+
+def refcount(key):
+    conn = database.connect()
+    try:
+        row = conn.execute('SELECT refcount FROM image_blobs WHERE key = ?', [key]).fetchone()
+    finally:
+        conn.close()
+    return row['refcount'] if row else None
+
+
+def test_put_deduplicates_by_content(store):
+    first = store.put(b'same bytes', 'png')
+    second = store.put(b'same bytes', 'png')
+    assert first == second == content_key(b'same bytes', 'png')
+    assert os.listdir(store.backend.root) == [first]
+    assert store.read(first) == b'same bytes'
+    assert store.url(first) == f'/static/images/{first}'
+    assert store.key_from_url(store.url(first)) == first
+    assert store.key_from_url('/static/images/../config.py') is None
+
+
+def test_gc_keeps_referenced_and_collects_orphans(store):
+    kept = store.put(b'kept', 'png')
+    dropped = store.put(b'dropped', 'png')
+    conn = database.connect()
+    store.incref(conn, [kept, dropped])
+    store.incref(conn, [kept])
+    store.decref(conn, [kept, dropped])
+    conn.commit()
+    conn.close()
+    assert refcount(kept) == 1 and refcount(dropped) == 0
+
+    deleted, reclaimed = store.gc(batch_size=1)
+    assert (deleted, reclaimed) == (1, len(b'dropped'))
+    assert store.backend.exists(kept) and not store.backend.exists(dropped)
+    assert refcount(dropped) is None
+
+
+def test_gc_respects_grace_period(store):
+    store.grace_seconds = 3600
+    store.put(b'fresh', 'png')
+    assert store.gc() == (0, 0)
+
+
+def test_sweep_untracked_only_removes_unreferenced_files(store):
+    tracked = store.put(b'tracked', 'png')
+    for name in ('legacy-used.png', 'legacy-orphan.png'):
+        store.backend.put(name, b'legacy')
+    time.sleep(0.01)
+    deleted, _ = store.sweep_untracked({'legacy-used.png'}, batch_size=1)
+    assert deleted == 1
+    assert sorted(os.listdir(store.backend.root)) == sorted([tracked, 'legacy-used.png'])
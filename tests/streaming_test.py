@@ -0,0 +1,80 @@
+import json
+from models import database
+
+FORM = {'generate_as': 'social_caption', 'prompt': 'Blue glazed vases', 'language': 'hindi', 'tone': 'formal'}
+
+
+def events(response):
+    """(event, payload) pairs of a text/event-stream response"""
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    parsed = []
+    body = response.get_data(as_text=True)
+    assert body.endswith('\n\n')
+    for frame in body[:-2].split('\n\n'):
+        event, data = frame.split('\n')
+        assert event.startswith('event: ') and data.startswith('data: ')
+        parsed.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return parsed
+
+
+def saved_content(web_app):
+    with web_app.app_context():
+        return database.query_db('SELECT id, artisan_id, content_type, prompt, generated_text, approval_status, language, tone FROM generated_content')
+
+
+def test_tokens_then_done_with_the_saved_draft(web_app, client):
+    stream = events(client.post('/generate_content/stream', data=FORM))
+    names = [name for name, _ in stream]
+    assert len(names) > 2 and set(names[:-1]) == {'token'} and names[-1] == 'done'
+
+    done = stream[-1][1]
+    assert done['text'] == ''.join(payload['text'] for _, payload in stream[:-1])
+    [row] = saved_content(web_app)
+    assert done['content_id'] == row['id']
+    assert done['preview_url'] == f"/preview/{row['id']}"
+    assert dict(row) == {'id': row['id'], 'artisan_id': client.artisan_id, 'content_type': 'social_caption', 'prompt': 'Blue glazed vases',
+                         'generated_text': done['text'], 'approval_status': 'pending', 'language': 'hindi', 'tone': 'formal'}
+
+
+def test_model_failure_is_one_error_event_and_saves_nothing(web_app, client, backend):
+    backend.error_rate = 1
+    stream = events(client.post('/generate_content/stream', data=FORM))
+    assert len(stream) == 1
+    name, payload = stream[0]
+    assert name == 'error' and payload['error']
+    assert saved_content(web_app) == []
+
+
+def test_stream_generation_requires_a_login_and_text(web_app, client):
+    assert web_app.test_client().post('/generate_content/stream', data=FORM).status_code == 401
+    assert client.post('/generate_content/stream', data=dict(FORM, generate_as='image')).status_code == 400
+
+
+def test_api_stream_events(client, backend):
+    stream = events(client.get('/api/generate_craft_story/stream?craft_type=Pottery&description=Blue+vases'))
+    assert stream[-1][0] == 'done' and 'content_id' not in stream[-1][1]
+    assert {name for name, _ in stream[:-1]} == {'token'}
+    assert 'Stub response' in stream[-1][1]['text']
+
+    stream = events(client.post('/api/generate_marketing_copy/stream', data={'craft_type': 'Pottery', 'description': 'Blue vases'}))
+    assert stream[-1][0] == 'done'
+
+    backend.error_rate = 1
+    stream = events(client.post('/api/generate_marketing_copy/stream', data={'craft_type': 'Pottery', 'description': 'Blue vases'}))
+    assert [name for name, _ in stream] == ['error']
+
+    assert client.get('/api/generate_craft_story/stream?craft_type=Pottery').status_code == 400
+
+
+def test_failure_mid_stream_ends_with_an_error_instead_of_done(web_app):
+    import app as app_module
+
+    def chunks():
+        yield 'Blue '
+        raise RuntimeError('model unavailable')
+
+    saved = []
+    frames = list(app_module.stream_generation(chunks(), on_complete=saved.append))
+    assert frames == ['event: token\ndata: {"text": "Blue "}\n\n', 'event: error\ndata: {"error": "model unavailable"}\n\n']
+    assert saved == []
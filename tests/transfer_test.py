@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import pytest
+from models import database
+from models.transfer import export_rows, import_products, read_records
+
+
+@pytest.fixture
+def artisan_id(make_artisan):
+    return make_artisan(username='meera')
+
+
+def records(text, fmt):
+    return read_records(io.BytesIO(text.encode('utf-8')), fmt)
+
+
+def test_import_validates_rows_and_commits_in_batches(artisan_id):
+    jsonl = '\n'.join([
+        json.dumps({'name': 'Blue vase', 'price': 24.5, 'description': 'Glazed by hand'}),
+        '{not json',
+        json.dumps({'name': '', 'price': 3}),
+        '',
+        json.dumps({'name': 'Clay cup', 'price': 'cheap'}),
+        json.dumps(['Clay cup']),
+        json.dumps({'name': 'Clay cup', 'price': '4'}),
+        json.dumps({'name': 'Lamp', 'price': -1}),
+        json.dumps({'name': 'Diya'}),
+    ])
+    report = import_products(artisan_id, records(jsonl, 'jsonl'), batch_size=2)
+    assert report['imported'] == 3
+    assert report['failed'] == 5
+    assert [error['line'] for error in report['errors']] == [2, 3, 5, 6, 8]
+    assert 'price must be a number' in report['errors'][2]['error']
+
+    conn = database.connect()
+    rows = conn.execute('SELECT name, price FROM products ORDER BY id').fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [('Blue vase', 24.5), ('Clay cup', 4.0), ('Diya', None)]
+
+
+def test_export_round_trips_through_csv(artisan_id):
+    csv_text = 'name,description,price\r\n"Basket, large","Woven ""tight""",12\r\nMat,,\r\n'
+    assert import_products(artisan_id, records(csv_text, 'csv'))['imported'] == 2
+
+    exported = ''.join(export_rows('products', artisan_id, 'csv'))
+    rows = list(csv.DictReader(io.StringIO(exported)))
+    assert [(row['name'], row['description'], row['price']) for row in rows] == [('Basket, large', 'Woven "tight"', '12.0'), ('Mat', '', '')]
+
+    # The export imports again unchanged
+    assert import_products(artisan_id, records(exported, 'csv'))['imported'] == 2
+
+
+def test_export_streams_in_batches(artisan_id, monkeypatch):
+    monkeypatch.setattr(database.Config, 'EXPORT_BATCH_SIZE', 2)
+    import_products(artisan_id, records('\n'.join(json.dumps({'name': f'Pot {i}'}) for i in range(5)), 'jsonl'))
+    chunks = list(export_rows('products', artisan_id, 'jsonl'))
+    assert len(chunks) == 3
+    lines = ''.join(chunks).splitlines()
+    assert [json.loads(line)['name'] for line in lines] == [f'Pot {i}' for i in range(5)]
+    assert list(export_rows('products', 2, 'jsonl')) == []
@@ -0,0 +1,105 @@
+import json
+import pytest
+from models import database
+from utils import ai_helper
+from utils.ai_helper import GenerationError, generate_variants
+from utils.backends import StubBackend, set_backend
+from utils.metrics import Counter
+from utils.model_router import ModelRouter
+from utils.variants import parse_variants, variants_prompt
+
+VARIANTS = [{'language': 'english', 'tone': 'friendly'}, {'language': 'hindi', 'tone': 'friendly'}, {'language': 'marathi', 'tone': 'formal'}]
+
+
+def test_prompt_lists_every_variant_in_order():
+    prompt = variants_prompt('social_caption', 'third-person', 'Artisan: Meera. Additional details: vases', VARIANTS)
+    assert 'an Instagram post' in prompt and 'Additional details: vases' in prompt
+    assert '1. In english with a friendly tone\n2. In hindi with a friendly tone\n3. In marathi with a formal tone' in prompt
+    assert 'JSON array of 3 objects' in prompt
+
+
+def test_parse_variants_by_id_and_position():
+    items = [{'id': 2, 'text': 'namaste'}, {'id': 1, 'text': 'hello'}, {'id': 3, 'text': 'namaskar'}]
+    assert parse_variants(json.dumps(items), 3) == ['hello', 'namaste', 'namaskar']
+    # No (or unusable) ids: request order
+    assert parse_variants('["hello", {"text": "namaste"}, {"id": 9, "text": "namaskar"}]', 3) == ['hello', 'namaste', 'namaskar']
+
+
+def test_parse_variants_tolerates_wrapping_and_truncation():
+    fenced = '```json\n{"variants": [{"id": 1, "text": "hello"}, {"id": 2, "text": "namaste"}]}\n```'
+    assert parse_variants(fenced, 2) == ['hello', 'namaste']
+    assert parse_variants('Here you go: [{"id": 1, "text": "hello"}] Enjoy!', 2) == ['hello', None]
+    # Cut off by the token limit inside the second item
+    assert parse_variants('[{"id": 1, "text": "hello"}, {"id": 2, "text": "nam', 2) == ['hello', None]
+    assert parse_variants('[{"id": 1, "text": ""}, {"id": 2}]', 2) == [None, None]
+    assert parse_variants('Sorry, I cannot help with that.', 2) == [None, None]
+    assert parse_variants(None, 1) == [None]
+
+
+@pytest.fixture
+def fallbacks(monkeypatch):
+    counter = Counter('f', 'f', ('reason',))
+    monkeypatch.setattr(ai_helper, 'VARIANT_FALLBACKS', counter)
+    return counter
+
+
+def test_one_call_when_the_response_parses(monkeypatch, fallbacks):
+    calls = []
+
+    def fake_generate_text(prompt, **kwargs):
+        calls.append(kwargs)
+        return json.dumps([{'id': 1, 'text': 'hello'}, {'id': 2, 'text': 'namaste'}])
+
+    monkeypatch.setattr(ai_helper, 'generate_text', fake_generate_text)
+    texts = generate_variants('prompt', 2, lambda index: pytest.fail('fell back'), max_tokens=300)
+    assert texts == ['hello', 'namaste']
+    assert len(calls) == 1
+    assert calls[0]['json_output'] and calls[0]['max_tokens'] == 600
+
+
+def test_missing_variants_fall_back_to_single_calls(monkeypatch, fallbacks):
+    monkeypatch.setattr(ai_helper, 'generate_text', lambda prompt, **kwargs: '[{"id": 2, "text": "namaste"}]')
+    assert generate_variants('prompt', 3, lambda index: f'single {index}') == ['single 0', 'namaste', 'single 2']
+    assert fallbacks.value(reason='parse') == 2
+
+    def failing(prompt, **kwargs):
+        raise GenerationError('all models unavailable')
+
+    monkeypatch.setattr(ai_helper, 'generate_text', failing)
+    assert generate_variants('prompt', 2, lambda index: f'single {index}') == ['single 0', 'single 1']
+    assert fallbacks.value(reason='error') == 2
+
+    def fallback(index):
+        raise GenerationError('still unavailable')
+
+    with pytest.raises(GenerationError):
+        generate_variants('prompt', 2, fallback)
+
+
+def test_stub_backend_answers_a_language_and_tone_grid_in_one_call(monkeypatch, fallbacks):
+    backend = StubBackend(latency_ms=0, error_rate=0, seed=1)
+    calls = []
+    generate_json = backend.generate_json
+    monkeypatch.setattr(backend, 'generate_json', lambda *args: calls.append(args) or generate_json(*args))
+    monkeypatch.setattr(backend, 'generate_text', lambda *args: pytest.fail('plain text call'))
+    monkeypatch.setattr(ai_helper.Config, 'RESPONSE_CACHE_ENABLED', False)
+    monkeypatch.setattr(ai_helper, 'text_router', ModelRouter(ai_helper.TEXT_MODELS, retry_base_delay=0))
+    set_backend(backend)
+    try:
+        grid = [{'language': language, 'tone': tone} for language in ('english', 'hindi') for tone in ('friendly', 'formal')]
+        prompt = variants_prompt('social_caption', 'first-person', 'Artisan: Meera.', grid)
+        texts = generate_variants(prompt, len(grid), lambda index: pytest.fail('fell back'))
+    finally:
+        set_backend(None)
+    assert len(calls) == 1
+    assert len(set(texts)) == 4
+    assert texts[3].split('\n\n', 1)[1].startswith('In hindi with a formal tone')
+    assert fallbacks.value(reason='parse') == fallbacks.value(reason='error') == 0
+
+
+def test_unsupported_generate_as_stores_no_variant_rows(web_app, client):
+    form = {'generate_as': 'poem', 'prompt': 'Blue vases', 'language': ['english', 'hindi']}
+    response = client.post('/generate_content', data=form)
+    assert response.status_code == 302 and response.location.endswith('/generate_content')
+    with web_app.app_context():
+        assert database.query_db('SELECT id FROM generated_content') == []
@@ -0,0 +1,42 @@
+import re
+import types
+from pathlib import Path
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import aiplatform
+from vertexai.generative_models import GenerativeModel
+from vertexai.preview.vision_models import Image
+from utils.vertex_sdk import (SUPPORTED_SDK_VERSION, SDKIncompatibleError, bind_image_model, bind_text_model,
+                              image_bytes)
+
+ENDPOINT_NAME = 'projects/test-project/locations/us-central1/publishers/google/models/imagen-3.0-generate-001'
+
+
+def test_adapter_targets_the_pinned_sdk():
+    requirements = (Path(__file__).parent.parent / 'requirements.txt').read_text()
+    assert re.search(r'^google-cloud-aiplatform==(\S+)$', requirements, re.MULTILINE).group(1) == SUPPORTED_SDK_VERSION
+    assert aiplatform.__version__ == SUPPORTED_SDK_VERSION
+
+
+def test_text_model_gets_its_own_prediction_client():
+    credentials = AnonymousCredentials()
+    model = bind_text_model(GenerativeModel('gemini-1.5-flash'), credentials)
+    assert model._prediction_client._transport._credentials is credentials
+
+
+def test_image_model_predicts_through_an_endpoint_with_its_credentials():
+    credentials = AnonymousCredentials()
+    model = bind_image_model(types.SimpleNamespace(_endpoint_name=ENDPOINT_NAME, _endpoint=None), credentials)
+    assert model._endpoint.credentials is credentials
+    assert model._endpoint._prediction_client._transport._credentials is credentials
+
+
+def test_image_bytes():
+    assert image_bytes(Image(image_bytes=b'\x89PNG')) == b'\x89PNG'
+
+
+def test_missing_internals_fail_loudly():
+    with pytest.raises(SDKIncompatibleError, match='_endpoint_name'):
+        bind_image_model(types.SimpleNamespace(), AnonymousCredentials())
+    with pytest.raises(SDKIncompatibleError, match='_image_bytes'):
+        image_bytes(object())
@@ -1,151 +1,226 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.preview.vision_models import ImageGenerationModel
-import os
-import json
-import tempfile
-import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-from google.auth.credentials import Credentials
-from google.oauth2 import service_account
-
-def initialize_vertex_ai():
-    """Initialize Vertex AI with credentials from .env or fallback to file"""
-    credentials = Config.get_service_account_credentials()
-
-    if credentials:
-        # Use service account credentials from .env
-        print("Using service account credentials from .env")
-        creds = service_account.Credentials.from_service_account_info(credentials)
-        vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION, credentials=creds)
-    elif Config.VERTEX_AI_API_KEY:
-        # Use API key for text generation - but image generation will fail
-        print("Using API key for VertexAI (text only)")
-        class APIKeyCredentials(Credentials):
-            def __init__(self, api_key):
-                super().__init__()
-                self.api_key = api_key
-            def apply(self, headers, token=None):
-                headers['x-goog-api-key'] = self.api_key
-            def refresh(self, request):
-                pass
-        creds = APIKeyCredentials(Config.VERTEX_AI_API_KEY)
-        vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION, credentials=creds)
-    else:
-        # Fallback to default credentials (JSON file or environment)
-        print("Using default credentials (JSON file)")
-        vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION)
-
-def get_text_credentials():
-    """Get credentials for text generation (supports API key)"""
-    credentials = Config.get_service_account_credentials()
-
-    if credentials:
-        # Use service account credentials
-        return service_account.Credentials.from_service_account_info(credentials)
-    elif Config.VERTEX_AI_API_KEY:
-        # Use API key for text generation
-        class APIKeyCredentials(Credentials):
-            def __init__(self, api_key):
-                super().__init__()
-                self.api_key = api_key
-            def apply(self, headers, token=None):
-                headers['x-goog-api-key'] = self.api_key
-            def refresh(self, request):
-                pass
-        return APIKeyCredentials(Config.VERTEX_AI_API_KEY)
-    else:
-        # Fallback to default credentials
-        return None
-
-def generate_text(prompt, max_tokens=500):
-    """
-    Generate text using Vertex AI Gemini model with fallback for model availability
-    """
-    model_names = ["gemini-1.5-flash", "gemini-1.5-pro"]
-    last_error = None
-    for model_name in model_names:
-        try:
-            model = GenerativeModel(model_name)
-            response = model.generate_content(
-                prompt,
-                generation_config={"max_output_tokens": max_tokens}
-            )
-            return response.text
-        except Exception as e:
-            last_error = e
-            # If 404 error, try next model
-            if "404" in str(e) or "not available" in str(e).lower():
-                continue
+from utils.backends import get_backend
+from utils.cache import get_response_cache, make_cache_key
+from utils.storage import get_image_store
+from utils.metrics import IMAGE_GENERATION_SECONDS, MODEL_CALLS_COALESCED, VARIANT_FALLBACKS, trace_span
+from utils.model_router import ModelRouter, is_unavailable_error, is_transient_error
+from utils.ratelimit import RateLimited, model_call_slot
+from utils.singleflight import SingleFlight
+from utils.variants import parse_variants
+
+TEXT_MODELS = ["gemini-1.5-flash", "gemini-1.5-pro"]
+IMAGE_MODEL = "imagen-3.0-generate-001"
+
+text_router = ModelRouter(
+    TEXT_MODELS,
+    failure_threshold=Config.MODEL_CIRCUIT_FAILURE_THRESHOLD,
+    cooldown_seconds=Config.MODEL_CIRCUIT_COOLDOWN_SECONDS,
+    unavailable_cooldown_seconds=Config.MODEL_UNAVAILABLE_COOLDOWN_SECONDS,
+    timeout_seconds=Config.MODEL_TIMEOUT_SECONDS,
+    max_abandoned_calls=Config.MODEL_MAX_ABANDONED_CALLS,
+    max_retries=Config.MODEL_MAX_RETRIES,
+    retry_base_delay=Config.MODEL_RETRY_BASE_DELAY
+)
+
+# Model calls currently running, keyed by kind and request parameters, so duplicates can join them
+in_flight = SingleFlight()
+
+class GenerationError(Exception):
+    """Raised by generate_text(raise_errors=True) when no model produced a response"""
+
+def warm_up_model_backend(profile):
+    """
+    Import the model SDK, resolve credentials and build model clients ahead of the
+    first generation request. Each step is timed in profile; a failed step is logged
+    and the remaining ones still run (the request path retries them lazily).
+    """
+    backend = get_backend()
+    with profile.phase(f'{backend.name}: import SDK', suppress=True):
+        backend.import_sdk()
+    with profile.phase(f'{backend.name}: credentials', suppress=True):
+        backend.initialize()
+    for model_name in TEXT_MODELS:
+        with profile.phase(f'{backend.name}: {model_name} client', suppress=True):
+            backend.warm_up_text_model(model_name)
+    with profile.phase(f'{backend.name}: {IMAGE_MODEL} client', suppress=True):
+        backend.warm_up_image_model(IMAGE_MODEL)
+
+def generate_text(prompt, max_tokens=500, use_cache=True, raise_errors=False, json_output=False):
+    """
+    Generate text using the configured model backend, routed to the healthiest model.
+    Successful responses are cached; pass use_cache=False to force a fresh generation.
+    Errors are returned as text unless raise_errors=True, which raises GenerationError.
+    json_output=True asks the model for a JSON response (the prompt must describe it).
+    """
+    model_names = TEXT_MODELS
+    # JSON and plain text answers to the same prompt differ, so they are cached and coalesced apart
+    response_format = 'json' if json_output else None
+    cache = get_response_cache() if use_cache and Config.RESPONSE_CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(prompt, model_names, max_tokens, response_format)
+        if cached is not None:
+            return cached
+
+    backend = get_backend()
+    backend_call = backend.generate_json if json_output else backend.generate_text
+
+    def call():
+        # Raises RateLimited when the model concurrency ceiling is reached
+        with model_call_slot() as slot, trace_span('generate_text', max_tokens=max_tokens):
+            return text_router.call(lambda model_name: backend_call(model_name, prompt, max_tokens), slot=slot)
+
+    try:
+        # Identical prompts already being generated share that call's result or error
+        (text, model_name), shared = in_flight.do(('text', make_cache_key(prompt, ','.join(model_names), max_tokens, response_format)), call)
+    except RateLimited:
+        raise
+    except Exception as e:
+        if raise_errors:
+            raise GenerationError(f"Error generating text: {str(e)}") from e
+        return f"Error generating text: {str(e)}"
+    if shared:
+        MODEL_CALLS_COALESCED.inc(kind='text')
+    if cache is not None:
+        cache.set(prompt, model_name, max_tokens, text, response_format)
+    return text
+
+def generate_variants(prompt, count, fallback, max_tokens=500, use_cache=True):
+    """
+    Generate count texts with one structured (JSON) model call for prompt, which asks
+    for all of them; max_tokens is per text. Texts missing from the response, or all of
+    them if the call fails, come from fallback(index) calls run concurrently. Returns
+    the texts in order; a failing fallback raises.
+    """
+    try:
+        response = generate_text(prompt, max_tokens=max_tokens * count, use_cache=use_cache, raise_errors=True, json_output=True)
+        texts = parse_variants(response, count)
+        reason = 'parse'
+    except GenerationError:
+        texts = [None] * count
+        reason = 'error'
+    missing = [index for index, text in enumerate(texts) if text is None]
+    if missing:
+        VARIANT_FALLBACKS.inc(len(missing), reason=reason)
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            for index, text in zip(missing, executor.map(fallback, missing)):
+                texts[index] = text
+    return texts
+
+def stream_text(prompt, max_tokens=500, use_cache=True):
+    """
+    Yield generated text in chunks as the model produces them, healthiest model first.
+    Falls back to the next model only if one is unavailable before the first chunk;
+    raises GenerationError on failure. The full text is cached once the stream completes.
+    """
+    model_names = TEXT_MODELS
+    cache = get_response_cache() if use_cache and Config.RESPONSE_CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(prompt, model_names, max_tokens)
+        if cached is not None:
+            yield cached
+            return
+
+    backend = get_backend()
+    with model_call_slot():
+        models = text_router.ordered_models()
+        last_error = None
+        for position, model_name in enumerate(models):
+            if position > 0:
+                text_router.record_fallback()
+            chunks = []
+            started = time.perf_counter()
+            try:
+                for chunk in backend.stream_text(model_name, prompt, max_tokens):
+                    chunks.append(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # Client went away; this says nothing about the model's health
+                for remaining in models[position:]:
+                    text_router.release(remaining)
+                raise
+            except Exception as e:
+                last_error = e
+                if is_unavailable_error(e) or is_transient_error(e):
+                    text_router.record_failure(model_name, e, (time.perf_counter() - started) * 1000)
+                # If the model is unavailable before anything was sent, try next model
+                if not chunks and is_unavailable_error(e):
+                    continue
+                # Includes this model: a bad request records no failure, which would leave a half-open trial slot taken
+                for remaining in models[position:]:
+                    text_router.release(remaining)
+                break
             else:
-                return f"Error generating text: {str(e)}"
-    return f"Error generating text: {str(last_error)}"
+                text_router.record_success(model_name, (time.perf_counter() - started) * 1000)
+                for remaining in models[position + 1:]:
+                    text_router.release(remaining)
+                if cache is not None:
+                    cache.set(prompt, model_name, max_tokens, ''.join(chunks))
+                return
+    if last_error is None:
+        raise GenerationError("Error generating text: All models are temporarily unavailable (circuits open)")
+    raise GenerationError(f"Error generating text: {str(last_error)}") from last_error
+
+def _generate(prompt, stream=False, **kwargs):
+    """Generate prompt with generate_text, or with stream_text when stream=True"""
+    if stream:
+        kwargs.pop('raise_errors', None)  # streaming always raises
+        return stream_text(prompt, **kwargs)
+    return generate_text(prompt, **kwargs)
 
 def generate_image(prompt, aspect_ratio="1:1"):
     """
-    Generate image using Vertex AI Image Generation Model (Imagen)
+    Generate image using the configured model backend (Imagen on Vertex AI)
     Note: Imagen requires OAuth2 credentials, not API keys
+    Returns the image store key; callers take a reference with get_image_store().incref
     """
-    try:
-        # Check if we have service account credentials for image generation
-        credentials = Config.get_service_account_credentials()
-        if credentials and Config.VERTEX_AI_API_KEY:
-            # Temporarily reinitialize with service account for image generation
-            creds = service_account.Credentials.from_service_account_info(credentials)
-            vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION, credentials=creds)
-
-        model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
-        response = model.generate_images(
-            prompt=prompt,
-            number_of_images=1,
-            aspect_ratio=aspect_ratio
-        )
-        image = response.images[0]
-        # Generate unique filename
-        filename = f"{uuid.uuid4()}.png"
-        filepath = os.path.join("static", "images", filename)
-        image.save(filepath)
-
-        # Reinitialize with API key for text generation if needed
-        if Config.VERTEX_AI_API_KEY and credentials:
-            class APIKeyCredentials(Credentials):
-                def __init__(self, api_key):
-                    super().__init__()
-                    self.api_key = api_key
-                def apply(self, headers, token=None):
-                    headers['x-goog-api-key'] = self.api_key
-                def refresh(self, request):
-                    pass
-            creds = APIKeyCredentials(Config.VERTEX_AI_API_KEY)
-            vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION, credentials=creds)
-
-        return filename
-    except Exception as e:
-        raise Exception(f"Error generating image: {str(e)}")
+    def call():
+        with model_call_slot():
+            try:
+                started = time.perf_counter()
+                with trace_span('generate_image', model=IMAGE_MODEL):
+                    image_bytes = get_backend().generate_image(IMAGE_MODEL, prompt, aspect_ratio)
+                IMAGE_GENERATION_SECONDS.observe(time.perf_counter() - started, model=IMAGE_MODEL)
+            except Exception as e:
+                raise Exception(f"Error generating image: {str(e)}")
+        try:
+            # Content-addressed: identical images are stored once
+            return get_image_store().put(image_bytes, 'png')
+        except Exception as e:
+            raise Exception(f"Error generating image: {str(e)}")
+
+    # Concurrent identical requests share one image; each caller takes its own reference
+    key, shared = in_flight.do(('image', make_cache_key(prompt, IMAGE_MODEL, aspect_ratio)), call)
+    if shared:
+        MODEL_CALLS_COALESCED.inc(kind='image')
+    return key
 
-def generate_marketing_copy(prompt):
+def generate_marketing_copy(prompt, **kwargs):
     """
     Generate marketing copy for artisan's craft
+    Keyword arguments (use_cache, raise_errors) are passed to generate_text;
+    stream=True returns a generator of chunks from stream_text instead
     """
-    return generate_text(prompt)
+    return _generate(prompt, **kwargs)
 
-def generate_social_media_post(craft_description, platform="Instagram"):
+def generate_social_media_post(craft_description, platform="Instagram", **kwargs):
     """
     Generate social media post content
     """
     prompt = f"Create a {platform} post about this craft: {craft_description}. Include emojis and hashtags suitable for the platform."
-    return generate_text(prompt)
+    return _generate(prompt, **kwargs)
 
-def generate_craft_story(craft_description):
+def generate_craft_story(craft_description, **kwargs):
     """
     Generate a story about the artisan and their craft
     """
     prompt = f"Write an inspiring story about an artisan and their craft. Description: {craft_description}. Focus on tradition, passion, and cultural heritage."
-    return generate_text(prompt)
+    return _generate(prompt, **kwargs)
 
-def generate_product_visual_description(product_name, craft_type):
+def generate_product_visual_description(product_name, craft_type, **kwargs):
     """
     Generate a detailed description for image generation
     """
     prompt = f"Describe a high-quality, professional photograph of a {craft_type} product called '{product_name}'. Include details about lighting, composition, and style to make it appealing for marketing."
-    return generate_text(prompt)
+    return _generate(prompt, **kwargs)
@@ -0,0 +1,254 @@
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+from config import Config
+
+
+class ModelBackend:
+    """Interface shared by every text/image model backend"""
+
+    name = None
+
+    def import_sdk(self):
+        """Import the backend's SDK modules ahead of the first model call"""
+
+    def initialize(self):
+        """Prepare the backend (credentials, SDK state). Called by the background warm-up."""
+
+    def warm_up_text_model(self, model_name):
+        """Build the client for a text model so the first request does not pay for it"""
+
+    def warm_up_image_model(self, model_name):
+        """Build the client for an image model so the first request does not pay for it"""
+
+    def generate_text(self, model_name, prompt, max_tokens):
+        """Return the generated text for prompt, raising on failure"""
+        raise NotImplementedError
+
+    def generate_json(self, model_name, prompt, max_tokens):
+        """Like generate_text, constraining the response to JSON where the model supports it"""
+        return self.generate_text(model_name, prompt, max_tokens)
+
+    def stream_text(self, model_name, prompt, max_tokens):
+        """Yield the generated text in chunks as the model produces them"""
+        yield self.generate_text(model_name, prompt, max_tokens)
+
+    def generate_image(self, model_name, prompt, aspect_ratio):
+        """Return the generated image as PNG bytes, raising on failure"""
+        raise NotImplementedError
+
+
+class VertexBackend(ModelBackend):
+    """Google Cloud Vertex AI (Gemini for text, Imagen for images)"""
+
+    name = 'vertex'
+
+    def __init__(self):
+        self._clients = None
+        self._lock = threading.Lock()
+
+    @property
+    def clients(self):
+        # The Vertex AI SDK takes seconds to import, so it is loaded on first use
+        if self._clients is None:
+            with self._lock:
+                if self._clients is None:
+                    from utils.vertex_clients import VertexClientManager
+                    self._clients = VertexClientManager()
+        return self._clients
+
+    def import_sdk(self):
+        self.clients
+
+    def initialize(self):
+        """Initialize Vertex AI with credentials from .env or fallback to file"""
+        self.clients.initialize()
+
+    def warm_up_text_model(self, model_name):
+        self.clients.text_model(model_name)
+
+    def warm_up_image_model(self, model_name):
+        self.clients.image_model(model_name)
+
+    def generate_text(self, model_name, prompt, max_tokens):
+        model = self.clients.text_model(model_name)
+        response = model.generate_content(
+            prompt,
+            generation_config={"max_output_tokens": max_tokens}
+        )
+        return response.text
+
+    def generate_json(self, model_name, prompt, max_tokens):
+        model = self.clients.text_model(model_name)
+        response = model.generate_content(
+            prompt,
+            generation_config={"max_output_tokens": max_tokens, "response_mime_type": "application/json"}
+        )
+        return response.text
+
+    def stream_text(self, model_name, prompt, max_tokens):
+        model = self.clients.text_model(model_name)
+        responses = model.generate_content(
+            prompt,
+            generation_config={"max_output_tokens": max_tokens},
+            stream=True
+        )
+        for chunk in responses:
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                yield chunk.text
+
+    def generate_image(self, model_name, prompt, aspect_ratio):
+        from utils.vertex_sdk import image_bytes
+
+        # Imagen requires OAuth2 credentials, not API keys
+        model = self.clients.image_model(model_name)
+        response = model.generate_images(
+            prompt=prompt,
+            number_of_images=1,
+            aspect_ratio=aspect_ratio
+        )
+        return image_bytes(response.images[0])
+
+
+class StubBackendError(Exception):
+    """Injected failure raised by the stub backend, a 503 like google.api_core.exceptions.ServiceUnavailable"""
+
+    code = 503
+
+
+class StubBackend(ModelBackend):
+    """
+    Offline backend returning deterministic text and PNGs for load testing.
+    Output depends only on the model name and prompt; latency and error
+    injection are drawn from a seeded RNG so runs are reproducible.
+    """
+
+    name = 'stub'
+
+    IMAGE_SIZES = {
+        "1:1": (512, 512),
+        "9:16": (288, 512),
+        "16:9": (512, 288),
+        "3:4": (384, 512),
+        "4:3": (512, 384),
+    }
+
+    NUMBERED_LINE = re.compile(r'^(\d+)\. (.+)$', re.MULTILINE)
+
+    def __init__(self, latency_distribution=None, latency_ms=None, latency_jitter_ms=None, error_rate=None, seed=None):
+        self.latency_distribution = latency_distribution or Config.STUB_LATENCY_DISTRIBUTION
+        self.latency_ms = Config.STUB_LATENCY_MS if latency_ms is None else latency_ms
+        self.latency_jitter_ms = Config.STUB_LATENCY_JITTER_MS if latency_jitter_ms is None else latency_jitter_ms
+        self.error_rate = Config.STUB_ERROR_RATE if error_rate is None else error_rate
+        self._random = random.Random(Config.STUB_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        print(f"Using stub model backend ({self.latency_distribution} latency ~{self.latency_ms}ms, error rate {self.error_rate})")
+
+    def _sample_latency(self):
+        """Return a simulated latency in seconds"""
+        mean = self.latency_ms
+        jitter = self.latency_jitter_ms
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                value = self._random.uniform(mean - jitter, mean + jitter)
+            elif self.latency_distribution == 'normal':
+                value = self._random.gauss(mean, jitter)
+            elif self.latency_distribution == 'lognormal':
+                # Long right tail like real model latency; median is latency_ms
+                value = self._random.lognormvariate(0, jitter / mean if mean else 0) * mean
+            else:
+                value = mean
+        return max(value, 0) / 1000.0
+
+    def _simulate_call(self, model_name, latency=None):
+        time.sleep(self._sample_latency() if latency is None else latency)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise StubBackendError(f"503 Service Unavailable: injected stub failure for {model_name}")
+
+    @staticmethod
+    def _digest(model_name, prompt):
+        return hashlib.sha256(f"{model_name}\x1f{prompt}".encode('utf-8')).hexdigest()
+
+    def _stub_text(self, model_name, prompt, max_tokens):
+        digest = self._digest(model_name, prompt)
+        words = ' '.join(prompt.split()[:40])
+        text = f"**Stub response** ({model_name}, {digest[:12]})\n\n{words}"
+        # Roughly honour max_output_tokens (~4 characters per token)
+        return text[:max_tokens * 4]
+
+    def generate_text(self, model_name, prompt, max_tokens):
+        self._simulate_call(model_name)
+        return self._stub_text(model_name, prompt, max_tokens)
+
+    def generate_json(self, model_name, prompt, max_tokens):
+        # One array item per numbered line of the prompt (the versions a variants prompt asks for)
+        self._simulate_call(model_name)
+        items = self.NUMBERED_LINE.findall(prompt)
+        if not items:
+            return json.dumps({"text": self._stub_text(model_name, prompt, max_tokens)})
+        per_item = max(max_tokens // len(items), 1)
+        return json.dumps([{"id": int(number), "text": self._stub_text(model_name, f"{line}\n{prompt}", per_item)}
+                           for number, line in items])
+
+    def stream_text(self, model_name, prompt, max_tokens):
+        # Spend a quarter of the sampled latency before the first chunk, the rest between chunks
+        latency = self._sample_latency()
+        self._simulate_call(model_name, latency=latency / 4)
+        text = self._stub_text(model_name, prompt, max_tokens)
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        for chunk in chunks:
+            time.sleep(latency * 3 / 4 / len(chunks))
+            yield chunk
+
+    def generate_image(self, model_name, prompt, aspect_ratio):
+        from PIL import Image, ImageDraw
+
+        self._simulate_call(model_name)
+        digest = bytes.fromhex(self._digest(model_name, prompt))
+        width, height = self.IMAGE_SIZES.get(aspect_ratio, self.IMAGE_SIZES["1:1"])
+        image = Image.new("RGB", (width, height), tuple(digest[0:3]))
+        draw = ImageDraw.Draw(image)
+        # A few hash-derived bands so different prompts are visually distinct
+        for i in range(4):
+            top = height * i // 4
+            draw.rectangle([0, top, width, top + height // 8], fill=tuple(digest[3 + i * 3:6 + i * 3]))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+BACKENDS = {
+    VertexBackend.name: VertexBackend,
+    StubBackend.name: StubBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide model backend selected by Config.MODEL_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = BACKENDS.get(Config.MODEL_BACKEND)
+                if backend_class is None:
+                    raise ValueError(f"Unknown model backend '{Config.MODEL_BACKEND}', expected one of: {', '.join(BACKENDS)}")
+                _backend = backend_class()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (benchmarks and tests)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
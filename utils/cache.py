@@ -0,0 +1,212 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so trivially different submissions share a cache entry"""
+    return ' '.join(str(prompt).split())
+
+
+def make_cache_key(prompt, model_name, max_tokens, response_format=None):
+    """
+    Build the cache key from the normalized prompt, model name and max_output_tokens,
+    plus the response format when it is not plain text (e.g. 'json')
+    """
+    parts = [normalize_prompt(prompt), model_name, str(max_tokens)]
+    if response_format:
+        parts.append(response_format)
+    raw = '\x1f'.join(parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent cache tier so hits survive process restarts"""
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires_at)')
+        self._conn.commit()
+        self._writes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM response_cache WHERE cache_key = ?', [key]).fetchone()
+            if row is None:
+                return None, None
+            value, expires_at = row
+            if expires_at <= time.time():
+                self._conn.execute('DELETE FROM response_cache WHERE cache_key = ?', [key])
+                self._conn.commit()
+                self.evictions += 1
+                return None, None
+            return value, expires_at
+
+    def set(self, key, model_name, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO response_cache (cache_key, model_name, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                               [key, model_name, value, now, now + self.ttl])
+            self._writes += 1
+            # Trim expired and excess rows every so often rather than on every write
+            if self._writes % 100 == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now):
+        cur = self._conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', [now])
+        self.evictions += cur.rowcount
+        cur = self._conn.execute('''
+            DELETE FROM response_cache WHERE cache_key IN (
+                SELECT cache_key FROM response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', [self.max_entries])
+        self.evictions += cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+
+
+class ResponseCache:
+    """Two-tier cache for generated text: in-process LRU in front of SQLite"""
+
+    def __init__(self, memory, persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0, 'sets': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, prompt, model_names, max_tokens, response_format=None):
+        """Return the first cached response for any of the given models, or None"""
+        if isinstance(model_names, str):
+            model_names = [model_names]
+        keys = [make_cache_key(prompt, model_name, max_tokens, response_format) for model_name in model_names]
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                self._count('memory_hits')
+                return value
+        if self.persistent is not None:
+            for key in keys:
+                value, expires_at = self.persistent.get(key)
+                if value is not None:
+                    # Promote to the memory tier, but never past the persistent expiry
+                    self.memory.set(key, value, ttl=min(self.memory.ttl, expires_at - time.time()))
+                    self._count('persistent_hits')
+                    return value
+        self._count('misses')
+        return None
+
+    def set(self, prompt, model_name, max_tokens, value, response_format=None):
+        key = make_cache_key(prompt, model_name, max_tokens, response_format)
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, model_name, value)
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+        self._count('sets')
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['hits'] = stats['memory_hits'] + stats['persistent_hits']
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_evictions'] = self.memory.evictions
+        stats['persistent_evictions'] = self.persistent.evictions if self.persistent is not None else 0
+        stats['evictions'] = stats['memory_evictions'] + stats['persistent_evictions']
+        return stats
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                memory = MemoryCache(Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL)
+                persistent = None
+                if Config.RESPONSE_CACHE_DB:
+                    try:
+                        persistent = SQLiteCache(Config.RESPONSE_CACHE_DB, Config.RESPONSE_CACHE_PERSISTENT_TTL,
+                                                 Config.RESPONSE_CACHE_PERSISTENT_MAX_ENTRIES)
+                    except sqlite3.Error as e:
+                        print(f"Persistent response cache unavailable, using memory only: {e}")
+                _response_cache = ResponseCache(memory, persistent)
+    return _response_cache
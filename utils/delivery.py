@@ -0,0 +1,83 @@
+import gzip
+import re
+from flask import abort, send_file
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# '<sha256>.<extension>' names from utils.storage.content_key
+CONTENT_ADDRESSED_KEY = re.compile(r'^([0-9a-f]{64})\.[a-z0-9]+$')
+
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json')
+
+
+def image_response(store, key):
+    """
+    Serve a stored image with caching headers.
+
+    Content-addressed names never change, so they get the hash as a strong ETag
+    and a year-long immutable Cache-Control. send_file answers If-None-Match /
+    If-Modified-Since with 304 and Range requests with 206, and hands the file
+    to the server's wsgi.file_wrapper (sendfile) or X-Sendfile when enabled.
+    """
+    try:
+        path = store.backend.local_path(key)
+    except ValueError:
+        abort(404)
+    if path is None or not store.backend.exists(key):
+        abort(404)
+
+    match = CONTENT_ADDRESSED_KEY.match(key)
+    if match:
+        response = send_file(path, conditional=True, etag=match.group(1), max_age=Config.GENERATED_IMAGE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # Legacy uuid names are unique but not verifiable by content; cache them for a shorter time
+        response = send_file(path, conditional=True, max_age=Config.LEGACY_IMAGE_MAX_AGE)
+        response.cache_control.public = True
+    return response
+
+
+def choose_encoding(accept_encodings):
+    """Pick br or gzip from the request's Accept-Encoding, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(request, response):
+    """
+    after_request hook: ETag + conditional GET, then gzip/brotli for HTML and JSON bodies.
+    Streamed (SSE) and file responses are left untouched.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+
+    if request.method in ('GET', 'HEAD'):
+        # Weak validator: the same page in gzip or brotli is semantically equivalent
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
+    else:
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
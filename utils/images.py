@@ -0,0 +1,77 @@
+import io
+import json
+from config import Config
+
+# Output formats for derivatives: (variant key, Pillow format, file extension, MIME type)
+VARIANT_FORMATS = [
+    ('webp', 'WEBP', 'webp', 'image/webp'),
+    ('jpeg', 'JPEG', 'jpg', 'image/jpeg'),
+]
+
+
+def render_variant(image, width, pillow_format):
+    """Resize image to width (never upscaling) and encode it. Returns (bytes, actual width)."""
+    from PIL import Image
+
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), resample=Image.LANCZOS)
+    else:
+        width = image.width
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    options = {'quality': Config.IMAGE_VARIANT_QUALITY}
+    if pillow_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(buffer, format=pillow_format, **options)
+    return buffer.getvalue(), width
+
+
+def create_variants(image_bytes, save):
+    """
+    Produce WebP and JPEG derivatives of an image at each of Config.IMAGE_VARIANT_WIDTHS.
+
+    save(data, extension) stores one derivative and returns its URL.
+    Returns the JSON-serialisable description stored in generated_content.image_variants:
+    {"width": ..., "height": ..., "webp": [{"url", "width"}, ...], "jpeg": [...], "thumbnail": url}
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source.load()
+        variants = {'width': source.width, 'height': source.height}
+        widths = sorted(set(min(width, source.width) for width in Config.IMAGE_VARIANT_WIDTHS))
+        for key, pillow_format, extension, mime_type in VARIANT_FORMATS:
+            variants[key] = []
+            for width in widths:
+                data, actual_width = render_variant(source, width, pillow_format)
+                url = save(data, extension)
+                variants[key].append({'url': url, 'width': actual_width, 'bytes': len(data)})
+    # The smallest JPEG doubles as the thumbnail for clients without srcset support
+    variants['thumbnail'] = variants['jpeg'][0]['url']
+    return variants
+
+
+def srcset(variants, key):
+    """Format one variant list as an HTML srcset attribute value"""
+    return ', '.join(f"{variant['url']} {variant['width']}w" for variant in variants.get(key, []))
+
+
+def variant_urls(variants):
+    """Every derivative URL in an image_variants description"""
+    if not variants:
+        return []
+    return [variant['url'] for key, _, _, _ in VARIANT_FORMATS for variant in variants.get(key, [])]
+
+
+def load_variants(value):
+    """Parse the image_variants column (JSON text or None)"""
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
@@ -0,0 +1,198 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models.database import connect
+
+
+class JobQueue:
+    """
+    Generation jobs persisted in SQLite and executed by a bounded worker pool.
+
+    A job is claimed with a lease (locked_until), renewed by a heartbeat while
+    its handler runs. If the process dies while a job is running the lease
+    simply expires and the job is picked up again, so crash recovery needs no
+    separate bookkeeping and is safe with several worker processes sharing one
+    database. The locked_until value doubles as the lease token: a worker only
+    renews or finishes a job while the row still holds its lease, so a worker
+    that stalled past its lease cannot overwrite the job's new owner.
+    """
+
+    def __init__(self, app, database, workers=4, max_attempts=3, backoff_seconds=2.0,
+                 poll_interval=1.0, lease_seconds=300):
+        self.app = app
+        self.database = database
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.handlers = {}
+        self._executor = None
+        self._dispatcher = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def _connect(self):
+        return connect(self.database, isolation_level=None)
+
+    def register(self, kind, handler):
+        """Register handler(payload) for jobs of the given kind"""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, artisan_id=None, content_id=None):
+        """Persist a new pending job and wake the dispatcher. Returns the job id."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.execute('INSERT INTO generation_jobs (kind, payload, artisan_id, content_id, status, attempts, next_run_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               [kind, json.dumps(payload), artisan_id, content_id, 'pending', 0, now, now, now])
+            job_id = cur.lastrowid
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM generation_jobs WHERE id = ?', [job_id]).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def start(self):
+        """Start the dispatcher thread; expired leases from a previous run are recovered automatically"""
+        if self._dispatcher is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='generation-job')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='generation-job-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, wait=True):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            claimed = False
+            if self._slots.acquire(timeout=self.poll_interval):
+                try:
+                    job = self._claim()
+                except sqlite3.Error as e:
+                    print(f"Job queue claim failed: {e}")
+                    job = None
+                if job is not None:
+                    claimed = True
+                    self._executor.submit(self._run, job)
+                else:
+                    self._slots.release()
+            if not claimed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self):
+        """Atomically take the next runnable job (pending and due, or running with an expired lease)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT * FROM generation_jobs
+                WHERE (status = 'pending' AND next_run_at <= ?) OR (status = 'running' AND locked_until <= ?)
+                ORDER BY next_run_at, id LIMIT 1
+            ''', [now, now]).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if row['status'] == 'running':
+                print(f"Recovering generation job {row['id']} after expired lease")
+            conn.execute('UPDATE generation_jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? WHERE id = ?',
+                         ['running', now + self.lease_seconds, now, row['id']])
+            conn.execute('COMMIT')
+            job = dict(row)
+            job['attempts'] += 1
+            job['locked_until'] = now + self.lease_seconds
+            return job
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _run(self, job):
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop_heartbeat), name=f"generation-job-{job['id']}-heartbeat",
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                handler = self.handlers.get(job['kind'])
+                if handler is None:
+                    raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+                with self.app.app_context():
+                    result = handler(json.loads(job['payload']))
+            finally:
+                # No renewal may race the final update, which is conditional on the current lease
+                stop_heartbeat.set()
+                heartbeat.join()
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self._finish(job, status='done', result=json.dumps(result), error=None, locked_until=None)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    def _heartbeat(self, job, stop):
+        """Renew the job's lease every third of lease_seconds until stopped or the lease is lost"""
+        while not stop.wait(self.lease_seconds / 3):
+            lease = time.time() + self.lease_seconds
+            try:
+                renewed = self._update(job['id'], lease=job['locked_until'], locked_until=lease)
+            except sqlite3.Error as e:
+                # Try again on the next beat; the lease still has two thirds of its time left
+                print(f"Generation job {job['id']} lease renewal failed: {e}")
+                continue
+            if not renewed:
+                return
+            job['locked_until'] = lease
+
+    def _finish(self, job, **fields):
+        """Record the job's outcome, unless another worker has taken over its lease"""
+        if not self._update(job['id'], lease=job['locked_until'], **fields):
+            print(f"Generation job {job['id']} lost its lease to another worker; its {fields['status']} outcome was discarded")
+
+    def _fail(self, job, error):
+        if job['attempts'] >= self.max_attempts:
+            print(f"Generation job {job['id']} failed after {job['attempts']} attempts: {error}")
+            self._finish(job, status='failed', error=str(error), locked_until=None)
+            return
+        # Exponential backoff with jitter so retries of a shared outage spread out
+        delay = self.backoff_seconds * (2 ** (job['attempts'] - 1)) * random.uniform(0.5, 1.5)
+        self._finish(job, status='pending', error=str(error), locked_until=None, next_run_at=time.time() + delay)
+
+    def _update(self, job_id, lease=None, **fields):
+        """Update a job, only while it still holds lease (its locked_until) when given. Returns whether it was updated."""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        condition, args = 'id = ?', [job_id]
+        if lease is not None:
+            condition += " AND status = 'running' AND locked_until = ?"
+            args.append(lease)
+        conn = self._connect()
+        try:
+            cur = conn.execute(f'UPDATE generation_jobs SET {assignments} WHERE {condition}', list(fields.values()) + args)
+        finally:
+            conn.close()
+        return cur.rowcount > 0
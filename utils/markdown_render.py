@@ -0,0 +1,21 @@
+import hashlib
+from functools import lru_cache
+import markdown
+
+
+def content_hash(text):
+    """Hash of the markdown source, stored next to the rendered HTML to detect stale renders"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=1024)
+def render_markdown(text):
+    """Render markdown to HTML, memoized in-process for repeated text"""
+    return markdown.markdown(text or '')
+
+
+def render_content(text):
+    """Return (generated_html, content_hash) for a generated_text value"""
+    if text is None:
+        return None, None
+    return render_markdown(text), content_hash(text)
@@ -0,0 +1,229 @@
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_app_context
+from config import Config
+
+# Latency buckets in seconds, from a fast SQLite read up to a slow image generation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(name, '') for name in self.labelnames))
+        return series['count'] if series else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: (list(s['counts']), s['sum'], s['count']) for key, s in self._series.items()}
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+class Registry:
+    """Metrics plus collector callbacks, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """collector() returns [(name, type, help, [(labels dict, value), ...]), ...] computed at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {type_name}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram('http_request_duration_seconds', 'Time to produce a response, by route',
+                                          ('method', 'route', 'status'))
+SQLITE_QUERIES = registry.counter('sqlite_queries_total', 'SQLite statements executed')
+SQLITE_QUERY_SECONDS = registry.histogram('sqlite_query_duration_seconds', 'SQLite statement execution time')
+SQLITE_REQUEST_QUERIES = registry.histogram('sqlite_queries_per_request', 'SQLite statements executed per request, by route',
+                                            ('route',), buckets=COUNT_BUCKETS)
+SQLITE_REQUEST_SECONDS = registry.histogram('sqlite_time_per_request_seconds', 'Total SQLite time per request, by route', ('route',))
+MODEL_CALL_SECONDS = registry.histogram('model_call_duration_seconds', 'Model call latency, by model and outcome', ('model', 'outcome'))
+MODEL_ERRORS = registry.counter('model_errors_total', 'Failed model calls, by model and reason', ('model', 'reason'))
+MODEL_CALLS_COALESCED = registry.counter('model_calls_coalesced_total', 'Model calls saved by joining an identical call already in flight', ('kind',))
+VARIANT_FALLBACKS = registry.counter('variant_fallbacks_total', 'Variants generated by a separate call because the structured response lacked them, by reason', ('reason',))
+MODEL_CALLS_ABANDONED = registry.counter('model_calls_abandoned_total', 'Model calls that timed out and were left running in the background', ('model',))
+MODEL_FALLBACKS = registry.counter('model_fallbacks_total', 'Requests that fell back past the preferred model')
+IMAGE_GENERATION_SECONDS = registry.histogram('image_generation_duration_seconds', 'Image model call time', ('model',))
+IMAGE_BYTES_WRITTEN = registry.counter('image_bytes_written_total', 'Bytes of image data written to storage', ('kind',))
+RATE_LIMITED = registry.counter('rate_limited_total', 'Calls rejected by a rate limit or the model concurrency ceiling, by bucket', ('bucket',))
+IMAGES_DEDUPLICATED = registry.counter('images_deduplicated_total', 'Image writes skipped because identical content was already stored')
+
+
+def record_query(seconds, statement):
+    """Called by the database layer after every statement"""
+    SQLITE_QUERIES.inc()
+    SQLITE_QUERY_SECONDS.observe(seconds)
+    if has_app_context():
+        g._query_count = getattr(g, '_query_count', 0) + 1
+        g._query_seconds = getattr(g, '_query_seconds', 0.0) + seconds
+        spans = getattr(g, '_trace_spans', None)
+        if spans is not None:
+            start_ms = (time.perf_counter() - seconds - g._trace_started) * 1000
+            spans.append({'name': 'sqlite', 'start_ms': round(start_ms, 3), 'duration_ms': round(seconds * 1000, 3),
+                          'statement': ' '.join(statement.split())[:200]})
+
+
+@contextmanager
+def trace_span(name, **attributes):
+    """Time a block as a span of the current request's trace (no-op unless TRACE_REQUESTS is on)"""
+    spans = getattr(g, '_trace_spans', None) if has_app_context() else None
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    offset_ms = (started - g._trace_started) * 1000
+    try:
+        yield
+    except Exception as e:
+        attributes['error'] = str(e)[:200]
+        raise
+    finally:
+        spans.append({'name': name, 'start_ms': round(offset_ms, 3),
+                      'duration_ms': round((time.perf_counter() - started) * 1000, 3), **attributes})
+
+
+def begin_request():
+    """before_request hook: start per-request counters and, when enabled, a trace"""
+    g._request_started = time.perf_counter()
+    g._query_count = 0
+    g._query_seconds = 0.0
+    if Config.TRACE_REQUESTS:
+        g._trace_started = g._request_started
+        g._trace_spans = []
+
+
+def end_request(request, response):
+    """after_request hook: observe route latency and SQLite totals, and log the trace as one JSON line"""
+    started = getattr(g, '_request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+    SQLITE_REQUEST_QUERIES.observe(g._query_count, route=route)
+    SQLITE_REQUEST_SECONDS.observe(g._query_seconds, route=route)
+    spans = getattr(g, '_trace_spans', None)
+    if spans is not None:
+        print(json.dumps({
+            'trace_id': uuid.uuid4().hex,
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3),
+            'sqlite_queries': g._query_count,
+            'sqlite_ms': round(g._query_seconds * 1000, 3),
+            'spans': spans,
+        }))
+        g._trace_spans = None
+    return response
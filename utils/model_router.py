@@ -0,0 +1,307 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.metrics import MODEL_CALL_SECONDS, MODEL_CALLS_ABANDONED, MODEL_ERRORS, MODEL_FALLBACKS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# HTTP status codes that mean "try again later" rather than "this request is bad"
+# (google.api_core.exceptions.GoogleAPICallError.code, e.g. 503 for ServiceUnavailable)
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# gRPC status names with the same meaning (GoogleAPICallError.grpc_status_code, grpc.RpcError.code())
+TRANSIENT_GRPC_STATUSES = frozenset({'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'RESOURCE_EXHAUSTED', 'INTERNAL', 'ABORTED'})
+
+
+class ModelUnavailableError(Exception):
+    """Raised when every model's circuit is open"""
+
+
+class ModelCallTimeout(Exception):
+    """Raised when a model call exceeds the router's timeout"""
+
+
+# Failures that never reached the model or never came back
+TRANSIENT_ERROR_TYPES = (ModelCallTimeout, TimeoutError, ConnectionError)
+
+
+def error_status(error):
+    """(HTTP status code, gRPC status name) carried by a model SDK exception, None for each it lacks"""
+    code = getattr(error, 'code', None)
+    if callable(code):
+        # grpc.RpcError exposes its status through a method
+        try:
+            code = code()
+        except Exception:
+            code = None
+    grpc_status = getattr(error, 'grpc_status_code', None)
+    if not isinstance(code, int):
+        grpc_status = grpc_status or code
+        code = None
+    return code, getattr(grpc_status, 'name', None)
+
+
+def is_unavailable_error(error):
+    """The model does not exist or is not offered in this project/region (404 / NOT_FOUND)"""
+    code, grpc_status = error_status(error)
+    return code == 404 or grpc_status == 'NOT_FOUND'
+
+
+def is_transient_error(error):
+    if isinstance(error, TRANSIENT_ERROR_TYPES):
+        return True
+    code, grpc_status = error_status(error)
+    return code in TRANSIENT_STATUS_CODES or grpc_status in TRANSIENT_GRPC_STATUSES
+
+
+def error_reason(error):
+    """Metric label for a failed model call"""
+    if isinstance(error, (ModelCallTimeout, TimeoutError)):
+        return 'timeout'
+    if is_unavailable_error(error):
+        return 'unavailable'
+    if is_transient_error(error):
+        return 'transient'
+    return 'bad_request'
+
+
+class ModelHealth:
+    """Rolling success/latency statistics and circuit state for one model"""
+
+    def __init__(self, name, window):
+        self.name = name
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.latency_ewma_ms = None
+        self.abandoned_calls = 0
+        self.outcomes = deque(maxlen=window)
+        self.recent_errors = deque(maxlen=5)
+
+    def success_rate(self):
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'open_for_seconds': round(max(self.open_until - time.time(), 0), 1) if self.state == OPEN else 0,
+            'success_rate': round(self.success_rate(), 3),
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'latency_ewma_ms': round(self.latency_ewma_ms, 1) if self.latency_ewma_ms is not None else None,
+            'abandoned_calls': self.abandoned_calls,
+            'recent_errors': list(self.recent_errors),
+        }
+
+
+class ModelRouter:
+    """
+    Health-aware routing over a preference-ordered list of models.
+
+    A model that keeps failing (or reports 404 / NOT_FOUND) has its
+    circuit opened for a cooldown so requests stop paying for a doomed
+    round-trip. After the cooldown a single trial request is let through
+    (half-open); its outcome closes or re-opens the circuit.
+
+    Calls run on a shared pool of call_threads threads so they can time out.
+    A timed-out call cannot be interrupted: it keeps running, and keeps its
+    thread, until the SDK returns. Such abandoned calls are counted in
+    model_calls_abandoned_total; once a model has max_abandoned_calls of them
+    still running, further calls to it fail fast as timeouts instead of tying
+    up more threads, so a hung model cannot starve the others of the pool.
+    """
+
+    def __init__(self, model_names, failure_threshold=5, cooldown_seconds=30, unavailable_cooldown_seconds=600,
+                 timeout_seconds=60, max_retries=2, retry_base_delay=0.5, healthy_success_rate=0.8,
+                 window=50, call_threads=32, max_abandoned_calls=8):
+        self.model_names = list(model_names)
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.unavailable_cooldown_seconds = unavailable_cooldown_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.healthy_success_rate = healthy_success_rate
+        self._health = {name: ModelHealth(name, window) for name in self.model_names}
+        self._lock = threading.Lock()
+        self._call_threads = call_threads
+        self.max_abandoned_calls = max_abandoned_calls
+        self._executor = None
+        self.fallbacks = 0
+
+    def ordered_models(self):
+        """Models to try for the next request, healthiest first; open circuits are skipped"""
+        now = time.time()
+        candidates = []
+        with self._lock:
+            for index, name in enumerate(self.model_names):
+                health = self._health[name]
+                if health.state == OPEN and now >= health.open_until:
+                    health.state = HALF_OPEN
+                    health.trial_in_flight = False
+                if health.state == OPEN:
+                    continue
+                if health.state == HALF_OPEN:
+                    if health.trial_in_flight:
+                        continue
+                    # Let exactly one trial request through
+                    health.trial_in_flight = True
+                healthy = health.state == CLOSED and health.success_rate() >= self.healthy_success_rate
+                latency = health.latency_ewma_ms if health.latency_ewma_ms is not None else 0
+                # Healthy models in configured preference order, then the rest by success rate and latency
+                key = (0, index, 0, 0) if healthy else (1, 0, -health.success_rate(), latency)
+                candidates.append((key, name))
+        return [name for key, name in sorted(candidates)]
+
+    def record_success(self, name, latency_ms):
+        MODEL_CALL_SECONDS.observe(latency_ms / 1000, model=name, outcome='success')
+        with self._lock:
+            health = self._health[name]
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.outcomes.append(1)
+            if health.latency_ewma_ms is None:
+                health.latency_ewma_ms = latency_ms
+            else:
+                health.latency_ewma_ms = 0.8 * health.latency_ewma_ms + 0.2 * latency_ms
+            health.state = CLOSED
+            health.trial_in_flight = False
+
+    def record_failure(self, name, error, latency_ms=None):
+        MODEL_ERRORS.inc(model=name, reason=error_reason(error))
+        if latency_ms is not None:
+            MODEL_CALL_SECONDS.observe(latency_ms / 1000, model=name, outcome='error')
+        with self._lock:
+            health = self._health[name]
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.outcomes.append(0)
+            health.recent_errors.append(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {str(error)[:200]}")
+            health.trial_in_flight = False
+            if is_unavailable_error(error):
+                self._open(health, self.unavailable_cooldown_seconds)
+            elif health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                self._open(health, self.cooldown_seconds)
+
+    def record_fallback(self):
+        """Count a request moving on from its first-choice model"""
+        MODEL_FALLBACKS.inc()
+        with self._lock:
+            self.fallbacks += 1
+
+    def release(self, name):
+        """Give back a half-open trial slot that was handed out but never used"""
+        with self._lock:
+            self._health[name].trial_in_flight = False
+
+    def _open(self, health, cooldown):
+        if health.state != OPEN:
+            print(f"Opening circuit for model {health.name} for {cooldown}s: {health.recent_errors[-1] if health.recent_errors else ''}")
+        health.state = OPEN
+        health.open_until = time.time() + cooldown
+
+    def _run_with_timeout(self, fn, model_name, slot=None):
+        if not self.timeout_seconds:
+            return fn(model_name)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._call_threads, thread_name_prefix='model-call')
+        health = self._health[model_name]
+        with self._lock:
+            if health.abandoned_calls >= self.max_abandoned_calls:
+                raise ModelCallTimeout(f"Model {model_name} has {health.abandoned_calls} timed-out calls still running")
+        future = self._executor.submit(fn, model_name)
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            # A call still queued for a thread is simply dropped; a running one is left to finish
+            if not future.cancel():
+                self._abandon(health, future, slot.hand_over() if slot is not None else None)
+            raise ModelCallTimeout(f"Model {model_name} timed out after {self.timeout_seconds}s")
+
+    def _abandon(self, health, future, release_slot=None):
+        MODEL_CALLS_ABANDONED.inc(model=health.name)
+        with self._lock:
+            health.abandoned_calls += 1
+
+        def finished(future):
+            with self._lock:
+                health.abandoned_calls -= 1
+            # The call was still using its concurrency slot until now
+            if release_slot is not None:
+                release_slot()
+
+        future.add_done_callback(finished)
+
+    def call(self, fn, slot=None):
+        """
+        Call fn(model_name) on the healthiest model, retrying transient errors with
+        jittered backoff and falling back to the next model. Returns (result, model_name).
+        slot (a utils.ratelimit.ModelCallSlot) is handed to any call abandoned by the
+        timeout, and taken again before the next attempt.
+        """
+        models = self.ordered_models()
+        if not models:
+            raise ModelUnavailableError("All models are temporarily unavailable (circuits open)")
+
+        last_error = None
+        for position, model_name in enumerate(models):
+            if position > 0:
+                self.record_fallback()
+            for attempt in range(self.max_retries + 1):
+                if slot is not None:
+                    try:
+                        slot.ensure()
+                    except Exception:
+                        for remaining in models[position:]:
+                            self.release(remaining)
+                        raise
+                started = time.perf_counter()
+                try:
+                    result = self._run_with_timeout(fn, model_name, slot)
+                except Exception as e:
+                    last_error = e
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    if not (is_unavailable_error(e) or is_transient_error(e)):
+                        # The request itself is bad; another model or retry will not help
+                        MODEL_ERRORS.inc(model=model_name, reason='bad_request')
+                        self.release(model_name)
+                        for remaining in models[position + 1:]:
+                            self.release(remaining)
+                        raise
+                    self.record_failure(model_name, e, latency_ms)
+                    if is_unavailable_error(e) or self._health[model_name].state == OPEN:
+                        break
+                    if attempt < self.max_retries:
+                        # Full jitter keeps retries from a shared outage from arriving in lockstep
+                        time.sleep(random.uniform(0, self.retry_base_delay * (2 ** attempt)))
+                else:
+                    self.record_success(model_name, (time.perf_counter() - started) * 1000)
+                    for remaining in models[position + 1:]:
+                        self.release(remaining)
+                    return result, model_name
+        raise last_error
+
+    def snapshot(self):
+        """Router state for inspection"""
+        with self._lock:
+            return {
+                'models': {name: self._health[name].snapshot() for name in self.model_names},
+                'fallbacks': self.fallbacks,
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown_seconds,
+                'timeout_seconds': self.timeout_seconds,
+                'max_abandoned_calls': self.max_abandoned_calls,
+                'max_retries': self.max_retries,
+            }
@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from models.database import get_db, transaction
+
+# Draft content types pre-generated for every product, with the generate_as option that produces them
+DRAFT_TYPES = {
+    'product_listing': 'product_listing_third_person',
+    'social_caption': 'social_caption',
+}
+
+CHECKPOINT = 'pregenerate_drafts'
+
+# Products after the checkpoint, with the draft types they already have (artisans that no longer exist are skipped)
+PRODUCTS_QUERY = '''
+    SELECT p.id, p.artisan_id, p.name, p.description, p.price,
+           (SELECT group_concat(c.content_type) FROM generated_content c WHERE c.product_id = p.id) AS drafted
+    FROM products p JOIN artisans a ON a.id = p.artisan_id
+    WHERE p.id > ? ORDER BY p.id LIMIT ?
+'''
+
+# Skips the insert if another run stored the same draft in the meantime
+DRAFT_INSERT = '''
+    INSERT INTO generated_content (artisan_id, product_id, content_type, prompt, generated_text, approval_status, include_quote)
+    SELECT ?, ?, ?, ?, ?, 'pending', 0
+    WHERE NOT EXISTS (SELECT 1 FROM generated_content WHERE product_id = ? AND content_type = ?)
+'''
+
+
+def product_prompt(product):
+    """The 'additional details' of a draft: the product's name, description and price"""
+    prompt = f"Product: {product['name']}"
+    if product['description']:
+        prompt += f". {product['description']}"
+    if product['price'] is not None:
+        prompt += f". Price: {product['price']:.2f}"
+    return prompt
+
+
+def missing_drafts(product):
+    drafted = set((product['drafted'] or '').split(','))
+    return [content_type for content_type in DRAFT_TYPES if content_type not in drafted]
+
+
+def load_checkpoint(db, name=CHECKPOINT):
+    row = db.execute('SELECT position FROM pipeline_checkpoints WHERE name = ?', [name]).fetchone()
+    return row['position'] if row else 0
+
+
+def save_checkpoint(db, position, name=CHECKPOINT):
+    db.execute('INSERT INTO pipeline_checkpoints (name, position, updated_at) VALUES (?, ?, ?) '
+               'ON CONFLICT (name) DO UPDATE SET position = excluded.position, updated_at = excluded.updated_at',
+               [name, position, time.time()])
+
+
+def pregenerate_drafts(build_request, generate, concurrency=None, batch_size=None, deadline=None, restart=False, log=print):
+    """
+    Generate the missing DRAFT_TYPES for every product and store them as pending content.
+
+    Products are walked in id order from the saved checkpoint, batch_size at a time.
+    build_request(product, content_type) returns the content request (prompt and
+    generate_as) and runs here, with the app context; generate(content_request) makes
+    the model call and runs on up to concurrency worker threads. Each batch's drafts and
+    the new checkpoint are committed together, so an interrupted run resumes after the
+    last finished batch. Failed drafts are left missing and retried by the next pass.
+    Stops before starting a batch once time.monotonic() passes deadline.
+    Returns {'products', 'drafts', 'failed', 'complete'}.
+    """
+    concurrency = concurrency or Config.PREGENERATE_CONCURRENCY
+    if Config.MODEL_MAX_CONCURRENCY > 0:
+        # More workers than model slots would only wait for them and fail
+        concurrency = min(concurrency, Config.MODEL_MAX_CONCURRENCY)
+    batch_size = batch_size or Config.PREGENERATE_BATCH_SIZE
+    db = get_db()
+    position = 0 if restart else load_checkpoint(db)
+    if position and log:
+        log(f'Resuming after product {position}')
+    report = {'products': 0, 'drafts': 0, 'failed': 0, 'complete': False}
+
+    def run(task):
+        try:
+            return generate(task['request']), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='pregenerate') as executor:
+        while deadline is None or time.monotonic() < deadline:
+            products = db.execute(PRODUCTS_QUERY, [position, batch_size]).fetchall()
+            if not products:
+                # Pass finished; the next run starts from the first product again
+                with transaction():
+                    save_checkpoint(db, 0)
+                report['complete'] = True
+                break
+            tasks = [{'product': product, 'content_type': content_type, 'request': build_request(product, content_type)}
+                     for product in products for content_type in missing_drafts(product)]
+            drafts = []
+            for task, (text, error) in zip(tasks, executor.map(run, tasks)):
+                product = task['product']
+                if error is not None:
+                    report['failed'] += 1
+                    if log:
+                        log(f"Product {product['id']} {task['content_type']}: {error}")
+                    continue
+                drafts.append([product['artisan_id'], product['id'], task['content_type'], task['request']['prompt'], text,
+                               product['id'], task['content_type']])
+            with transaction():
+                report['drafts'] += db.executemany(DRAFT_INSERT, drafts).rowcount if drafts else 0
+                position = products[-1]['id']
+                save_checkpoint(db, position)
+            report['products'] += len(products)
+    return report
@@ -0,0 +1,101 @@
+import re
+import threading
+from config import Config
+from models.database import query_db
+from utils.cache import MemoryCache
+
+PROFILE_QUERY = 'SELECT id, username, full_name, craft_type, location, bio, materials, profile_version FROM artisans WHERE id = ?'
+# Triggers change profile_version on every write to the profile columns (migration 0011)
+VERSION_QUERY = 'SELECT profile_version FROM artisans WHERE id = ?'
+
+# Rough characters per token, the same estimate the stub backend uses for max_output_tokens
+CHARS_PER_TOKEN = 4
+SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_text(text, max_tokens):
+    """
+    Return text unchanged when it fits max_tokens. Otherwise collapse whitespace and,
+    if still over, keep the leading sentences that fit (or the leading words when
+    even the first sentence does not).
+    """
+    text = text or ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    text = ' '.join(text.split())
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    sentence_ends = [match.end() for match in SENTENCE_END.finditer(head + ' ')]
+    if sentence_ends:
+        return head[:sentence_ends[-1]]
+    return head.rsplit(' ', 1)[0].rstrip(',;:') + '...'
+
+
+def build_prompt_prefix(profile):
+    """The artisan details every generation prompt starts from"""
+    bio = compact_text(profile['bio'], Config.PROFILE_BIO_MAX_TOKENS) if profile['bio'] else profile['bio']
+    return (f"Artisan: {profile['full_name']}, Craft: {profile['craft_type']}, Location: {profile['location']}, "
+            f"Bio: {bio}, Materials: {profile['materials'] or ''}")
+
+
+class ProfileContextCache:
+    """
+    LRU of {'profile': row as dict, 'prefix': prompt prefix, 'version': profile_version}
+    per artisan id. Each lookup checks the row's profile_version, so a profile change
+    made anywhere (another route, worker process or script) is picked up on the next request.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.entries = MemoryCache(max_entries, ttl)
+
+    def get(self, artisan_id):
+        """The artisan's context, loading it when missing or stale; None if there is no such artisan"""
+        current = query_db(VERSION_QUERY, [artisan_id], one=True)
+        if current is None:
+            self.entries.delete(artisan_id)
+            return None
+        context = self.entries.get(artisan_id)
+        if context is None or context['version'] != current['profile_version']:
+            row = query_db(PROFILE_QUERY, [artisan_id], one=True)
+            if row is None:
+                return None
+            profile = dict(row)
+            version = profile.pop('profile_version')
+            context = {'profile': profile, 'prefix': build_prompt_prefix(profile), 'version': version}
+            self.entries.set(artisan_id, context)
+        return context
+
+    def invalidate(self, artisan_id):
+        self.entries.delete(artisan_id)
+
+    def clear(self):
+        self.entries.clear()
+
+
+_profile_cache = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache():
+    """Return the process-wide profile context cache"""
+    global _profile_cache
+    if _profile_cache is None:
+        with _profile_cache_lock:
+            if _profile_cache is None:
+                _profile_cache = ProfileContextCache(Config.PROFILE_CACHE_MAX_ENTRIES, Config.PROFILE_CACHE_TTL)
+    return _profile_cache
+
+
+def get_profile_context(artisan_id):
+    return get_profile_cache().get(artisan_id)
+
+
+def invalidate_profile(artisan_id):
+    """Drop an artisan's cached context (profile writes are detected without this)"""
+    get_profile_cache().invalidate(artisan_id)
@@ -0,0 +1,314 @@
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from config import Config
+from utils.metrics import RATE_LIMITED
+
+
+class RateLimited(Exception):
+    """A rate limit or the model concurrency ceiling rejected the call"""
+
+    def __init__(self, bucket, retry_after, message=None):
+        self.bucket = bucket
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{message or f'Rate limit exceeded for {bucket} generation'}, retry after {self.retry_after}s")
+
+
+class OverCapacity(ValueError):
+    """A call costs more tokens than its bucket holds, so no amount of waiting would let it through"""
+
+    def __init__(self, bucket, cost, capacity):
+        self.bucket = bucket
+        self.cost = cost
+        self.capacity = capacity
+        super().__init__(f"This request needs {cost} {bucket} generations at once but at most {capacity} are allowed")
+
+
+def refill(tokens, updated_at, now, rate, capacity):
+    """Tokens in a bucket after refilling at rate per second since updated_at"""
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def wait_time(tokens, cost, rate):
+    """Seconds until a bucket holding tokens can pay cost, 0 if it already can"""
+    if tokens >= cost:
+        return 0.0
+    return (cost - tokens) / rate if rate > 0 else float('inf')
+
+
+class MemoryBuckets:
+    """In-process token buckets; the least recently used are dropped past max_keys"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, capacity):
+        """Take cost tokens from the bucket if it holds them. Returns the wait in seconds, 0 when taken."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated_at, now, rate, capacity)
+            wait = wait_time(tokens, cost, rate)
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file shared by every worker process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f'PRAGMA busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket_key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._writes = 0
+
+    def take(self, key, cost, rate, capacity):
+        now = time.time()
+        with self._lock:
+            # The write lock makes read-refill-take atomic across processes
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?', [key]).fetchone()
+                tokens = refill(row[0], row[1], now, rate, capacity) if row else capacity
+                wait = wait_time(tokens, cost, rate)
+                if not wait:
+                    tokens -= cost
+                self._conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)',
+                                   [key, tokens, now])
+                self._writes += 1
+                # Buckets idle long enough to have refilled are equivalent to missing ones
+                if self._writes % 100 == 0 and rate > 0:
+                    self._conn.execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', [now - capacity / rate])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM rate_limit_buckets')
+
+
+class RateLimiter:
+    """Token-bucket limits per (bucket, identity); limits maps bucket -> (per_minute, burst)"""
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits
+
+    def check(self, bucket, identity, cost=1):
+        """Take cost tokens, returning 0 when allowed or the seconds to wait before retrying (OverCapacity if never)"""
+        per_minute, burst = self.limits[bucket]
+        if per_minute <= 0:
+            return 0.0
+        if cost > burst:
+            raise OverCapacity(bucket, cost, burst)
+        wait = self.store.take(f'{bucket}:{identity}', cost, per_minute / 60.0, burst)
+        if wait:
+            RATE_LIMITED.inc(bucket=bucket)
+        return wait
+
+    def hit(self, bucket, identity, cost=1):
+        """Take cost tokens or raise RateLimited"""
+        wait = self.check(bucket, identity, cost)
+        if wait:
+            raise RateLimited(bucket, wait)
+
+
+class MemoryConcurrencyLimit:
+    """Ceiling on model calls in flight in this process"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        if not self._semaphore.acquire(timeout=timeout):
+            return None
+        with self._lock:
+            self._in_flight += 1
+        return True
+
+    def release(self, slot):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    def in_flight(self):
+        return self._in_flight
+
+
+class SQLiteConcurrencyLimit:
+    """
+    Ceiling on model calls in flight across every worker sharing the SQLite file.
+    Slots are leased so a worker that dies mid-call cannot hold one forever.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, path, limit, lease_seconds):
+        self.path = path
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f'PRAGMA busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS model_call_slots (
+                slot_id TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+        ''')
+
+    def _try_acquire(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('DELETE FROM model_call_slots WHERE expires_at <= ?', [now])
+                in_flight = self._conn.execute('SELECT COUNT(*) FROM model_call_slots').fetchone()[0]
+                slot = None
+                if in_flight < self.limit:
+                    slot = uuid.uuid4().hex
+                    self._conn.execute('INSERT INTO model_call_slots (slot_id, expires_at) VALUES (?, ?)', [slot, now + self.lease_seconds])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+        return slot
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            slot = self._try_acquire()
+            if slot is not None or time.monotonic() >= deadline:
+                return slot
+            time.sleep(self.POLL_INTERVAL)
+
+    def release(self, slot):
+        with self._lock:
+            self._conn.execute('DELETE FROM model_call_slots WHERE slot_id = ?', [slot])
+
+    def in_flight(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM model_call_slots WHERE expires_at > ?', [time.time()]).fetchone()[0]
+
+
+_rate_limiter = None
+_concurrency_limit = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, using the shared SQLite store when RATE_LIMIT_STORE is 'sqlite'"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _limiter_lock:
+            if _rate_limiter is None:
+                store = None
+                if Config.RATE_LIMIT_STORE == 'sqlite':
+                    try:
+                        store = SQLiteBuckets(Config.RATE_LIMIT_DB)
+                    except sqlite3.Error as e:
+                        print(f"Shared rate limit store unavailable, limiting per process: {e}")
+                _rate_limiter = RateLimiter(store or MemoryBuckets(Config.RATE_LIMIT_MAX_KEYS), {
+                    'text': (Config.RATE_LIMIT_TEXT_PER_MINUTE, Config.RATE_LIMIT_TEXT_BURST),
+                    'image': (Config.RATE_LIMIT_IMAGE_PER_MINUTE, Config.RATE_LIMIT_IMAGE_BURST),
+                })
+    return _rate_limiter
+
+
+def get_concurrency_limit():
+    """Return the process-wide model call ceiling, or None when MODEL_MAX_CONCURRENCY is 0"""
+    global _concurrency_limit
+    if _concurrency_limit is None and Config.MODEL_MAX_CONCURRENCY > 0:
+        with _limiter_lock:
+            if _concurrency_limit is None:
+                limit = None
+                if Config.RATE_LIMIT_STORE == 'sqlite':
+                    try:
+                        limit = SQLiteConcurrencyLimit(Config.RATE_LIMIT_DB, Config.MODEL_MAX_CONCURRENCY, Config.JOB_LEASE_SECONDS)
+                    except sqlite3.Error as e:
+                        print(f"Shared model call ceiling unavailable, limiting per process: {e}")
+                _concurrency_limit = limit or MemoryConcurrencyLimit(Config.MODEL_MAX_CONCURRENCY)
+    return _concurrency_limit
+
+
+def set_limiters(rate_limiter=None, concurrency_limit=None):
+    """Replace the process-wide limiters (tests); None recreates them from Config on next use"""
+    global _rate_limiter, _concurrency_limit
+    with _limiter_lock:
+        _rate_limiter = rate_limiter
+        _concurrency_limit = concurrency_limit
+
+
+class ModelCallSlot:
+    """
+    One of the MODEL_MAX_CONCURRENCY model call slots, held by a request. A call the
+    router abandons after a timeout keeps running, so it is handed the slot and frees
+    it when it finishes; the request takes a new slot before its next call.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.slot = None
+
+    def ensure(self):
+        """Hold a slot, waiting up to MODEL_CONCURRENCY_WAIT_SECONDS for one, or raise RateLimited"""
+        if self.limit is None or self.slot is not None:
+            return
+        slot = self.limit.acquire(Config.MODEL_CONCURRENCY_WAIT_SECONDS)
+        if slot is None:
+            RATE_LIMITED.inc(bucket='concurrency')
+            raise RateLimited('concurrency', Config.MODEL_CONCURRENCY_WAIT_SECONDS, 'Too many generations in progress')
+        self.slot = slot
+
+    def hand_over(self):
+        """Give up the held slot, returning the function that releases it"""
+        slot, self.slot = self.slot, None
+        if self.limit is None or slot is None:
+            return lambda: None
+        return partial(self.limit.release, slot)
+
+    def release(self):
+        self.hand_over()()
+
+
+@contextmanager
+def model_call_slot():
+    """Hold a ModelCallSlot for the block, waiting up to MODEL_CONCURRENCY_WAIT_SECONDS for it"""
+    slot = ModelCallSlot(get_concurrency_limit())
+    slot.ensure()
+    try:
+        yield slot
+    finally:
+        slot.release()
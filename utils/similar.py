@@ -0,0 +1,191 @@
+import re
+import threading
+import zlib
+from config import Config
+from models.database import query_db
+from utils.cache import MemoryCache
+
+# Approved text content of one artisan, embedded from the prompt that produced it
+APPROVED_QUERY = '''
+    SELECT id, content_type, language, tone, prompt FROM generated_content
+    WHERE artisan_id = ? AND approval_status = 'approved' AND generated_text IS NOT NULL
+'''
+
+WORD = re.compile(r'\w+')
+
+# Words too common to say anything about what was asked for
+STOPWORDS = frozenset('a an and are as at be by for from in into is it its of on or our that the this to with my me i we you your'.split())
+
+
+def content_kind(content_type, language, tone):
+    """
+    Only content of the same type, language and tone is suggested (rows from before
+    languages and tones were stored are English and friendly, the form's defaults)
+    """
+    return f"{content_type}/{language or 'english'}/{tone or 'friendly'}"
+
+
+def _hashes(text):
+    """Hashes of a text's words and of each word's character trigrams (so 'vase' and 'vases' overlap)"""
+    hashes = []
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        hashes.append(zlib.crc32(word.encode('utf-8')))
+        padded = f' {word} '
+        hashes.extend(zlib.crc32(padded[i:i + 3].encode('utf-8')) for i in range(len(padded) - 2))
+    return hashes
+
+
+def embed(texts, dim=None):
+    """
+    L2-normalised hashed n-gram vectors for texts, one float32 row per text. Each hash
+    picks a column and a sign, so collisions tend to cancel out instead of adding up.
+    Texts without words get a zero row, which matches nothing.
+    """
+    # numpy is imported on first use so it does not slow down importing the app
+    import numpy as np
+
+    dim = dim or Config.SIMILAR_VECTOR_DIM
+    hashes = [_hashes(text) for text in texts]
+    rows = np.repeat(np.arange(len(texts)), [len(row) for row in hashes])
+    values = np.fromiter((value for row in hashes for value in row), dtype=np.uint32, count=len(rows))
+    signs = np.where(values >> 31, -1.0, 1.0).astype(np.float32)
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    np.add.at(vectors, (rows, values % dim), signs)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+class ArtisanVectors:
+    """Embeddings of one artisan's approved content, grown in place as more is approved"""
+
+    def __init__(self, dim, ids=(), kinds=(), texts=()):
+        import numpy as np
+
+        self.dim = dim
+        self.size = len(ids)
+        capacity = max(self.size, 16)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        # Kinds are stored as small integer codes so filtering them is a vectorised comparison
+        self.kind_codes = {}
+        self.kinds = np.zeros(capacity, dtype=np.int32)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        if self.size:
+            self.ids[:self.size] = ids
+            self.kinds[:self.size] = [self._code(kind) for kind in kinds]
+            self.vectors[:self.size] = embed(texts, dim)
+        self._lock = threading.Lock()
+
+    def _code(self, kind):
+        return self.kind_codes.setdefault(kind, len(self.kind_codes))
+
+    def add(self, content_id, kind, text):
+        import numpy as np
+
+        vector = embed([text], self.dim)[0]
+        with self._lock:
+            self._remove(content_id)
+            if self.size == len(self.ids):
+                # Double the arrays so appends stay amortised O(1)
+                capacity = len(self.ids) * 2
+                self.ids = np.resize(self.ids, capacity)
+                self.kinds = np.resize(self.kinds, capacity)
+                self.vectors = np.resize(self.vectors, (capacity, self.dim))
+            self.ids[self.size] = content_id
+            self.kinds[self.size] = self._code(kind)
+            self.vectors[self.size] = vector
+            self.size += 1
+
+    def remove(self, content_id):
+        with self._lock:
+            self._remove(content_id)
+
+    def _remove(self, content_id):
+        import numpy as np
+
+        # Move the last row into the gap
+        positions = np.flatnonzero(self.ids[:self.size] == content_id)
+        if len(positions):
+            last = self.size - 1
+            position = positions[0]
+            self.ids[position] = self.ids[last]
+            self.kinds[position] = self.kinds[last]
+            self.vectors[position] = self.vectors[last]
+            self.size = last
+
+    def search(self, vector, kind, k, min_score):
+        """[(content id, cosine similarity)] of the k best matches of kind scoring at least min_score"""
+        import numpy as np
+
+        with self._lock:
+            code = self.kind_codes.get(kind)
+            if code is None:
+                return []
+            scores = self.vectors[:self.size] @ vector
+            scores[self.kinds[:self.size] != code] = -1.0
+            ids = self.ids[:self.size].copy()
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(ids[position]), float(scores[position])) for position in candidates]
+
+    def __len__(self):
+        return self.size
+
+
+class SimilarContentIndex:
+    """
+    Per-artisan vector indexes of approved content, loaded on first search and kept in
+    an LRU (the TTL picks up approvals made by other worker processes).
+    """
+
+    def __init__(self, max_artisans, ttl, dim):
+        self.entries = MemoryCache(max_artisans, ttl)
+        self.dim = dim
+
+    def vectors(self, artisan_id):
+        vectors = self.entries.get(artisan_id)
+        if vectors is None:
+            rows = query_db(APPROVED_QUERY, [artisan_id])
+            vectors = ArtisanVectors(self.dim, [row['id'] for row in rows],
+                                     [content_kind(row['content_type'], row['language'], row['tone']) for row in rows],
+                                     [row['prompt'] or '' for row in rows])
+            self.entries.set(artisan_id, vectors)
+        return vectors
+
+    def search(self, artisan_id, content_type, language, tone, prompt, k=None, min_score=None):
+        """Ids and scores of the artisan's approved content whose prompts are closest to prompt, best first"""
+        k = k or Config.SIMILAR_MAX_RESULTS
+        min_score = Config.SIMILAR_MIN_SCORE if min_score is None else min_score
+        return self.vectors(artisan_id).search(embed([prompt], self.dim)[0], content_kind(content_type, language, tone), k, min_score)
+
+    def add(self, artisan_id, content):
+        """Index a newly approved generated_content row (artisans not loaded yet pick it up when they are)"""
+        vectors = self.entries.get(artisan_id)
+        if vectors is not None:
+            vectors.add(content['id'], content_kind(content['content_type'], content['language'], content['tone']), content['prompt'] or '')
+
+    def remove(self, artisan_id, content_id):
+        vectors = self.entries.get(artisan_id)
+        if vectors is not None:
+            vectors.remove(content_id)
+
+    def clear(self):
+        self.entries.clear()
+
+
+_similar_index = None
+_similar_index_lock = threading.Lock()
+
+
+def get_similar_index():
+    """Return the process-wide similar content index"""
+    global _similar_index
+    if _similar_index is None:
+        with _similar_index_lock:
+            if _similar_index is None:
+                _similar_index = SimilarContentIndex(Config.SIMILAR_CACHE_MAX_ARTISANS, Config.SIMILAR_CACHE_TTL,
+                                                     Config.SIMILAR_VECTOR_DIM)
+    return _similar_index
@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Wall-clock timings of startup phases, from app import through background warm-up"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, started, finished=None, error=None):
+        finished = time.perf_counter() if finished is None else finished
+        phase = {
+            'name': name,
+            'start_ms': round((started - self.started) * 1000, 1),
+            'duration_ms': round((finished - started) * 1000, 1),
+            'thread': threading.current_thread().name,
+        }
+        if error is not None:
+            phase['error'] = ' '.join(str(error).split())[:200]
+        with self._lock:
+            self.phases.append(phase)
+
+    @contextmanager
+    def phase(self, name, suppress=False):
+        """Time a block; with suppress=True a failure is recorded and logged instead of raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, started, error=e)
+            if not suppress:
+                raise
+            print(f"Startup phase '{name}' failed: {e}")
+        else:
+            self.record(name, started)
+
+    def report(self):
+        with self._lock:
+            phases = list(self.phases)
+        return {
+            'total_ms': round(max((p['start_ms'] + p['duration_ms'] for p in phases), default=0), 1),
+            'phases': phases,
+        }
+
+    def format(self):
+        """Human-readable startup report"""
+        report = self.report()
+        lines = [f"Startup profile ({report['total_ms']}ms since app import):"]
+        for phase in report['phases']:
+            suffix = f"  FAILED: {phase['error']}" if 'error' in phase else ''
+            lines.append(f"  {phase['start_ms']:>9.1f}ms  +{phase['duration_ms']:>8.1f}ms  {phase['name']} [{phase['thread']}]{suffix}")
+        return '\n'.join(lines)
+
+
+class BackgroundWarmUp:
+    """Runs warm_up(profile) once on a daemon thread, the first time start() is called"""
+
+    def __init__(self, profile, warm_up, report=False):
+        self.profile = profile
+        self.warm_up = warm_up
+        self.report = report
+        self.done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            with self.profile.phase('warm-up', suppress=True):
+                self.warm_up(self.profile)
+        finally:
+            self.done.set()
+            if self.report:
+                print(self.profile.format())
+
+    def status(self):
+        if self._thread is None:
+            return 'not_started'
+        return 'done' if self.done.is_set() else 'running'
+
+
+# Created when this module is first imported, which app.py does before anything else
+startup_profile = StartupProfile()
@@ -0,0 +1,298 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from config import Config
+from models import database
+from utils.metrics import IMAGE_BYTES_WRITTEN, IMAGES_DEDUPLICATED
+
+# Keys are flat file names; anything else (paths, '..') is rejected
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+def content_key(data, extension):
+    """Content-addressed key: sha256 of the bytes plus the file extension"""
+    return f"{hashlib.sha256(data).hexdigest()}.{extension.lstrip('.').lower()}"
+
+
+def validate_key(key):
+    if not key or not KEY_PATTERN.match(key):
+        raise ValueError(f"Invalid storage key '{key}'")
+    return key
+
+
+class StorageBackend:
+    """
+    Blob storage for generated images. Keys are flat names such as '<sha256>.png'.
+    Object-store backends implement the same methods against a bucket.
+    """
+
+    def put(self, key, data):
+        raise NotImplementedError
+
+    def read(self, key):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove key; a missing key is not an error"""
+        raise NotImplementedError
+
+    def list(self):
+        """Yield (key, last modified timestamp) for every stored blob"""
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+    def key_from_url(self, url):
+        """Return the key a URL produced by url() points at, or None"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of key for zero-copy serving, or None when blobs are remote"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Blobs stored as files in one directory (static/images by default)"""
+
+    def __init__(self, root, url_prefix):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def local_path(self, key):
+        return os.path.join(self.root, validate_key(key))
+
+    def put(self, key, data):
+        # Write to a temporary file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.local_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def read(self, key):
+        with open(self.local_path(key), 'rb') as f:
+            return f.read()
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and KEY_PATTERN.match(entry.name):
+                    yield entry.name, entry.stat().st_mtime
+
+    def url(self, key):
+        return f"{self.url_prefix}/{validate_key(key)}"
+
+    def key_from_url(self, url):
+        prefix = self.url_prefix + '/'
+        if not url or not url.startswith(prefix):
+            return None
+        key = url[len(prefix):]
+        return key if KEY_PATTERN.match(key) else None
+
+
+STORAGE_BACKENDS = {
+    'local': lambda: LocalStorage(Config.IMAGE_STORAGE_PATH, Config.IMAGE_STORAGE_URL_PREFIX),
+}
+
+
+class ImageStore:
+    """
+    Content-addressed image storage with reference counts in SQLite.
+
+    put() writes a blob once per distinct content and registers it with no
+    references. Content rows take references with incref() and drop them with
+    decref() inside their own transactions. gc() deletes blobs that have had
+    no references for longer than the grace period, so a blob written by a job
+    that has not yet attached it to its row is never collected.
+    """
+
+    def __init__(self, backend, database_path=None, grace_seconds=3600):
+        self.backend = backend
+        self.database_path = database_path
+        self.grace_seconds = grace_seconds
+
+    def _connect(self):
+        return database.connect(self.database_path or database.DATABASE, isolation_level=None)
+
+    def put(self, data, extension):
+        """Store data (deduplicated by content) and return its key"""
+        key = content_key(data, extension)
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Registering first (and refreshing orphaned_at) keeps a concurrent gc() away from this key
+            conn.execute('''
+                INSERT INTO image_blobs (key, refcount, size, created_at, orphaned_at) VALUES (?, 0, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET orphaned_at = CASE WHEN refcount <= 0 THEN excluded.orphaned_at ELSE NULL END
+            ''', [key, len(data), now, now])
+        finally:
+            conn.close()
+        if self.backend.exists(key):
+            IMAGES_DEDUPLICATED.inc()
+        else:
+            self.backend.put(key, data)
+            IMAGE_BYTES_WRITTEN.inc(len(data), kind=extension)
+        return key
+
+    def read(self, key):
+        return self.backend.read(key)
+
+    def url(self, key):
+        return self.backend.url(key)
+
+    def key_from_url(self, url):
+        return self.backend.key_from_url(url)
+
+    def incref(self, db, keys):
+        """Take one reference per key on db (the caller commits)"""
+        for key in keys:
+            db.execute('UPDATE image_blobs SET refcount = refcount + 1, orphaned_at = NULL WHERE key = ?', [key])
+
+    def decref(self, db, keys):
+        """Drop one reference per key on db (the caller commits); unreferenced blobs become collectable"""
+        now = time.time()
+        for key in keys:
+            db.execute('''
+                UPDATE image_blobs SET refcount = MAX(refcount - 1, 0),
+                    orphaned_at = CASE WHEN refcount <= 1 THEN ? ELSE NULL END
+                WHERE key = ?
+            ''', [now, key])
+
+    def gc(self, batch_size=500, max_batches=None):
+        """
+        Delete unreferenced blobs past the grace period, batch_size per transaction.
+        Returns (blobs deleted, bytes reclaimed).
+        """
+        deleted = 0
+        reclaimed = 0
+        batches = 0
+        conn = self._connect()
+        try:
+            while max_batches is None or batches < max_batches:
+                cutoff = time.time() - self.grace_seconds
+                # The write lock is held while files are removed so put() cannot revive a key mid-delete
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    rows = conn.execute('SELECT key, size FROM image_blobs WHERE refcount <= 0 AND orphaned_at <= ? LIMIT ?',
+                                        [cutoff, batch_size]).fetchall()
+                    for row in rows:
+                        self.backend.delete(row['key'])
+                        conn.execute('DELETE FROM image_blobs WHERE key = ?', [row['key']])
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+                batches += 1
+                deleted += len(rows)
+                reclaimed += sum(row['size'] or 0 for row in rows)
+                if len(rows) < batch_size:
+                    break
+        finally:
+            conn.close()
+        return deleted, reclaimed
+
+    def sweep_untracked(self, referenced_keys, batch_size=500):
+        """
+        Delete stored files that have no image_blobs row and are not in referenced_keys
+        (e.g. images written before refcounting, or left behind by deleted content).
+        Returns (files deleted, bytes reclaimed).
+        """
+        cutoff = time.time() - self.grace_seconds
+        deleted = 0
+        reclaimed = 0
+        conn = self._connect()
+        try:
+            candidates = []
+            for key, modified_at in self.backend.list():
+                if key in referenced_keys or modified_at > cutoff:
+                    continue
+                candidates.append(key)
+                if len(candidates) >= batch_size:
+                    count, size = self._delete_untracked(conn, candidates)
+                    deleted += count
+                    reclaimed += size
+                    candidates = []
+            if candidates:
+                count, size = self._delete_untracked(conn, candidates)
+                deleted += count
+                reclaimed += size
+        finally:
+            conn.close()
+        return deleted, reclaimed
+
+    def _delete_untracked(self, conn, keys):
+        placeholders = ', '.join('?' for _ in keys)
+        deleted = 0
+        reclaimed = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tracked = {row['key'] for row in conn.execute(f'SELECT key FROM image_blobs WHERE key IN ({placeholders})', keys)}
+            for key in keys:
+                if key in tracked:
+                    continue
+                path = self.backend.local_path(key)
+                if path is not None:
+                    reclaimed += os.path.getsize(path) if os.path.exists(path) else 0
+                self.backend.delete(key)
+                deleted += 1
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return deleted, reclaimed
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes,
+                       COALESCE(SUM(CASE WHEN refcount <= 0 THEN 1 ELSE 0 END), 0) AS orphaned
+                FROM image_blobs
+            ''').fetchone()
+        finally:
+            conn.close()
+        return dict(row)
+
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Return the process-wide image store for the configured backend"""
+    global _image_store
+    if _image_store is None:
+        with _image_store_lock:
+            if _image_store is None:
+                backend_name = Config.IMAGE_STORAGE_BACKEND
+                if backend_name not in STORAGE_BACKENDS:
+                    raise ValueError(f"Unknown IMAGE_STORAGE_BACKEND '{backend_name}'. Choose from: {', '.join(STORAGE_BACKENDS)}")
+                _image_store = ImageStore(STORAGE_BACKENDS[backend_name](), grace_seconds=Config.IMAGE_GC_GRACE_SECONDS)
+    return _image_store
+
+
+def set_image_store(store):
+    """Replace the process-wide image store (tests use a temporary directory)"""
+    global _image_store
+    _image_store = store
@@ -0,0 +1,95 @@
+import json
+import re
+
+# What each text generate_as option asks for when several variants are requested in one prompt
+VARIANT_FORMATS = {
+    'artisan_first_person': 'content about the artisan and their craft',
+    'product_listing_third_person': 'a product listing',
+    'social_caption': 'an Instagram post about the craft, with emojis and hashtags',
+    'ad_copy': 'marketing copy',
+    'about_press': 'an inspiring story about the artisan and their craft, focusing on tradition, passion and cultural heritage',
+}
+
+FENCE = re.compile(r'^\s*```[\w-]*\s*|\s*```\s*$')
+
+
+def variants_prompt(generate_as, person, details, variants):
+    """
+    One prompt asking for every variant ({'language', 'tone'} dicts) as a JSON array,
+    in order, so the model writes them all in a single response.
+    """
+    lines = '\n'.join(f"{number}. In {variant['language']} with a {variant['tone']} tone"
+                      for number, variant in enumerate(variants, start=1))
+    return (f"Write {VARIANT_FORMATS[generate_as]} in the {person} voice. {details}\n\n"
+            f"Write {len(variants)} separate versions:\n{lines}\n\n"
+            f'Respond with only a JSON array of {len(variants)} objects in this order, each like '
+            f'{{"id": 1, "language": "...", "tone": "...", "text": "..."}}, where text is the complete version.')
+
+
+def _text(item):
+    if isinstance(item, str):
+        return item.strip() or None
+    if isinstance(item, dict) and isinstance(item.get('text'), str):
+        return item['text'].strip() or None
+    return None
+
+
+def _items(text):
+    """
+    The JSON values of the response's array, decoded one at a time so a response cut
+    off by the token limit (or followed by prose) still yields its complete items.
+    """
+    text = FENCE.sub('', text)
+    decoder = json.JSONDecoder()
+    start = text.find('[')
+    brace = text.find('{')
+    if brace != -1 and (start == -1 or brace < start):
+        # An object wrapping the array, e.g. {"variants": [...]}
+        try:
+            wrapper, _ = decoder.raw_decode(text, brace)
+        except ValueError:
+            wrapper = None
+        if isinstance(wrapper, dict):
+            return next((value for value in wrapper.values() if isinstance(value, list)), [wrapper])
+    if start == -1:
+        return []
+    items, position = [], start + 1
+    while True:
+        while position < len(text) and text[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(text) or text[position] == ']':
+            return items
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except ValueError:
+            return items
+        items.append(item)
+
+
+def parse_variants(text, count):
+    """
+    Texts for count variants from a structured response, in request order. Items are
+    matched by their 1-based id when it is valid and unused, otherwise by position;
+    variants the response does not contain are None.
+    """
+    results = [None] * count
+    if not text:
+        return results
+    positional = []
+    for position, item in enumerate(_items(text)):
+        value = _text(item)
+        if value is None:
+            continue
+        number = item.get('id') if isinstance(item, dict) else None
+        try:
+            index = int(number) - 1
+        except (TypeError, ValueError):
+            index = -1
+        if 0 <= index < count and results[index] is None:
+            results[index] = value
+        else:
+            positional.append((position, value))
+    for position, value in positional:
+        if position < count and results[position] is None:
+            results[position] = value
+    return results
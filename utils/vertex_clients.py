@@ -0,0 +1,140 @@
+import threading
+import google.auth
+import vertexai
+from vertexai.generative_models import GenerativeModel
+from vertexai.preview.vision_models import ImageGenerationModel
+from google.auth.credentials import Credentials
+from google.oauth2 import service_account
+from config import Config
+from utils.vertex_sdk import bind_image_model, bind_text_model, check_sdk_version
+
+SERVICE_ACCOUNT = 'service_account'
+API_KEY = 'api_key'
+DEFAULT = 'default'
+
+
+class APIKeyCredentials(Credentials):
+    """Credentials that authenticate Vertex AI requests with an API key header"""
+
+    def __init__(self, api_key):
+        super().__init__()
+        self.api_key = api_key
+
+    def apply(self, headers, token=None):
+        headers['x-goog-api-key'] = self.api_key
+
+    def refresh(self, request):
+        pass
+
+
+class VertexClientManager:
+    """
+    Process-wide cache of Vertex AI credentials and model handles.
+
+    vertexai.init is called exactly once. Each model handle is bound to its
+    credentials through its own prediction client instead of swapping the
+    global SDK configuration, so concurrent text and image requests on
+    threaded workers never race on shared state. The binding uses SDK
+    internals, which are confined to utils/vertex_sdk.py.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._kinds = None
+        self._credentials = {}
+        self._text_models = {}
+        self._image_models = {}
+
+    def credential_kinds(self):
+        """Return (text kind, image kind) for the configured credentials"""
+        if self._kinds is None:
+            if Config.get_service_account_credentials():
+                self._kinds = (SERVICE_ACCOUNT, SERVICE_ACCOUNT)
+            elif Config.VERTEX_AI_API_KEY:
+                # Imagen requires OAuth2 credentials, so images use the application default credentials
+                self._kinds = (API_KEY, DEFAULT)
+            else:
+                self._kinds = (DEFAULT, DEFAULT)
+        return self._kinds
+
+    def get_credentials(self, kind):
+        """Return the cached credentials object for kind"""
+        with self._lock:
+            if kind not in self._credentials:
+                if kind == SERVICE_ACCOUNT:
+                    info = Config.get_service_account_credentials()
+                    self._credentials[kind] = service_account.Credentials.from_service_account_info(info)
+                elif kind == API_KEY:
+                    self._credentials[kind] = APIKeyCredentials(Config.VERTEX_AI_API_KEY)
+                elif kind == DEFAULT:
+                    # Application default credentials (JSON file or environment)
+                    self._credentials[kind], _ = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+                else:
+                    raise ValueError(f"Unknown credential kind '{kind}'")
+            return self._credentials[kind]
+
+    def _model_credentials(self, kind):
+        """Credentials to bind a model handle to, or None when the SDK default already matches"""
+        if kind == DEFAULT and self.credential_kinds()[0] == DEFAULT:
+            return None
+        return self.get_credentials(kind)
+
+    def initialize(self):
+        """Initialize Vertex AI once with the project, location and text credentials"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            text_kind = self.credential_kinds()[0]
+            if text_kind == SERVICE_ACCOUNT:
+                print("Using service account credentials from .env")
+            elif text_kind == API_KEY:
+                print("Using API key for VertexAI text generation (images use default credentials)")
+            else:
+                print("Using default credentials (JSON file)")
+            check_sdk_version()
+            # Default credentials are left for the SDK to resolve lazily
+            vertexai.init(project=Config.GOOGLE_CLOUD_PROJECT, location=Config.VERTEX_AI_LOCATION,
+                          credentials=None if text_kind == DEFAULT else self.get_credentials(text_kind))
+            self._initialized = True
+
+    def text_model(self, model_name, kind=None):
+        """Return the cached GenerativeModel for (model_name, credential kind)"""
+        self.initialize()
+        kind = kind or self.credential_kinds()[0]
+        key = (model_name, kind)
+        model = self._text_models.get(key)
+        if model is None:
+            credentials = self._model_credentials(kind)
+            model = GenerativeModel(model_name)
+            if credentials is not None:
+                bind_text_model(model, credentials)
+            with self._lock:
+                model = self._text_models.setdefault(key, model)
+        return model
+
+    def image_model(self, model_name, kind=None):
+        """Return the cached ImageGenerationModel for (model_name, credential kind)"""
+        self.initialize()
+        kind = kind or self.credential_kinds()[1]
+        key = (model_name, kind)
+        model = self._image_models.get(key)
+        if model is None:
+            credentials = self._model_credentials(kind)
+            model = ImageGenerationModel.from_pretrained(model_name)
+            if credentials is not None:
+                bind_image_model(model, credentials)
+            with self._lock:
+                model = self._image_models.setdefault(key, model)
+        return model
+
+    def clear(self):
+        """Drop cached credentials and model handles (e.g. after rotating keys)"""
+        with self._lock:
+            self._kinds = None
+            self._credentials.clear()
+            self._text_models.clear()
+            self._image_models.clear()
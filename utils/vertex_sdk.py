@@ -0,0 +1,68 @@
+"""
+The only module that touches private Vertex AI SDK internals.
+
+The public SDK binds every model to the credentials passed to vertexai.init and
+returns Imagen results without a public bytes accessor. Binding text and image
+models to different credentials, and reading image bytes without a file round
+trip, needs the attributes below. They are checked against the pinned SDK
+version (requirements.txt) by tests/vertex_sdk_test.py, and each access fails
+with SDKIncompatibleError instead of silently misbehaving if a release moves them.
+"""
+from google.cloud import aiplatform
+from google.cloud.aiplatform import initializer as aiplatform_initializer
+from google.cloud.aiplatform import models as aiplatform_models
+from google.cloud.aiplatform_v1beta1.services import prediction_service
+
+# google-cloud-aiplatform release these internals were written against; keep in step with requirements.txt
+SUPPORTED_SDK_VERSION = '1.60.0'
+
+
+class SDKIncompatibleError(RuntimeError):
+    """The installed Vertex AI SDK no longer has an internal this adapter relies on"""
+
+
+def _require(obj, name):
+    if not hasattr(obj, name):
+        owner = obj.__name__ if isinstance(obj, type) else type(obj).__name__
+        raise SDKIncompatibleError(f"google-cloud-aiplatform {aiplatform.__version__} has no {owner}.{name}; "
+                                   f"utils/vertex_sdk.py supports {SUPPORTED_SDK_VERSION}")
+    return getattr(obj, name)
+
+
+def check_sdk_version():
+    """Warn when the installed SDK differs from the version the internals were checked against"""
+    if aiplatform.__version__ != SUPPORTED_SDK_VERSION:
+        print(f"WARNING: google-cloud-aiplatform {aiplatform.__version__} is installed but utils/vertex_sdk.py "
+              f"supports {SUPPORTED_SDK_VERSION}; model credentials binding may fail")
+
+
+def bind_text_model(model, credentials):
+    """Give a GenerativeModel its own prediction client authenticated with credentials"""
+    location = _require(model, '_location')
+    client = aiplatform_initializer.global_config.create_client(
+        client_class=prediction_service.PredictionServiceClient,
+        credentials=credentials,
+        location_override=location,
+        prediction_client=True,
+    )
+    # Pre-fill the attribute behind the lazily created _prediction_client property
+    model._prediction_client_value = client
+    if _require(model, '_prediction_client') is not client:
+        raise SDKIncompatibleError(f"GenerativeModel._prediction_client no longer reads _prediction_client_value; "
+                                   f"utils/vertex_sdk.py supports {SUPPORTED_SDK_VERSION}")
+    return model
+
+
+def bind_image_model(model, credentials):
+    """Route an ImageGenerationModel's predictions through an endpoint authenticated with credentials"""
+    endpoint_name = _require(model, '_endpoint_name')
+    _require(model, '_endpoint')
+    construct = _require(aiplatform.Endpoint, '_construct_sdk_resource_from_gapic')
+    endpoint_compat = _require(aiplatform_models, 'gca_endpoint_compat')
+    model._endpoint = construct(endpoint_compat.Endpoint(name=endpoint_name), credentials=credentials)
+    return model
+
+
+def image_bytes(image):
+    """PNG bytes of a generated Imagen image"""
+    return _require(image, '_image_bytes')